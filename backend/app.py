@@ -1,115 +1,226 @@
-from flask import Flask, request, jsonify, url_for, render_template
+from flask import Blueprint, Flask, Response, current_app, g, has_request_context, request, jsonify, url_for, render_template, send_file, stream_with_context
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
 import logging
+import os
 import random
 import threading
 import time
-import qrcode
+import atexit
+import csv
 import io
-import base64
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+import queue
+import json
+import socket
+import re
+import shutil
+import subprocess
+import sys
+import uuid
+from sqlalchemy import bindparam, case, event, or_, text, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+from telemetry import (FRAME_HEADER, FRAME_READING, MAX_BATCH_SIZE, ReadingBuffer, ReadingError, SequenceTracker,
+                       decode_frame, parse_reading, parse_timestamp)
+from history import MAX_POINTS, RESOLUTIONS, bucket_start, choose_resolution, rollup_rows
+from events import EventBroker, encode_payload, format_sse
+from snapshot_cache import SnapshotCache
+from qr_codes import IMAGE_FORMATS, QRImageCache, complaint_url, generate_permanent_qr_code, qr_digest
+from qr_sheets import ARTIFACT_NAME, JobSlots, expire_jobs, fail_orphaned_jobs, read_status, write_status
+from pagination import CursorError, decode_cursor, encode_cursor, page_size
+from health import Heartbeats, pool_status
+from metrics import MetricsRegistry
+from log_pipeline import configure_logging, parse_pairs
+import sqlite_mode
+from simulator import FleetSimulator, generate_fleet
+from archive import ArchiveStore
+from forecast import TAU_HOURS, hours_to_full, predict_full_at, refit, update_rate
+from rules import FULL, STATES, BinState, evaluate, state_for
+from migrations import check_query_plans, current_version, migrate
+from geo import cover_bbox, distance_m, encode as geohash_encode, parse_location, prefix_range, radius_bbox
+from models import (BinReading, BinReadingRollup, ChangeCounter, Lease, LitterAlert, QRComplaint, SmartBin,
+                    StreamEvent, Tombstone, db)
+import encoding
+
+# Routes, hooks and CLI commands, registered on the app by create_app()
+api = Blueprint('api', __name__, cli_group=None)
+
+# Same place Flask puts an app's instance folder, needed before any app exists
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
 
-app = Flask(__name__, template_folder='../frontend', static_folder='../frontend')
-
-# Replace the current CORS setup with:
-CORS(app, resources={
-    r"/api/*": {
-        "origins": [
-            "https://swachh-doot-2-o.onrender.com",
-            "http://localhost:3000",
-            "http://127.0.0.1:3000"
-        ],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+# Logging settings, applied once by create_app(): request threads only enqueue, a listener thread writes JSON lines
+LOG_SAMPLE_RATES = parse_pairs(os.environ.get('LOG_SAMPLE_RATES'), float)
+
+def log_context():
+    """Request fields attached to every log record, and whether this request is sampled"""
+    if not has_request_context():
+        return None
+    return {
+        'route': request.url_rule.rule if request.url_rule else 'unmatched',
+        'method': request.method,
+        'sampled': g.get('log_sampled', True)
     }
-}) # Enable CORS for all routes
 
-import os
-from flask_sqlalchemy import SQLAlchemy
+log_handler = None
 
+def setup_logging():
+    """Start the log pipeline, once per process"""
+    global log_handler
+    if log_handler is None:
+        log_handler = configure_logging(
+            level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+            logger_levels={name: level.upper() for name, level in parse_pairs(os.environ.get('LOG_LEVELS')).items()},
+            get_context=log_context
+        )
+    return log_handler
 
-@app.route('/')
+logger = logging.getLogger(__name__)
+
+@api.route('/')
 def home():
     return render_template('index.html')
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(e):
     return jsonify({"error": "Endpoint not found", "status": "error"}), 404
 
-# Use environment variable for database URL with fallback
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///database.db').replace('postgres://', 'postgresql://', 1)
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# File-backed stores below are opened on their directories by create_app()
 
-# Add connection pool settings for production
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_recycle': 300,
-    'pool_pre_ping': True,
-    'pool_size': 10,
-    'max_overflow': 20,
-}
-db = SQLAlchemy(app)
-
-# Define Models
-class SmartBin(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    location = db.Column(db.String(100), nullable=False)
-    fill_level = db.Column(db.Float, default=0)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
-    name = db.Column(db.String(100), nullable=True)  # Add name field for better identification
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'location': self.location,
-            'fill_level': round(self.fill_level, 0),  # Always return whole number
-            'last_updated': self.last_updated.isoformat() if self.last_updated else None,
-            'name': self.name
-        }
+# Metrics for /metrics, merged across gunicorn workers through per-process files
+metrics = MetricsRegistry()
+metrics.define('http_requests_total', 'counter', 'HTTP requests by route, method and status')
+metrics.define('http_request_duration_seconds', 'histogram', 'Time to produce a response, by route')
+metrics.define('db_statements_total', 'counter', 'SQL statements executed, by route (background for worker threads)')
+metrics.define('db_statement_seconds_total', 'counter', 'Time spent executing SQL statements, by route')
+metrics.define('db_statements_per_request', 'histogram', 'SQL statements executed per request, by route',
+               buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000))
+metrics.define('db_pool_checkouts_total', 'counter', 'Connections checked out of the pool')
+metrics.define('db_pool_checked_out', 'gauge', 'Connections currently checked out')
+metrics.define('db_pool_overflow', 'gauge', 'Connections open beyond the pool size')
+metrics.define('simulator_tick_seconds', 'histogram', 'Duration of a simulator tick on the leader')
+metrics.define('qr_render_seconds', 'histogram', 'Time to render a QR image on a cache miss, by format')
+metrics.define('bin_transitions_total', 'counter', 'Fill state and sensor transitions detected on ingest, by transition')
+metrics.define('sensor_battery_percent', 'histogram', 'Battery levels reported in binary sensor frames',
+               buckets=(5, 10, 20, 30, 50, 75, 100))
+metrics.define('db_writer_wait_seconds', 'histogram', 'Time spent waiting for the SQLite write turn')
+metrics.define('db_writer_waiting', 'gauge', 'Threads waiting for the SQLite write turn')
+metrics.define('log_records_dropped', 'gauge', 'Log records dropped because the log queue was full')
+metrics.add_gauge_callback(lambda registry: registry.set('log_records_dropped', log_handler.dropped if log_handler else 0))
 
-class LitterAlert(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    location = db.Column(db.String(100), nullable=False)
-    confidence = db.Column(db.Float, default=0)
-    image_url = db.Column(db.String(200))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    description = db.Column(db.String(500))
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'location': self.location,
-            'confidence': self.confidence,
-            'image_url': self.image_url,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'description': self.description
-        }
-class QRComplaint(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    bin_id = db.Column(db.Integer, db.ForeignKey('smart_bin.id'), nullable=False)
-    complaint_type = db.Column(db.String(50), nullable=False)
-    description = db.Column(db.String(500))
-    image_url = db.Column(db.String(200))
-    location = db.Column(db.String(100))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='pending')  # pending, resolved, in_progress
-    citizen_contact = db.Column(db.String(100))  # Optional contact info
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'bin_id': self.bin_id,
-            'complaint_type': self.complaint_type,
-            'description': self.description,
-            'image_url': self.image_url,
-            'location': self.location,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
-            'status': self.status,
-            'citizen_contact': self.citizen_contact
+# Rendered QR images, keyed by a hash of the encoded URL
+qr_image_cache = QRImageCache(
+    on_render=lambda image_format, seconds: metrics.observe('qr_render_seconds', seconds, format=image_format)
+)
+
+# Bulk QR print-sheet jobs, run out of process and tracked through files so any worker can report on them.
+# Each worker queues its jobs; at most QR_SHEET_CONCURRENCY run at once across all workers.
+QR_SHEET_CONCURRENCY = int(os.environ.get('QR_SHEET_CONCURRENCY', 1))
+QR_SHEET_QUEUE_SIZE = int(os.environ.get('QR_SHEET_QUEUE_SIZE', 8))
+QR_SHEET_POLL_SECONDS = 5
+QR_SHEET_RETRY_AFTER = 60
+QR_SHEET_MAX_BINS = int(os.environ.get('QR_SHEET_MAX_BINS', 5000))  # Per explicit bin_ids list
+QR_SHEET_PROGRESS_INTERVAL = 0.5
+QR_SHEET_PROGRESS_IDLE = 5 * 60  # A progress stream ends after this long without a status change
+QR_JOB_RETENTION = timedelta(hours=float(os.environ.get('QR_JOB_RETENTION_HOURS', 24)))
+qr_sheet_queue = queue.Queue(maxsize=QR_SHEET_QUEUE_SIZE)
+qr_sheet_slots = JobSlots(count=QR_SHEET_CONCURRENCY)
+
+# Dashboard snapshot shared by all workers, invalidated after every versioned write
+snapshot_cache = SnapshotCache()
+
+# Resolved alerts and complaints past retention, as compressed monthly files
+archive_store = ArchiveStore()
+
+def metrics_route():
+    """Route template for the current request, or 'background' outside one"""
+    if not has_request_context():
+        return 'background'
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def storage_config():
+    """Directories of the file-backed stores, from the environment"""
+    return {
+        'METRICS_DIR': os.environ.get('METRICS_DIR', os.path.join(INSTANCE_PATH, 'metrics')),
+        'QR_CACHE_DIR': os.environ.get('QR_CACHE_DIR', os.path.join(INSTANCE_PATH, 'qr_cache')),
+        'QR_JOBS_DIR': os.environ.get('QR_JOBS_DIR', os.path.join(INSTANCE_PATH, 'qr_jobs')),
+        'SNAPSHOT_CACHE_DIR': os.environ.get('SNAPSHOT_CACHE_DIR', os.path.join(INSTANCE_PATH, 'cache')),
+        'ARCHIVE_DIR': os.environ.get('ARCHIVE_DIR', os.path.join(INSTANCE_PATH, 'archive'))
+    }
+
+def database_config():
+    """Engine settings from the environment"""
+    uri = os.environ.get('DATABASE_URL', 'sqlite:///database.db').replace('postgres://', 'postgresql://', 1)
+    if sqlite_mode.is_sqlite_file(uri):
+        engine_options = sqlite_mode.engine_options(
+            pool_size=int(os.environ.get('SQLITE_POOL_SIZE', 12)),
+            max_overflow=int(os.environ.get('SQLITE_POOL_OVERFLOW', 4))
+        )
+    else:
+        # Connection pool settings for production
+        engine_options = {
+            'pool_recycle': 300,
+            'pool_pre_ping': True,
+            'pool_size': 10,
+            'max_overflow': 20,
         }
+    return {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options,
+    }
+
+def instrument_engine(engine):
+    """Statement and pool metrics, plus the SQLite writer queue, for one app's engine"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['statement_started'].pop()
+        route = metrics_route()
+        metrics.inc('db_statements_total', route=route)
+        metrics.inc('db_statement_seconds_total', elapsed, route=route)
+        if has_request_context():
+            g.db_statements = g.get('db_statements', 0) + 1
+
+    @event.listens_for(engine, 'checkout')
+    def record_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.inc('db_pool_checkouts_total')
+
+    def record_pool_gauges(registry, pool=engine.pool):
+        status = pool_status(pool)
+        registry.set('db_pool_checked_out', status.get('checkedout', 0))
+        registry.set('db_pool_overflow', max(0, status.get('overflow', 0)))
+
+    metrics.add_gauge_callback(record_pool_gauges)
+
+    # SQLite: WAL on every connection and a single queued writer across all workers
+    if sqlite_mode.is_sqlite_file(str(engine.url)):
+        # Lock file sits beside the database, like its -wal and -shm files
+        sqlite_writer = sqlite_mode.WriterQueue(
+            f"{engine.url.database}-writer.lock",
+            on_wait=lambda seconds: metrics.observe('db_writer_wait_seconds', seconds)
+        )
+        sqlite_mode.install(engine, sqlite_writer)
+        metrics.add_gauge_callback(lambda registry: registry.set('db_writer_waiting', sqlite_writer.waiting()))
+
+
+def area_filter(model, min_lat, min_lng, max_lat, max_lng):
+    """SQL condition selecting rows inside a bounding box via the geohash index"""
+    inside = db.and_(
+        model.latitude.between(min_lat, max_lat),
+        model.longitude.between(min_lng, max_lng)
+    )
+    cells = cover_bbox(min_lat, min_lng, max_lat, max_lng)
+    if cells is None:
+        # Too large an area for cell lookups, use the lat/lng index instead
+        return inside
+    ranges = []
+    for cell in cells:
+        low, high = prefix_range(cell)
+        ranges.append(model.geo_cell >= low if high is None else db.and_(model.geo_cell >= low, model.geo_cell < high))
+    return db.and_(or_(*ranges), inside)
 
 # Simulated bin locations around Rohini Sector-13 with names
 SIMULATED_BINS = [
@@ -123,33 +234,207 @@ SIMULATED_BINS = [
     {"id": 9, "location": "28.7440,77.1240", "name": "Main Road"}
 ]
 
+# Queries on hot paths and the index each must use; checked with `flask --app app check-query-plans`
+def hot_queries():
+    cutoff = datetime(2000, 1, 1)
+    return [
+        ('dashboard recent alerts', db.select(LitterAlert.id).where(LitterAlert.resolved_at.is_(None))
+            .order_by(LitterAlert.timestamp.desc()).limit(10), 'ix_litter_alert_resolved_at_timestamp_id'),
+        ('alerts page', db.select(LitterAlert.id).where(tuple_(LitterAlert.timestamp, LitterAlert.id) < tuple_(cutoff, 0))
+            .order_by(LitterAlert.timestamp.desc(), LitterAlert.id.desc()).limit(51), 'ix_litter_alert_timestamp_id'),
+        ('alerts by bin', db.select(LitterAlert.id).where(LitterAlert.bin_id == 1)
+            .order_by(LitterAlert.timestamp.desc(), LitterAlert.id.desc()).limit(51), 'ix_litter_alert_bin_id_timestamp_id'),
+        ('complaints page', db.select(QRComplaint.id).where(QRComplaint.timestamp >= cutoff)
+            .order_by(QRComplaint.timestamp.desc(), QRComplaint.id.desc()).limit(51), 'ix_qr_complaint_timestamp_id'),
+        ('complaints by status', db.select(QRComplaint.id).where(QRComplaint.status == 'pending')
+            .order_by(QRComplaint.timestamp.desc(), QRComplaint.id.desc()).limit(51), 'ix_qr_complaint_status_timestamp_id'),
+        ('complaints by bin', db.select(QRComplaint.id).where(QRComplaint.bin_id == 1)
+            .order_by(QRComplaint.timestamp.desc(), QRComplaint.id.desc()).limit(51), 'ix_qr_complaint_bin_id_timestamp_id'),
+        ('retention complaints', db.select(QRComplaint.id).where(QRComplaint.resolved_at.isnot(None), QRComplaint.resolved_at < cutoff)
+            .order_by(QRComplaint.resolved_at, QRComplaint.id).limit(RETENTION_BATCH_SIZE), 'ix_qr_complaint_resolved_at_id'),
+        ('retention alerts', db.select(LitterAlert.id).where(LitterAlert.resolved_at.isnot(None), LitterAlert.resolved_at < cutoff)
+            .order_by(LitterAlert.resolved_at, LitterAlert.timestamp, LitterAlert.id).limit(RETENTION_BATCH_SIZE),
+            'ix_litter_alert_resolved_at_timestamp_id'),
+        *((f"retention {table.name}", db.select(*keys).where(condition).limit(RETENTION_BATCH_SIZE), index)
+            for (table, keys, condition), index in zip(history_retention_targets(cutoff), (
+                'ix_bin_reading_timestamp', 'ix_bin_reading_rollup_resolution_bucket'
+            ))),
+        ('stale bins', db.select(SmartBin.id).where(SmartBin.last_updated < cutoff), 'ix_smart_bin_last_updated'),
+        ('full bins', db.select(SmartBin.id).where(SmartBin.fill_state == FULL).order_by(SmartBin.id),
+            'ix_smart_bin_fill_state'),
+        ('bins due full', db.select(SmartBin.id).where(SmartBin.predicted_full_at <= cutoff)
+            .order_by(SmartBin.predicted_full_at), 'ix_smart_bin_predicted_full_at'),
+    ]
+
+@api.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations"""
+    applied = migrate(db.engine, db.metadata)
+    print(f"Schema at version {current_version(db.engine)}, applied {applied or 'nothing'}")
+
+@api.cli.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN the hot queries and fail if one does not use its index"""
+    failures = 0
+    for name, index_name, uses_index, plan in check_query_plans(db.engine, hot_queries()):
+        print(f"{'ok  ' if uses_index else 'FAIL'} {name}: {index_name}")
+        if not uses_index:
+            failures += 1
+            for line in plan:
+                print(f"       {line}")
+    sys.exit(1 if failures else 0)
+
+def current_change_version():
+    """Return the latest committed change version"""
+    version = db.session.query(ChangeCounter.version).filter(ChangeCounter.id == 1).scalar()
+    return version or 0
+
+def next_change_version():
+    """Bump the change version once per transaction and return the new value
+
+    The UPDATE holds the counter row lock until commit, so versions become
+    visible to readers in order.
+    """
+    version = db.session.info.get('change_version')
+    if version is None:
+        db.session.query(ChangeCounter).filter(ChangeCounter.id == 1).update(
+            {ChangeCounter.version: ChangeCounter.version + 1}, synchronize_session=False
+        )
+        version = current_change_version()
+        db.session.info['change_version'] = version
+    return version
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_after_commit(session):
+    if session.info.pop('change_version', None) is not None:
+        snapshot_cache.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def reset_change_version(session):
+    session.info.pop('change_version', None)
+
+def build_dashboard_snapshot():
+    """Load the bins list and recent alerts that the read endpoints serve"""
+    # Read the version first so the rows are never older than it
+    version = current_change_version()
+    bins = SmartBin.query.order_by(SmartBin.id).all()
+    alerts = LitterAlert.query.filter(LitterAlert.resolved_at.is_(None)).order_by(LitterAlert.timestamp.desc()).limit(10).all()
+    logger.info(f"Rebuilt dashboard snapshot at version {version}")
+    return {
+        'version': version,
+        'bins': [bin.to_dict() for bin in bins],
+        'alerts': [alert.to_dict() for alert in alerts]
+    }
+
+def get_dashboard_snapshot():
+    return snapshot_cache.get(build_dashboard_snapshot)
+
+# Columnar and epoch layouts of the snapshot lists, kept for the current version only
+shaped_snapshot_lists = {}
+shaped_snapshot_lock = threading.Lock()
+
+def response_representation():
+    """The negotiated list layout and whether timestamps go out as epoch milliseconds"""
+    return encoding.negotiate(request.accept_mimetypes), request.args.get('timestamps') == 'epoch'
+
+def representation_tag():
+    """ETag suffix telling the layouts of one version apart"""
+    representation, epoch = response_representation()
+    tag = {encoding.ROWS: '', encoding.COLUMNS: '-c', encoding.MSGPACK: '-m'}[representation]
+    return tag + ('-e' if epoch else '')
+
+def shaped_snapshot_list(snapshot, key, representation, epoch):
+    cache_key = (snapshot['version'], key, representation != encoding.ROWS, epoch)
+    with shaped_snapshot_lock:
+        shaped = shaped_snapshot_lists.get(cache_key)
+    if shaped is not None:
+        return shaped
+    # Shaped outside the lock; a thread racing on the same key only repeats the work
+    shaped = encoding.shape(snapshot[key], representation, epoch)
+    with shaped_snapshot_lock:
+        versions = {version for version, *_ in shaped_snapshot_lists}
+        if versions and max(versions) > snapshot['version']:
+            # A request still holding an older snapshot must not evict the newer layouts
+            return shaped
+        if versions - {snapshot['version']}:
+            shaped_snapshot_lists.clear()
+        shaped_snapshot_lists[cache_key] = shaped
+    return shaped
+
+def list_response(payload, list_keys, snapshot=None):
+    """Serialize payload in the negotiated layout, the row lists under list_keys reshaped
+
+    Lists taken from snapshot are shaped once per snapshot version.
+    """
+    representation, epoch = response_representation()
+    if representation == encoding.ROWS and not epoch:
+        response = jsonify(payload)
+    else:
+        for key in list_keys:
+            if snapshot is not None:
+                payload[key] = shaped_snapshot_list(snapshot, key, representation, epoch)
+            else:
+                payload[key] = encoding.shape(payload[key], representation, epoch)
+        response = current_app.response_class(encoding.dumps(payload, representation), mimetype=representation)
+    response.vary.add('Accept')
+    return response
+
+def publish_event(event_type, payload):
+    """Queue a live update event in the caller's transaction so it commits with the write"""
+    db.session.add(StreamEvent(event_type=event_type, payload=encode_payload(payload), created=datetime.utcnow()))
+
+def bin_event_payload(bin_id, fill_level, last_updated, fill_state, sensor_stuck):
+    return {
+        'id': bin_id,
+        'fill_level': fill_level,
+        'last_updated': last_updated.isoformat() if last_updated else None,
+        'fill_state': fill_state,
+        'sensor_stuck': sensor_stuck
+    }
+
 def initialize_database():
-    """Initialize database with real and simulated bins"""
-    with app.app_context():
+    """Migrate the schema and seed the real and simulated bins
+
+    Runs once per deployment: in the gunicorn master with --preload, or
+    through `flask --app app init-db` when workers start with INIT_DB=false.
+    """
+    with current_app.app_context():
         try:
-            db.create_all()
+            migrate(db.engine, db.metadata)
+            
+            if not db.session.get(ChangeCounter, 1):
+                db.session.add(ChangeCounter(id=1, version=0))
+                db.session.flush()
+            
+            # One query for every seed bin that already exists
+            seed_ids = [1] + [bin_data["id"] for bin_data in SIMULATED_BINS]
+            existing = set(db.session.scalars(db.select(SmartBin.id).where(SmartBin.id.in_(seed_ids))))
             
             # Create the real bin at Bharat Apartment
-            if not SmartBin.query.get(1):
+            if 1 not in existing:
                 real_bin = SmartBin(
                     id=1,
                     location="28.7402,77.1234",
                     fill_level=0,
                     name="Bharat Apartment",
-                    last_updated=datetime.utcnow()
+                    last_updated=datetime.utcnow(),
+                    version=next_change_version()
                 )
                 db.session.add(real_bin)
                 logger.info("Created initial bin #1 at Bharat Apartment")
             
             # Create simulated bins
             for bin_data in SIMULATED_BINS:
-                if not SmartBin.query.get(bin_data["id"]):
+                if bin_data["id"] not in existing:
+                    fill_level = random.randint(10, 90)  # Random initial fill level
                     simulated_bin = SmartBin(
                         id=bin_data["id"],
                         location=bin_data["location"],
-                        fill_level=random.randint(10, 90),  # Random initial fill level
+                        fill_level=fill_level,
+                        fill_state=state_for(fill_level),
                         name=bin_data["name"],
-                        last_updated=datetime.utcnow() - timedelta(hours=random.randint(1, 24))
+                        last_updated=datetime.utcnow() - timedelta(hours=random.randint(1, 24)),
+                        version=next_change_version()
                     )
                     db.session.add(simulated_bin)
                     logger.info(f"Created simulated bin #{bin_data['id']} at {bin_data['name']}")
@@ -162,53 +447,732 @@ def initialize_database():
             db.session.rollback()
             # Don't raise the exception, just log it
 
+def append_bin_readings(readings, raw=True):
+    """Record (bin_id, ts, fill_level) readings and merge them into the rollups
+
+    With raw=False only the rollups are kept. Runs inside the caller's
+    transaction; the caller commits.
+    """
+    if not readings:
+        return
+
+    if raw:
+        db.session.execute(BinReading.__table__.insert(), [
+            {'bin_id': bin_id, 'timestamp': ts, 'fill_level': fill_level}
+            for bin_id, ts, fill_level in readings
+        ])
+
+    rows = rollup_rows(readings)
+    table = BinReadingRollup.__table__
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite.insert if dialect == 'sqlite' else postgresql.insert)(table)
+        new = insert.excluded
+        statement = insert.on_conflict_do_update(
+            index_elements=[table.c.bin_id, table.c.resolution, table.c.bucket],
+            set_={
+                'count': table.c.count + new.count,
+                'total': table.c.total + new.total,
+                'min_level': case((new.min_level < table.c.min_level, new.min_level), else_=table.c.min_level),
+                'max_level': case((new.max_level > table.c.max_level, new.max_level), else_=table.c.max_level),
+                'last_level': case((new.last_ts >= table.c.last_ts, new.last_level), else_=table.c.last_level),
+                'last_ts': case((new.last_ts >= table.c.last_ts, new.last_ts), else_=table.c.last_ts),
+            }
+        )
+        db.session.execute(statement, rows)
+        return
+
+    # Other databases have no portable upsert, so merge row by row
+    for row in rows:
+        rollup = db.session.get(BinReadingRollup, (row['bin_id'], row['resolution'], row['bucket']))
+        if rollup is None:
+            db.session.add(BinReadingRollup(**row))
+            continue
+        rollup.count += row['count']
+        rollup.total += row['total']
+        rollup.min_level = min(rollup.min_level, row['min_level'])
+        rollup.max_level = max(rollup.max_level, row['max_level'])
+        if row['last_ts'] >= rollup.last_ts:
+            rollup.last_level = row['last_level']
+            rollup.last_ts = row['last_ts']
+
+# Simulator settings. Only the worker holding the simulator lease runs ticks.
+SIMULATOR_ENABLED = os.environ.get('SIM_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+SIM_FLEET_SIZE = int(os.environ.get('SIM_FLEET_SIZE', len(SIMULATED_BINS)))
+SIM_TICK_SECONDS = float(os.environ.get('SIM_TICK_SECONDS', 45))
+SIM_SEED = int(os.environ['SIM_SEED']) if os.environ.get('SIM_SEED') else None
+SIM_UPDATE_FRACTION = float(os.environ.get('SIM_UPDATE_FRACTION', 1.0))
+SIM_CENTER = parse_location(os.environ.get('SIM_CENTER', '28.7402,77.1234')) or (28.7402, 77.1234)
+SIM_RADIUS_M = float(os.environ.get('SIM_RADIUS_M', 3000))
+SIM_BATCH_SIZE = 10000  # Rows per bulk UPDATE or INSERT, each in its own transaction
+# Simulated readings always feed the rollups; raw rows for them are optional
+SIM_RAW_HISTORY = os.environ.get('SIM_RAW_HISTORY', 'true').lower() not in ('0', 'false', 'no')
+SIM_LEASE_TTL = timedelta(seconds=max(60, SIM_TICK_SECONDS * 3))
+LEASE_TOKEN = uuid.uuid4().hex[:8]
+fleet_simulator = FleetSimulator(seed=SIM_SEED, update_fraction=SIM_UPDATE_FRACTION)
+
+def lease_holder():
+    """This process's lease identity; workers forked from a preloaded app each get their own"""
+    return f"{socket.gethostname()}:{os.getpid()}:{LEASE_TOKEN}"
+
+def acquire_lease(name, ttl):
+    """Take or renew a named lease, returning True if this process now holds it"""
+    with current_app.app_context():
+        holder = lease_holder()
+        now = datetime.utcnow()
+        table = Lease.__table__
+        try:
+            result = db.session.execute(table.update().where(table.c.name == name).where(
+                or_(table.c.holder == holder, table.c.expires_at.is_(None), table.c.expires_at < now)
+            ).values(holder=holder, expires_at=now + ttl))
+            if result.rowcount == 0 and db.session.get(Lease, name) is None:
+                db.session.add(Lease(name=name, holder=holder, expires_at=now + ttl))
+            db.session.commit()
+            return db.session.get(Lease, name).holder == holder
+        except Exception as e:
+            # Lost an insert race with another worker; it holds the lease
+            db.session.rollback()
+            logger.debug(f"Could not acquire lease {name}: {e}")
+            return False
+
+def ensure_simulated_fleet():
+    """Insert generated bins until the simulated fleet reaches SIM_FLEET_SIZE"""
+    with current_app.app_context():
+        last_id = db.session.query(db.func.max(SmartBin.id)).scalar() or 1
+        missing = SIM_FLEET_SIZE + 1 - last_id
+        if missing <= 0:
+            return 0
+        now = datetime.utcnow()
+        rows = []
+        for bin_id, name, lat, lng, fill_level in generate_fleet(last_id + 1, missing, SIM_CENTER, SIM_RADIUS_M, SIM_SEED):
+            rows.append({
+                'id': bin_id, 'name': name, 'location': f"{lat},{lng}", 'fill_level': fill_level,
+                'last_updated': now, 'latitude': lat, 'longitude': lng, 'geo_cell': geohash_encode(lat, lng),
+                'fill_state': state_for(fill_level), 'level_since': now
+            })
+            if len(rows) >= SIM_BATCH_SIZE:
+                db.session.execute(SmartBin.__table__.insert().values(version=next_change_version()), rows)
+                db.session.commit()
+                rows = []
+        if rows:
+            db.session.execute(SmartBin.__table__.insert().values(version=next_change_version()), rows)
+            db.session.commit()
+        logger.info(f"Generated {missing} simulated bins")
+        return missing
+
 def update_simulated_bins():
-    """Update fill levels of simulated bins randomly"""
-    with app.app_context():
+    """Advance every simulated bin one tick and write the changes in bulk"""
+    with current_app.app_context():
         try:
-            simulated_bins = SmartBin.query.filter(SmartBin.id > 1).all()
-            for bin in simulated_bins:
-                # Random change between -15% and +20%
-                change = random.randint(-5, 5)
-                new_level = max(0, min(100, int(round(bin.fill_level + change))))
-                
-                if new_level != bin.fill_level:
-                    bin.fill_level = new_level
-                    bin.last_updated = datetime.utcnow()
-                    logger.debug(f"Updated simulated bin #{bin.id} ({bin.name}) to {new_level}%")
-            
+            ids, levels = [], []
+            for bin_id, fill_level in db.session.execute(
+                    db.select(SmartBin.id, SmartBin.fill_level).where(SmartBin.id > 1).order_by(SmartBin.id)):
+                ids.append(bin_id)
+                levels.append(fill_level or 0)
             db.session.commit()
-            logger.info(f"Updated {len(simulated_bins)} simulated bins")
+            
+            changed_ids, new_levels = fleet_simulator.tick(ids, levels)
+            now = datetime.utcnow()
+            for start in range(0, len(changed_ids), SIM_BATCH_SIZE):
+                batch = zip(changed_ids[start:start + SIM_BATCH_SIZE], new_levels[start:start + SIM_BATCH_SIZE])
+                pending = {bin_id: (fill_level, now) for bin_id, fill_level in batch}
+                version = write_bin_readings(pending, raw_history=SIM_RAW_HISTORY, publish_bins=False)
+                # One event for the whole batch; clients fetch the changes with ?since=
+                publish_event('fleet_tick', {
+                    'count': len(pending),
+                    'version': version,
+                    'timestamp': now.isoformat()
+                })
+                db.session.commit()
+            logger.info(f"Updated {len(changed_ids)} of {len(ids)} simulated bins")
+            return len(changed_ids)
         except Exception as e:
             logger.error(f"Error updating simulated bins: {e}")
             db.session.rollback()
+            return 0
 
 def simulated_bin_updater():
-    """Background thread to update simulated bins periodically"""
+    """Background thread that runs simulator ticks while this worker holds the lease"""
+    leading = False
     while True:
+        heartbeats.beat('simulated_bin_updater')
         try:
-            update_simulated_bins()
-            # Update every 30-60 seconds
-            time.sleep(random.randint(30, 60))
+            if acquire_lease('simulator', SIM_LEASE_TTL):
+                if not leading:
+                    logger.info(f"Simulator lease acquired by {lease_holder()}")
+                    ensure_simulated_fleet()
+                    leading = True
+                started = time.perf_counter()
+                update_simulated_bins()
+                metrics.observe('simulator_tick_seconds', time.perf_counter() - started)
+            elif leading:
+                logger.info("Simulator lease lost")
+                leading = False
         except Exception as e:
             logger.error(f"Error in simulated bin updater: {e}")
-            time.sleep(60)  # Wait longer if there's an error
+        time.sleep(SIM_TICK_SECONDS)
+
+# Write-behind buffer for bulk sensor readings, flushed as one UPDATE per interval
+READING_FLUSH_INTERVAL = float(os.environ.get('READING_FLUSH_INTERVAL', 2))
+reading_buffer = ReadingBuffer()
+reading_sequences = SequenceTracker()
 
-# Initialize the database
-initialize_database()
+# Never let a late reading overwrite a newer value already stored
+bin_reading_update = SmartBin.__table__.update().where(
+    SmartBin.__table__.c.id == bindparam('b_id')
+).where(
+    or_(SmartBin.__table__.c.last_updated.is_(None), SmartBin.__table__.c.last_updated <= bindparam('b_ts'))
+).values(
+    fill_level=bindparam('b_fill'),
+    last_updated=bindparam('b_ts'),
+    version=bindparam('b_version'),
+    fill_rate=bindparam('b_rate'),
+    predicted_full_at=bindparam('b_full'),
+    rate_anchor_level=bindparam('b_anchor_level'),
+    rate_anchor_at=bindparam('b_anchor_at'),
+    fill_state=bindparam('b_state'),
+    level_since=bindparam('b_since'),
+    sensor_stuck=bindparam('b_stuck')
+)
 
-# Start background thread for simulated bin updates
-bin_updater_thread = threading.Thread(target=simulated_bin_updater, daemon=True)
-bin_updater_thread.start()
-logger.info("Started simulated bin updater thread")
+def bin_state(row):
+    """Rule state from a bins row or SmartBin"""
+    return BinState(row.fill_state, row.fill_level, row.last_updated, row.level_since, row.sensor_stuck)
+
+def publish_transitions(bin_id, transitions, fill_level, ts):
+    for transition in transitions:
+        metrics.inc('bin_transitions_total', transition=transition)
+        publish_event('bin_transition', {
+            'id': bin_id,
+            'transition': transition,
+            'fill_level': fill_level,
+            'timestamp': ts.isoformat()
+        })
+
+def advance_bins(history):
+    """Step each bin's fill rate and rule state through its new (bin_id, ts, fill_level) readings
+
+    Reads the bins' current state in one query and publishes any rule
+    transitions. Returns {bin_id: (fill_rate, anchor_level, anchor_at, BinState)}.
+    """
+    table = SmartBin.__table__
+    states = {
+        row.id: [row.fill_rate, row.rate_anchor_level, row.rate_anchor_at, bin_state(row)]
+        for row in db.session.execute(db.select(
+            table.c.id, table.c.fill_rate, table.c.rate_anchor_level, table.c.rate_anchor_at,
+            table.c.fill_level, table.c.last_updated, table.c.fill_state, table.c.level_since, table.c.sensor_stuck
+        ).where(table.c.id.in_({bin_id for bin_id, _, _ in history})))
+    }
+    for bin_id, ts, fill_level in sorted(history, key=lambda reading: reading[1]):
+        current = states.get(bin_id)
+        if current is None:
+            continue
+        rate, anchor_level, anchor_at, state = current
+        if state.ts is not None and ts < state.ts:
+            continue
+        current[:3] = update_rate(rate, anchor_level, anchor_at, fill_level, ts)
+        publish_transitions(bin_id, evaluate(state, fill_level, ts), fill_level, ts)
+    return states
+
+def write_bin_readings(pending, history=None, raw_history=True, publish_bins=True):
+    """Apply {bin_id: (fill_level, ts)} as one executemany UPDATE in the current transaction
+
+    Also updates fill forecasts and rule state, records the readings in
+    history and, with publish_bins, publishes a bin_updated event per bin.
+    Returns the change version written; the caller commits.
+    """
+    version = next_change_version()
+    if history is None:
+        history = [(bin_id, ts, fill_level) for bin_id, (fill_level, ts) in pending.items()]
+    states = advance_bins(history)
+    rows = []
+    published = []
+    for bin_id, (fill_level, ts) in pending.items():
+        rate, anchor_level, anchor_at, state = states.get(
+            bin_id, (None, fill_level, ts, BinState(None, fill_level, ts, ts, False))
+        )
+        published.append(bin_event_payload(bin_id, fill_level, ts, state.fill_state, state.stuck))
+        rows.append({
+            'b_id': bin_id, 'b_fill': fill_level, 'b_ts': ts, 'b_version': version, 'b_rate': rate,
+            'b_full': predict_full_at(fill_level, rate, ts), 'b_anchor_level': anchor_level,
+            'b_anchor_at': anchor_at, 'b_state': state.fill_state,
+            'b_since': state.level_since, 'b_stuck': state.stuck
+        })
+    db.session.execute(bin_reading_update, rows)
+    append_bin_readings(history, raw=raw_history)
+    if publish_bins:
+        for payload in published:
+            publish_event('bin_updated', payload)
+    return version
+
+def flush_bin_readings():
+    """Write all buffered readings to the database in a single bulk UPDATE"""
+    pending, history = reading_buffer.drain()
+    if not pending:
+        return 0
+
+    with current_app.app_context():
+        try:
+            write_bin_readings(pending, history)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error flushing {len(pending)} buffered readings: {e}")
+            db.session.rollback()
+            reading_buffer.requeue(pending, history)
+            return 0
+
+    logger.info(f"Flushed {len(pending)} buffered bin readings")
+    return len(pending)
+
+def reading_flusher():
+    """Background thread to flush buffered readings periodically"""
+    while True:
+        time.sleep(READING_FLUSH_INTERVAL)
+        heartbeats.beat('reading_flusher')
+        try:
+            flush_bin_readings()
+        except Exception as e:
+            logger.error(f"Error in reading flusher: {e}")
+
+# Live update stream: each worker polls the shared event table once and fans out locally
+STREAM_POLL_INTERVAL = float(os.environ.get('STREAM_POLL_INTERVAL', 1))
+STREAM_HEARTBEAT_INTERVAL = 15
+STREAM_MAX_DURATION = 15 * 60  # Clients reconnect with Last-Event-ID
+STREAM_EVENT_RETENTION = timedelta(hours=1)
+STREAM_BACKLOG_LIMIT = 1000
+# Ids may commit out of order under concurrent writers, so re-read a short recent tail
+STREAM_LOOKBACK = 100
+STREAM_LOOKBACK_WINDOW = timedelta(seconds=30)
+# Each open stream holds a worker thread, so leave the rest for sensors, health checks and API calls
+STREAM_MAX_SUBSCRIBERS = int(os.environ.get('STREAM_MAX_SUBSCRIBERS', 4))
+STREAM_RETRY_AFTER = 60  # Seconds a refused client polls before trying the stream again
+event_broker = EventBroker()
+
+def poll_stream_events():
+    """Read newly committed events and hand them to local subscribers"""
+    with current_app.app_context():
+        try:
+            if event_broker.last_id is None:
+                event_broker.start(db.session.query(db.func.max(StreamEvent.id)).scalar() or 0)
+                return 0
+            last_id = event_broker.last_id
+            rows = db.session.query(StreamEvent.id, StreamEvent.event_type, StreamEvent.payload).filter(or_(
+                StreamEvent.id > last_id,
+                db.and_(
+                    StreamEvent.id > last_id - STREAM_LOOKBACK,
+                    StreamEvent.created >= datetime.utcnow() - STREAM_LOOKBACK_WINDOW
+                )
+            )).order_by(StreamEvent.id).limit(STREAM_BACKLOG_LIMIT + STREAM_LOOKBACK).all()
+            return event_broker.publish([tuple(row) for row in rows])
+        finally:
+            db.session.remove()
+
+def prune_stream_events():
+    """Drop events older than the retention window"""
+    with current_app.app_context():
+        try:
+            StreamEvent.query.filter(StreamEvent.created < datetime.utcnow() - STREAM_EVENT_RETENTION).delete()
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error pruning stream events: {e}")
+            db.session.rollback()
+
+def stream_event_poller():
+    """Background thread to deliver stream events to this worker's clients"""
+    last_prune = time.time()
+    while True:
+        time.sleep(STREAM_POLL_INTERVAL)
+        heartbeats.beat('stream_event_poller')
+        try:
+            poll_stream_events()
+            if time.time() - last_prune > 300:
+                prune_stream_events()
+                last_prune = time.time()
+        except Exception as e:
+            logger.error(f"Error in stream event poller: {e}")
+
+# Health checks read table counts refreshed here rather than counting per probe
+HEALTH_STATS_INTERVAL = float(os.environ.get('HEALTH_STATS_INTERVAL', 60))
+heartbeats = Heartbeats()
+table_stats = {}
+
+def refresh_table_stats():
+    """Count rows in the main tables with one round trip"""
+    with current_app.app_context():
+        counts = db.session.query(
+            db.select(db.func.count(SmartBin.id)).scalar_subquery(),
+            db.select(db.func.count(SmartBin.id)).where(SmartBin.id > 1).scalar_subquery(),
+            db.select(db.func.count(LitterAlert.id)).scalar_subquery(),
+            db.select(db.func.count(QRComplaint.id)).scalar_subquery()
+        ).one()
+        db.session.remove()
+    table_stats.update(zip(('bin_count', 'simulated_bins', 'alert_count', 'complaint_count'), counts))
+    table_stats['refreshed_at'] = datetime.utcnow().isoformat()
+
+def table_stats_refresher():
+    """Background thread to keep health check table counts fresh"""
+    while True:
+        heartbeats.beat('table_stats_refresher')
+        try:
+            refresh_table_stats()
+        except Exception as e:
+            logger.error(f"Error refreshing table stats: {e}")
+        time.sleep(HEALTH_STATS_INTERVAL)
+
+# Retention: resolved alerts and complaints older than RETENTION_DAYS move to the archive,
+# raw readings and minute rollups past their own windows are deleted (the hourly and
+# daily rollups keep the history). Each batch is its own short transaction; only the
+# worker holding the lease runs it.
+RETENTION_DAYS = float(os.environ.get('RETENTION_DAYS', 90))
+RAW_HISTORY_DAYS = float(os.environ.get('RAW_HISTORY_DAYS', 7))
+MINUTE_ROLLUP_DAYS = float(os.environ.get('MINUTE_ROLLUP_DAYS', 30))
+RETENTION_INTERVAL = float(os.environ.get('RETENTION_INTERVAL', 3600))
+RETENTION_BATCH_SIZE = 500
+RETENTION_LEASE_TTL = timedelta(seconds=max(600, RETENTION_INTERVAL * 2))
+
+def history_kept_since(now):
+    """Oldest time raw readings and minute rollups are still kept for"""
+    return {'raw': now - timedelta(days=RAW_HISTORY_DAYS), '1m': now - timedelta(days=MINUTE_ROLLUP_DAYS)}
+
+def history_retention_targets(now):
+    """(table, key columns, condition) for the history rows retention deletes"""
+    kept_since = history_kept_since(now)
+    reading, rollup = BinReading.__table__, BinReadingRollup.__table__
+    return (
+        (reading, (reading.c.id,), reading.c.timestamp < kept_since['raw']),
+        (rollup, (rollup.c.bin_id, rollup.c.resolution, rollup.c.bucket),
+            db.and_(rollup.c.resolution == '1m', rollup.c.bucket < kept_since['1m'])),
+    )
+
+def archive_batch(model, condition, order=('timestamp', 'id')):
+    """Archive and delete up to RETENTION_BATCH_SIZE matching rows, oldest first by the order columns"""
+    table = model.__table__
+    rows = [dict(row) for row in db.session.execute(
+        table.select().where(condition).order_by(*(table.c[name] for name in order)).limit(RETENTION_BATCH_SIZE)
+    ).mappings()]
+    if not rows:
+        return 0
+    # Written and fsynced before the delete commits; a crash in between only duplicates the batch
+    archive_store.append(table.name, rows)
+    db.session.execute(table.delete().where(table.c.id.in_([row['id'] for row in rows])))
+    db.session.commit()
+    return len(rows)
+
+def prune_batch(table, keys, condition):
+    """Delete up to RETENTION_BATCH_SIZE matching rows without archiving them"""
+    batch = db.session.execute(db.select(*keys).where(condition).limit(RETENTION_BATCH_SIZE)).all()
+    if not batch:
+        return 0
+    db.session.execute(table.delete().where(tuple_(*keys).in_(batch)))
+    db.session.commit()
+    return len(batch)
+
+def run_in_batches(step):
+    """Call step() until it returns a short batch, returning the total"""
+    total = 0
+    while True:
+        count = step()
+        total += count
+        if count < RETENTION_BATCH_SIZE:
+            return total
+        # Let queued writers in between batches
+        time.sleep(0.05)
+
+def run_retention(now=None):
+    """Archive resolved rows and prune history past retention
+
+    Also expires QR sheet jobs older than QR_JOB_RETENTION. Returns
+    {'archived': counts per table, 'pruned': counts per table and 'qr_jobs'}.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=RETENTION_DAYS)
+    targets = (
+        # A row resolved today stays for the full window however old it is
+        (LitterAlert, db.and_(LitterAlert.resolved_at.isnot(None), LitterAlert.resolved_at < cutoff),
+            ('resolved_at', 'timestamp', 'id')),
+        (QRComplaint, db.and_(QRComplaint.resolved_at.isnot(None), QRComplaint.resolved_at < cutoff), ('resolved_at', 'id')),
+    )
+    archived = {}
+    pruned = {}
+    with current_app.app_context():
+        try:
+            for model, condition, order in targets:
+                archived[model.__tablename__] = run_in_batches(lambda: archive_batch(model, condition, order))
+            for table, keys, condition in history_retention_targets(now):
+                pruned[table.name] = run_in_batches(lambda: prune_batch(table, keys, condition))
+            pruned['qr_jobs'] = expire_jobs(qr_sheet_slots.directory, now - QR_JOB_RETENTION)
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+    if any(archived.values()):
+        logger.info(f"Archived rows older than {cutoff.isoformat()}", extra={'archived': archived})
+    if any(pruned.values()):
+        logger.info("Pruned old bin history", extra={'pruned': pruned})
+    return {'archived': archived, 'pruned': pruned}
+
+def retention_archiver():
+    """Background thread that runs retention while this worker holds the lease"""
+    while True:
+        heartbeats.beat('retention_archiver')
+        try:
+            if acquire_lease('retention', RETENTION_LEASE_TTL):
+                run_retention()
+        except Exception as e:
+            logger.error(f"Error archiving old rows: {e}")
+        time.sleep(RETENTION_INTERVAL)
+
+# Forecast refit: every bin's fill rate re-estimated from its hourly rollups in one vectorized pass
+FORECAST_REFIT_INTERVAL = float(os.environ.get('FORECAST_REFIT_INTERVAL', 3600))
+FORECAST_WINDOW = timedelta(hours=TAU_HOURS * 8)  # Older readings weigh under 0.04%
+FORECAST_LEASE_TTL = timedelta(seconds=max(600, FORECAST_REFIT_INTERVAL * 2))
+# Refits closer than this to the stored forecast are not written, so delta sync only sees real changes
+FORECAST_RATE_TOLERANCE = 1e-6  # Percent per hour
+FORECAST_FULL_AT_TOLERANCE = timedelta(seconds=1)
+
+def refit_forecasts():
+    """Replace online fill rate estimates with a weighted least-squares fit, returning timings"""
+    # Imported on first use: only the worker holding the forecast lease runs refits
+    import numpy as np
+    with current_app.app_context():
+        try:
+            started = time.perf_counter()
+            now = datetime.utcnow()
+            rollup = BinReadingRollup.__table__
+            rows = db.session.execute(db.select(rollup.c.bin_id, rollup.c.last_ts, rollup.c.last_level).where(
+                rollup.c.resolution == '1h', rollup.c.bucket >= now - FORECAST_WINDOW
+            ).order_by(rollup.c.bin_id, rollup.c.bucket)).all()
+            bins = db.session.execute(db.select(
+                SmartBin.id, SmartBin.fill_level, SmartBin.last_updated, SmartBin.fill_rate, SmartBin.predicted_full_at
+            ).where(SmartBin.last_updated.isnot(None)).order_by(SmartBin.id)).all()
+            loaded = time.perf_counter()
+            
+            bin_ids, rates = refit(
+                np.fromiter((row[0] for row in rows), np.int64, len(rows)),
+                (np.array([row[1] for row in rows], dtype='datetime64[us]') - np.datetime64(now, 'us')) / np.timedelta64(1, 'h'),
+                np.fromiter((row[2] for row in rows), np.float64, len(rows))
+            )
+            # Line each bin up with its fit; bins without one keep their online estimate
+            ids = np.fromiter((row[0] for row in bins), np.int64, len(bins))
+            bin_rates = np.full(len(ids), np.nan)
+            if len(bin_ids):
+                positions = np.minimum(np.searchsorted(bin_ids, ids), len(bin_ids) - 1)
+                bin_rates = np.where(bin_ids[positions] == ids, rates[positions], np.nan)
+            fitted = ~np.isnan(bin_rates)
+            ids, bin_rates = ids[fitted], bin_rates[fitted]
+            last_updated = np.array([row[2] for row in bins], dtype='datetime64[us]')[fitted]
+            hours = hours_to_full(np.fromiter((row[1] or 0 for row in bins), np.float64, len(bins))[fitted], bin_rates)
+            full_at = np.where(np.isnan(hours), np.datetime64('NaT'),
+                               last_updated + (np.nan_to_num(hours) * 3.6e9).astype('timedelta64[us]'))
+
+            # Only bins whose forecast moved are written and given a new change version
+            old_rates = np.array([row[3] for row in bins], dtype=np.float64)[fitted]
+            old_full_at = np.array([row[4] for row in bins], dtype='datetime64[us]')[fitted]
+            same_full_at = (np.isnat(full_at) & np.isnat(old_full_at)) | (
+                np.abs(full_at - old_full_at) <= np.timedelta64(FORECAST_FULL_AT_TOLERANCE))
+            changed = ~((np.abs(bin_rates - old_rates) <= FORECAST_RATE_TOLERANCE) & same_full_at)
+            fit_done = time.perf_counter()
+            
+            if changed.any():
+                # Skip bins that took a reading since they were read above
+                table = SmartBin.__table__
+                version = next_change_version()
+                db.session.execute(table.update().where(table.c.id == bindparam('b_id')).where(
+                    table.c.last_updated == bindparam('b_ts')
+                ).values(fill_rate=bindparam('b_rate'), predicted_full_at=bindparam('b_full'), version=version), [
+                    {'b_id': bin_id, 'b_ts': ts, 'b_rate': rate, 'b_full': full}
+                    for bin_id, ts, rate, full in zip(
+                        ids[changed].tolist(), last_updated[changed].tolist(), bin_rates[changed].tolist(),
+                        full_at[changed].tolist()
+                    )
+                ])
+            db.session.commit()
+            result = {
+                'bins_refit': int(len(ids)),
+                'bins_changed': int(changed.sum()),
+                'readings': len(rows),
+                'load_ms': round((loaded - started) * 1000, 2),
+                'fit_ms': round((fit_done - loaded) * 1000, 2),
+                'write_ms': round((time.perf_counter() - fit_done) * 1000, 2)
+            }
+            logger.info(f"Refit fill forecasts for {result['bins_refit']} bins", extra=result)
+            return result
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+
+def forecast_refitter():
+    """Background thread that refits forecasts while this worker holds the lease"""
+    while True:
+        time.sleep(FORECAST_REFIT_INTERVAL)
+        heartbeats.beat('forecast_refitter')
+        try:
+            if acquire_lease('forecast', FORECAST_LEASE_TTL):
+                refit_forecasts()
+        except Exception as e:
+            logger.error(f"Error refitting forecasts: {e}")
+
+def run_qr_sheet_job(job_dir):
+    """Run one sheet job in its own process, beating the runner's heartbeat until it exits"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'qr_sheets.py'), job_dir],
+        stdout=subprocess.DEVNULL,
+        env=dict(os.environ, QR_CACHE_DIR=qr_image_cache.directory)
+    )
+    while True:
+        try:
+            return process.wait(timeout=QR_SHEET_POLL_SECONDS)
+        except subprocess.TimeoutExpired:
+            heartbeats.beat('qr_sheet_runner')
+
+def qr_sheet_runner():
+    """Background thread that runs this worker's queued sheet jobs once a slot is free"""
+    # Queues are per worker, so jobs left by an exited worker would never start
+    try:
+        failed = fail_orphaned_jobs(qr_sheet_slots.directory)
+        if failed:
+            logger.warning(f"Failed {failed} QR sheet jobs orphaned by exited workers")
+    except Exception as e:
+        logger.error(f"Error checking for orphaned QR sheet jobs: {e}")
+    while True:
+        heartbeats.beat('qr_sheet_runner')
+        try:
+            job_dir = qr_sheet_queue.get(timeout=QR_SHEET_POLL_SECONDS)
+        except queue.Empty:
+            continue
+        try:
+            slot = qr_sheet_slots.acquire()
+            while slot is None:
+                heartbeats.beat('qr_sheet_runner')
+                time.sleep(1)
+                slot = qr_sheet_slots.acquire()
+            try:
+                run_qr_sheet_job(job_dir)
+            finally:
+                qr_sheet_slots.release(slot)
+        except Exception as e:
+            logger.error(f"Error running QR sheet job {os.path.basename(job_dir)}: {e}")
+
+def run_in_app_context(app, target):
+    def run():
+        with app.app_context():
+            target()
+    return run
+
+def start_background_threads(app):
+    """Start this process's background loops
+
+    Threads do not survive fork, so under gunicorn each worker calls this
+    from the post_worker_init hook in gunicorn.conf.py.
+    """
+    # Start background thread for simulated bin updates
+    bin_updater_thread = threading.Thread(target=run_in_app_context(app, simulated_bin_updater), daemon=True)
+    if SIMULATOR_ENABLED:
+        heartbeats.register('simulated_bin_updater', bin_updater_thread, max_age=SIM_TICK_SECONDS * 3 + 60)
+        bin_updater_thread.start()
+        logger.info("Started simulated bin updater thread")
+    
+    # Start background thread for buffered reading flushes
+    reading_flusher_thread = threading.Thread(target=run_in_app_context(app, reading_flusher), daemon=True)
+    heartbeats.register('reading_flusher', reading_flusher_thread, max_age=max(30, READING_FLUSH_INTERVAL * 10))
+    reading_flusher_thread.start()
+    atexit.register(run_in_app_context(app, flush_bin_readings))
+    logger.info("Started buffered reading flusher thread")
+    
+    # Start background thread for live update streams
+    stream_poller_thread = threading.Thread(target=run_in_app_context(app, stream_event_poller), daemon=True)
+    heartbeats.register('stream_event_poller', stream_poller_thread, max_age=max(30, STREAM_POLL_INTERVAL * 10))
+    stream_poller_thread.start()
+    logger.info("Started stream event poller thread")
+    
+    # Start background thread for health check table counts
+    table_stats_thread = threading.Thread(target=run_in_app_context(app, table_stats_refresher), daemon=True)
+    heartbeats.register('table_stats_refresher', table_stats_thread, max_age=HEALTH_STATS_INTERVAL * 3)
+    table_stats_thread.start()
+    logger.info("Started table stats refresher thread")
+    
+    # Start background thread for retention archiving
+    retention_thread = threading.Thread(target=run_in_app_context(app, retention_archiver), daemon=True)
+    heartbeats.register('retention_archiver', retention_thread, max_age=RETENTION_INTERVAL * 2 + 600)
+    retention_thread.start()
+    logger.info("Started retention archiver thread")
+    
+    # Start background thread for queued QR sheet jobs
+    qr_sheet_thread = threading.Thread(target=qr_sheet_runner, daemon=True)
+    heartbeats.register('qr_sheet_runner', qr_sheet_thread, max_age=QR_SHEET_POLL_SECONDS * 3 + 60)
+    qr_sheet_thread.start()
+    logger.info("Started QR sheet runner thread")
+    
+    # Start background thread for fill forecast refits
+    forecast_thread = threading.Thread(target=run_in_app_context(app, forecast_refitter), daemon=True)
+    heartbeats.register('forecast_refitter', forecast_thread, max_age=FORECAST_REFIT_INTERVAL * 2 + 600)
+    forecast_thread.start()
+    logger.info("Started forecast refitter thread")
+
+def create_app(config=None):
+    """Build the app; the database is migrated and seeded here unless INIT_DB is false
+
+    Importing this module only defines things: logging, the file-backed
+    stores and the database are all set up here, and background threads
+    are started by start_background_threads().
+    """
+    setup_logging()
+    app = Flask(__name__, template_folder='../frontend', static_folder='../frontend')
+    app.json = encoding.JSON_PROVIDER(app)
+    app.config.update(database_config())
+    app.config.update(storage_config())
+    app.config['INIT_DB'] = os.environ.get('INIT_DB', 'true').lower() not in ('0', 'false', 'no')
+    app.config.update(config or {})
+
+    metrics.open(app.config['METRICS_DIR'])
+    qr_image_cache.open(app.config['QR_CACHE_DIR'])
+    qr_sheet_slots.open(app.config['QR_JOBS_DIR'])
+    snapshot_cache.open(app.config['SNAPSHOT_CACHE_DIR'])
+    archive_store.open(app.config['ARCHIVE_DIR'])
+    
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": [
+                "https://swachh-doot-2-o.onrender.com",
+                "http://localhost:3000",
+                "http://127.0.0.1:3000"
+            ],
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization"]
+        }
+    })
+    db.init_app(app)
+    app.register_blueprint(api)
+    
+    with app.app_context():
+        instrument_engine(db.engine)
+        if app.config['INIT_DB']:
+            initialize_database()
+    return app
+
+@api.cli.command('init-db')
+def init_db_command():
+    """Migrate the schema and seed the initial bins"""
+    initialize_database()
 
 # --- Middleware ---
-@app.before_request
+@api.before_app_request
 def before_request():
+    g.request_started = time.perf_counter()
+    g.log_sampled = random.random() < LOG_SAMPLE_RATES.get(metrics_route(), 1.0)
     logger.debug(f"Request: {request.method} {request.url}")
 
-@app.after_request
+@api.after_app_request
 def after_request(response):
+    if 'request_started' in g:
+        route = metrics_route()
+        metrics.inc('http_requests_total', route=route, method=request.method, status=str(response.status_code))
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - g.request_started,
+                        route=route, method=request.method)
+        metrics.observe('db_statements_per_request', g.get('db_statements', 0), route=route)
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
@@ -217,65 +1181,168 @@ def after_request(response):
 # --- API ROUTES ---
 
 # Get all data for the dashboard
-@app.route('/api/dashboard', methods=['GET'])
+@api.route('/api/dashboard', methods=['GET'])
 def get_dashboard_data():
     try:
-        bins = SmartBin.query.order_by(SmartBin.id).all()
-        alerts = LitterAlert.query.order_by(LitterAlert.timestamp.desc()).limit(10).all()
+        snapshot = get_dashboard_snapshot()
+        version = snapshot['version']
+        since = request.args.get('since', type=int)
         
-        logger.info(f"Dashboard requested - {len(bins)} bins, {len(alerts)} alerts")
+        # Nothing changed since the client's copy, answer without touching the database
+        etag = f"v{version}" if since is None else f"v{version}-s{since}"
+        etag += representation_tag()
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
         
-        return jsonify({
-            'bins': [bin.to_dict() for bin in bins],
-            'alerts': [alert.to_dict() for alert in alerts],
-            'status': 'success',
-            'timestamp': datetime.utcnow().isoformat(),
-            'total_bins': len(bins),
-            'total_alerts': len(alerts)
-        })
+        if since is not None and since > 0:
+            bins = SmartBin.query.filter(SmartBin.version > since).order_by(SmartBin.id).all()
+            alerts = LitterAlert.query.filter(
+                LitterAlert.version > since, LitterAlert.resolved_at.is_(None)
+            ).order_by(LitterAlert.timestamp.desc()).all()
+            deleted = db.session.query(Tombstone.table_name, Tombstone.object_id).filter(Tombstone.version > since).all()
+            
+            logger.info(f"Dashboard delta since {since} - {len(bins)} bins, {len(alerts)} alerts, {len(deleted)} deleted")
+            
+            response = list_response({
+                'bins': [bin.to_dict() for bin in bins],
+                'alerts': [alert.to_dict() for alert in alerts],
+                'deleted_bins': [object_id for table_name, object_id in deleted if table_name == 'smart_bin'],
+                'deleted_alerts': [object_id for table_name, object_id in deleted if table_name == 'litter_alert'],
+                'status': 'success',
+                'delta': True,
+                'since': since,
+                'version': version,
+                'timestamp': datetime.utcnow().isoformat()
+            }, ('bins', 'alerts'))
+        else:
+            bins = snapshot['bins']
+            alerts = snapshot['alerts']
+            
+            logger.info(f"Dashboard requested - {len(bins)} bins, {len(alerts)} alerts")
+            
+            response = list_response({
+                'bins': bins,
+                'alerts': alerts,
+                'status': 'success',
+                'version': version,
+                'timestamp': datetime.utcnow().isoformat(),
+                'total_bins': len(bins),
+                'total_alerts': len(alerts)
+            }, ('bins', 'alerts'), snapshot)
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         logger.error(f"Error in get_dashboard_data: {e}")
         return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
  
+# Live stream of bin and alert updates (Server-Sent Events)
+@api.route('/api/stream', methods=['GET'])
+def stream_updates():
+    """Push bin_updated, fleet_tick, alert_created, alert_resolved and complaint_created events"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID must be an integer', 'status': 'error'}), 400
+
+    # Subscribe before reading the backlog so nothing falls in between
+    subscriber = event_broker.subscribe(limit=STREAM_MAX_SUBSCRIBERS)
+    if subscriber is None:
+        # Clients fall back to polling the dashboard with ?since=
+        response = jsonify({'error': 'Too many live streams on this worker, poll /api/dashboard instead', 'status': 'error'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+        return response
+    backlog = []
+    try:
+        if last_event_id is not None:
+            backlog = [tuple(row) for row in db.session.query(
+                StreamEvent.id, StreamEvent.event_type, StreamEvent.payload
+            ).filter(StreamEvent.id > last_event_id).order_by(StreamEvent.id).limit(STREAM_BACKLOG_LIMIT)]
+    except Exception as e:
+        event_broker.unsubscribe(subscriber)
+        logger.error(f"Error reading stream backlog: {e}")
+        return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
+    finally:
+        db.session.remove()
+
+    def generate():
+        sent = set()
+        started = time.time()
+        try:
+            yield "retry: 3000\n\n"
+            for event in backlog:
+                sent.add(event[0])
+                yield format_sse(*event)
+            while time.time() - started < STREAM_MAX_DURATION and not subscriber.overflowed:
+                try:
+                    event = subscriber.queue.get(timeout=STREAM_HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event[0] in sent:
+                    continue
+                yield format_sse(*event)
+        finally:
+            event_broker.unsubscribe(subscriber)
+
+    logger.info(f"Stream opened, {event_broker.subscriber_count()} subscribers in this worker")
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 # Update a bin's fill level (This will be called by the ESP32)
-@app.route('/api/bin/<int:bin_id>', methods=['POST'])
+@api.route('/api/bin/<int:bin_id>', methods=['POST'])
 def update_bin_level(bin_id):
     try:
-        # Debug logging
-        print(f"=== ARDUINO REQUEST RECEIVED ===")
-        print(f"Remote IP: {request.remote_addr}")
-        print(f"Headers: {dict(request.headers)}")
-        
         data = request.get_json()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Arduino request for bin {bin_id}", extra={
+                'remote_addr': request.remote_addr, 'headers': dict(request.headers), 'data': data
+            })
         if not data:
-            print("ERROR: No JSON data received")
             logger.warning(f"No JSON data received for bin {bin_id}")
             return jsonify({'error': 'No data provided', 'status': 'error'}), 400
         
-        print(f"Received data: {data}")
-        logger.debug(f"Received data for bin {bin_id}: {data}")
-        
         bin = SmartBin.query.get(bin_id)
         if bin:
             fill_level = data.get('fill_level')
             if fill_level is None:
-                print("ERROR: fill_level field missing")
+                logger.warning(f"fill_level field missing for bin {bin_id}")
                 return jsonify({'error': 'fill_level field required', 'status': 'error'}), 400
             
             try:
                 fill_level = float(fill_level)
                 if not (0 <= fill_level <= 100):
-                    print(f"ERROR: fill_level out of range: {fill_level}")
+                    logger.warning(f"fill_level out of range for bin {bin_id}: {fill_level}")
                     return jsonify({'error': 'fill_level must be between 0 and 100', 'status': 'error'}), 400
             except (ValueError, TypeError):
-                print(f"ERROR: fill_level not a number: {fill_level}")
+                logger.warning(f"fill_level not a number for bin {bin_id}: {fill_level}")
                 return jsonify({'error': 'fill_level must be a number', 'status': 'error'}), 400
             
+            now = datetime.utcnow()
+            bin.fill_rate, bin.rate_anchor_level, bin.rate_anchor_at = update_rate(
+                bin.fill_rate, bin.rate_anchor_level, bin.rate_anchor_at, fill_level, now
+            )
+            bin.predicted_full_at = predict_full_at(fill_level, bin.fill_rate, now)
+            state = bin_state(bin)
+            publish_transitions(bin_id, evaluate(state, fill_level, now), fill_level, now)
+            bin.fill_state, bin.level_since, bin.sensor_stuck = state.fill_state, state.level_since, state.stuck
             bin.fill_level = fill_level
-            bin.last_updated = datetime.utcnow()
+            bin.last_updated = now
+            bin.version = next_change_version()
+            append_bin_readings([(bin_id, bin.last_updated, fill_level)])
+            publish_event('bin_updated', bin_event_payload(
+                bin_id, fill_level, bin.last_updated, bin.fill_state, bin.sensor_stuck
+            ))
             db.session.commit()
             
-            print(f"SUCCESS: Updated bin {bin_id} to {fill_level}%")
             logger.info(f"Updated bin {bin_id} to {fill_level}%")
             
             return jsonify({
@@ -286,25 +1353,110 @@ def update_bin_level(bin_id):
                 'bin_name': bin.name
             })
         
-        print(f"ERROR: Bin {bin_id} not found")
         logger.warning(f"Bin {bin_id} not found")
         return jsonify({'error': 'Bin not found', 'status': 'error'}), 404
         
     except Exception as e:
-        print(f"EXCEPTION: {e}")
         logger.error(f"Error updating bin {bin_id}: {e}")
         db.session.rollback()
         return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
 
+def buffer_readings(parsed, errors):
+    """Queue validated (index, (bin_id, fill_level, ts)) readings for known bins, returning the count accepted"""
+    # Check every referenced bin exists with one query for the whole batch
+    bin_ids = {reading[0] for _, reading in parsed}
+    known_ids = set()
+    if bin_ids:
+        known_ids = {
+            row[0] for row in
+            db.session.query(SmartBin.id).filter(SmartBin.id.in_(bin_ids))
+        }
+
+    accepted = 0
+    for index, (bin_id, fill_level, ts) in parsed:
+        if bin_id not in known_ids:
+            errors.append({'index': index, 'bin_id': bin_id, 'error': 'Bin not found'})
+            continue
+        reading_buffer.add(bin_id, fill_level, ts)
+        accepted += 1
+    errors.sort(key=lambda error: error['index'])
+    return accepted
+
+def decode_binary_readings(now):
+    """Decode an application/octet-stream frame, see telemetry.py for the layout"""
+    readings, errors, batteries = decode_frame(request.get_data(cache=False), now)
+    for battery in batteries:
+        metrics.observe('sensor_battery_percent', battery)
+    parsed = []
+    duplicates = 0
+    for index, reading, sequence in readings:
+        # A node that missed our response resends the same reading with the same sequence
+        if reading_sequences.is_repeat(reading[0], sequence):
+            duplicates += 1
+            continue
+        parsed.append((index, reading))
+    return parsed, errors, duplicates
+
+# Bulk upload of sensor readings from a gateway, as JSON or a compact binary frame
+@api.route('/api/bins/readings', methods=['POST'])
+def ingest_bin_readings():
+    """Validate a batch of readings and queue them for the next bulk flush"""
+    try:
+        now = datetime.utcnow()
+        duplicates = 0
+        if request.mimetype == 'application/octet-stream':
+            if (request.content_length or 0) > FRAME_HEADER.size + MAX_BATCH_SIZE * FRAME_READING.size:
+                return jsonify({
+                    'error': f'Batch too large, maximum is {MAX_BATCH_SIZE} readings',
+                    'status': 'error'
+                }), 413
+            try:
+                parsed, errors, duplicates = decode_binary_readings(now)
+            except ReadingError as e:
+                return jsonify({'error': str(e), 'status': 'error'}), 400
+        else:
+            data = request.get_json(silent=True)
+            readings = data.get('readings') if isinstance(data, dict) else data
+            if not isinstance(readings, list):
+                return jsonify({'error': 'Expected a list of readings', 'status': 'error'}), 400
+            if len(readings) > MAX_BATCH_SIZE:
+                return jsonify({
+                    'error': f'Batch too large, maximum is {MAX_BATCH_SIZE} readings',
+                    'status': 'error'
+                }), 413
+
+            parsed = []
+            errors = []
+            for index, raw in enumerate(readings):
+                try:
+                    parsed.append((index, parse_reading(raw, now)))
+                except ReadingError as e:
+                    errors.append({'index': index, 'error': str(e)})
+
+        accepted = buffer_readings(parsed, errors)
+        logger.info(f"Bulk readings received - {accepted} accepted, {len(errors)} rejected, {duplicates} duplicate")
+
+        return jsonify({
+            'status': 'success',
+            'accepted': accepted,
+            'rejected': len(errors),
+            'duplicates': duplicates,
+            'errors': errors,
+            'pending_bins': len(reading_buffer),
+            'flush_interval': READING_FLUSH_INTERVAL
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Error ingesting bulk readings: {e}")
+        return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
+
 # Debug endpoint for testing Arduino connectivity
-@app.route('/api/debug/arduino', methods=['POST'])
+@api.route('/api/debug/arduino', methods=['POST'])
 def debug_arduino():
     """Debug endpoint for Arduino data"""
-    print(f"=== DEBUG ARDUINO REQUEST ===")
-    print(f"Remote IP: {request.remote_addr}")
-    print(f"Headers: {dict(request.headers)}")
-    print(f"Data: {request.get_json()}")
-    print("=" * 40)
+    logger.info("Debug Arduino request", extra={
+        'remote_addr': request.remote_addr, 'headers': dict(request.headers), 'data': request.get_json(silent=True)
+    })
     
     return jsonify({
         'status': 'success',
@@ -314,7 +1466,7 @@ def debug_arduino():
     })
 
 # Test connection endpoint
-@app.route('/api/test/connection', methods=['GET'])
+@api.route('/api/test/connection', methods=['GET'])
 def test_connection():
     """Simple test endpoint"""
     return jsonify({
@@ -322,7 +1474,7 @@ def test_connection():
         'message': 'Server is reachable!',
         'server_time': datetime.utcnow().isoformat()
     })
-@app.errorhandler(Exception)
+@api.app_errorhandler(Exception)
 def handle_exception(e):
     """Handle all unhandled exceptions"""
     logger.error(f"Unhandled exception: {str(e)}")
@@ -332,14 +1484,65 @@ def handle_exception(e):
         'message': 'Something went wrong on our end'
     }), 500
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     return jsonify({
         'error': 'Endpoint not found',
         'status': 'error'
     }), 404
-# Create a new litter alert
-@app.route('/api/alert', methods=['POST'])
+# Alerts within this distance and time of an open alert are merged into it
+ALERT_MERGE_RADIUS_M = float(os.environ.get('ALERT_MERGE_RADIUS_M', 50))
+ALERT_MERGE_WINDOW = timedelta(minutes=float(os.environ.get('ALERT_MERGE_WINDOW_MINUTES', 30)))
+
+def record_litter_alert(location, confidence=0.0, description='', image_url='', bin_id=None, now=None):
+    """Insert an alert, or merge it into the nearest alert seen within the merge window
+
+    Runs in the caller's transaction and returns (alert, merged). The change
+    version is taken first: its row lock serializes concurrent reports, so two
+    scans of the same bin cannot both miss each other and insert.
+    """
+    now = now or datetime.utcnow()
+    version = next_change_version()
+    query = LitterAlert.query.filter(LitterAlert.resolved_at.is_(None), LitterAlert.last_seen >= now - ALERT_MERGE_WINDOW)
+    point = parse_location(location)
+    if point is not None:
+        nearby = query.filter(area_filter(LitterAlert, *radius_bbox(*point, ALERT_MERGE_RADIUS_M))).all()
+        distances = [(distance_m(*point, alert.latitude, alert.longitude), alert) for alert in nearby]
+        distances = [item for item in distances if item[0] <= ALERT_MERGE_RADIUS_M]
+        existing = min(distances, key=lambda item: item[0])[1] if distances else None
+    else:
+        existing = query.filter(LitterAlert.location == location).order_by(LitterAlert.last_seen.desc()).first()
+    
+    if existing is not None:
+        existing.occurrence_count = (existing.occurrence_count or 1) + 1
+        existing.confidence = max(existing.confidence or 0, confidence)
+        existing.last_seen = now
+        existing.version = version
+        if image_url and not existing.image_url:
+            existing.image_url = image_url
+        if bin_id is not None and existing.bin_id is None:
+            existing.bin_id = bin_id
+        publish_event('alert_updated', existing.to_dict())
+        return existing, True
+    
+    alert = LitterAlert(
+        location=location,
+        confidence=confidence,
+        image_url=image_url,
+        description=description,
+        timestamp=now,
+        last_seen=now,
+        occurrence_count=1,
+        version=version,
+        bin_id=bin_id
+    )
+    db.session.add(alert)
+    db.session.flush()
+    publish_event('alert_created', alert.to_dict())
+    return alert, False
+
+# Create a new litter alert, or merge it into a matching recent one
+@api.route('/api/alert', methods=['POST'])
 def create_litter_alert():
     try:
         data = request.get_json()
@@ -349,22 +1552,36 @@ def create_litter_alert():
         location = data.get('location')
         if not location:
             return jsonify({'error': 'Location is required', 'status': 'error'}), 400
+        try:
+            confidence = float(data.get('confidence') or 0.0)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'confidence must be a number', 'status': 'error'}), 400
+        bin_id = data.get('bin_id')
+        if bin_id is not None:
+            if isinstance(bin_id, bool) or not isinstance(bin_id, int):
+                return jsonify({'error': 'bin_id must be an integer', 'status': 'error'}), 400
+            if not db.session.get(SmartBin, bin_id):
+                return jsonify({'error': 'Bin not found', 'status': 'error'}), 404
         
-        new_alert = LitterAlert(
-            location=location,
-            confidence=data.get('confidence', 0.0),
-            image_url=data.get('image_url', ''),
+        alert, merged = record_litter_alert(
+            location,
+            confidence=confidence,
             description=data.get('description', ''),
-            timestamp=datetime.utcnow()
+            image_url=data.get('image_url', ''),
+            bin_id=bin_id
         )
-        db.session.add(new_alert)
         db.session.commit()
         
-        logger.info(f"Created new alert at {location}")
+        if merged:
+            logger.info(f"Merged alert at {location} into alert {alert.id} ({alert.occurrence_count} reports)")
+        else:
+            logger.info(f"Created new alert at {location}")
         return jsonify({
-            'message': 'Alert created successfully', 
+            'message': 'Alert merged into an existing alert' if merged else 'Alert created successfully',
             'status': 'success',
-            'alert_id': new_alert.id
+            'alert_id': alert.id,
+            'merged': merged,
+            'occurrence_count': alert.occurrence_count
         })
         
     except Exception as e:
@@ -373,7 +1590,7 @@ def create_litter_alert():
         return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
 
 # Get bin by ID
-@app.route('/api/bin/<int:bin_id>', methods=['GET'])
+@api.route('/api/bin/<int:bin_id>', methods=['GET'])
 def get_bin(bin_id):
     try:
         bin = SmartBin.query.get(bin_id)
@@ -388,25 +1605,233 @@ def get_bin(bin_id):
         return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
 
 # Get all bins
-@app.route('/api/bins', methods=['GET'])
+@api.route('/api/bins', methods=['GET'])
 def get_all_bins():
     try:
-        bins = SmartBin.query.order_by(SmartBin.id).all()
-        return jsonify({
+        if 'bbox' in request.args or 'near' in request.args:
+            return get_bins_in_area()
+        
+        # Priority lists come straight off the fill_state index
+        if 'state' in request.args:
+            state = request.args['state']
+            if state == 'stuck':
+                query = SmartBin.query.filter(SmartBin.sensor_stuck.is_(True))
+            elif state in STATES:
+                query = SmartBin.query.filter(SmartBin.fill_state == state)
+            else:
+                return jsonify({'error': f"state must be one of {', '.join(STATES)}, stuck", 'status': 'error'}), 400
+            bins = [bin.to_dict() for bin in query.order_by(SmartBin.id)]
+            return list_response({'status': 'success', 'state': state, 'bins': bins, 'count': len(bins)}, ('bins',))
+        
+        snapshot = get_dashboard_snapshot()
+        bins = snapshot['bins']
+        return list_response({
             'status': 'success',
-            'bins': [bin.to_dict() for bin in bins],
+            'bins': bins,
             'count': len(bins)
-        })
+        }, ('bins',), snapshot)
     except Exception as e:
         logger.error(f"Error getting all bins: {e}")
         return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
 
+def get_bins_in_area():
+    """Bins and alerts inside ?bbox=minLat,minLng,maxLat,maxLng or within ?near=lat,lng&radius=metres"""
+    center = None
+    if 'near' in request.args:
+        center = parse_location(request.args['near'])
+        radius = request.args.get('radius', 500, type=float)
+        if center is None or not (0 < radius <= 50000):
+            return jsonify({'error': 'near must be "lat,lng" and radius between 0 and 50000 metres', 'status': 'error'}), 400
+        bbox = radius_bbox(center[0], center[1], radius)
+    else:
+        try:
+            bbox = [float(part) for part in request.args['bbox'].split(',')]
+        except ValueError:
+            bbox = []
+        if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            return jsonify({'error': 'bbox must be "minLat,minLng,maxLat,maxLng"', 'status': 'error'}), 400
+    
+    bins = SmartBin.query.filter(area_filter(SmartBin, *bbox)).order_by(SmartBin.id).all()
+    alerts = LitterAlert.query.filter(
+        area_filter(LitterAlert, *bbox), LitterAlert.resolved_at.is_(None)
+    ).order_by(LitterAlert.timestamp.desc()).all()
+    
+    bin_dicts = [bin.to_dict() for bin in bins]
+    alert_dicts = [alert.to_dict() for alert in alerts]
+    if center is not None:
+        # The box is a superset of the circle, so trim the corners and sort by distance
+        for item in bin_dicts + alert_dicts:
+            item['distance_m'] = round(distance_m(center[0], center[1], item['latitude'], item['longitude']), 1)
+        bin_dicts = sorted((item for item in bin_dicts if item['distance_m'] <= radius), key=lambda item: item['distance_m'])
+        alert_dicts = sorted((item for item in alert_dicts if item['distance_m'] <= radius), key=lambda item: item['distance_m'])
+    
+    return list_response({
+        'status': 'success',
+        'bins': bin_dicts,
+        'alerts': alert_dicts,
+        'count': len(bin_dicts),
+        'alert_count': len(alert_dicts),
+        'bbox': bbox
+    }, ('bins', 'alerts'))
+
+# Bins predicted to be full within the next ?within= hours, soonest first
+@api.route('/api/bins/forecast', methods=['GET'])
+def get_bin_forecast():
+    try:
+        within = float_arg('within')
+        within = 24.0 if within is None else within
+        if not 0 < within < float('inf'):
+            return jsonify({'error': 'within must be a positive number of hours', 'status': 'error'}), 400
+        limit = page_size(request.args.get('limit'))
+        now = datetime.utcnow()
+        due = SmartBin.query.filter(SmartBin.predicted_full_at <= now + timedelta(hours=within))
+        bins = due.order_by(SmartBin.predicted_full_at, SmartBin.id).limit(limit).all()
+        return jsonify({
+            'status': 'success',
+            'within_hours': within,
+            'total_due': due.count(),
+            'limit': limit,
+            'bins': [{
+                **bin.to_dict(),
+                'hours_to_full': round(max(0.0, (bin.predicted_full_at - now).total_seconds() / 3600), 2)
+            } for bin in bins]
+        })
+    except CursorError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 400
+    except Exception as e:
+        logger.error(f"Error getting bin forecast: {e}")
+        return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
+
+# Refit every bin's fill forecast from its history now
+@api.route('/api/bins/forecast/refit', methods=['POST'])
+def trigger_forecast_refit():
+    try:
+        return jsonify({'status': 'success', **refit_forecasts()})
+    except Exception as e:
+        logger.error(f"Error refitting forecasts: {e}")
+        return jsonify({'error': str(e), 'status': 'error'}), 500
+
+# Get a bin's fill level history
+@api.route('/api/bin/<int:bin_id>/history', methods=['GET'])
+def get_bin_history(bin_id):
+    """Return fill levels over a time range from raw readings or the coarsest fitting rollup"""
+    try:
+        if not db.session.get(SmartBin, bin_id):
+            return jsonify({'error': 'Bin not found', 'status': 'error'}), 404
+
+        now = datetime.utcnow()
+        try:
+            end = parse_timestamp(request.args.get('to') or None, now, max_skew=None)
+            start = parse_timestamp(request.args.get('from') or None, end - timedelta(days=1), max_skew=None)
+        except ReadingError as e:
+            return jsonify({'error': f'Invalid from/to: {e}', 'status': 'error'}), 400
+        if start >= end:
+            return jsonify({'error': 'from must be before to', 'status': 'error'}), 400
+
+        requested = request.args.get('resolution', 'auto')
+        if requested != 'auto' and requested != 'raw' and requested not in RESOLUTIONS:
+            return jsonify({
+                'error': f"resolution must be one of auto, raw, {', '.join(RESOLUTIONS)}",
+                'status': 'error'
+            }), 400
+        # Fine resolutions over long ranges are answered from a coarser store instead,
+        # so no request returns more than MAX_POINTS points
+        kept_since = history_kept_since(now)
+        resolution = requested
+        if requested == 'auto' or (
+            requested in RESOLUTIONS and (end - start).total_seconds() / RESOLUTIONS[requested] > MAX_POINTS
+        ):
+            resolution = choose_resolution(start, end, kept_since=kept_since)
+
+        points = None
+        if resolution == 'raw':
+            points = BinReading.query.filter(
+                BinReading.bin_id == bin_id,
+                BinReading.timestamp >= start,
+                BinReading.timestamp < end
+            ).order_by(BinReading.timestamp).limit(MAX_POINTS + 1).all()
+            if len(points) > MAX_POINTS:
+                resolution = choose_resolution(start, end, kept_since={**kept_since, 'raw': end})
+                points = None
+        if points is None:
+            points = BinReadingRollup.query.filter(
+                BinReadingRollup.bin_id == bin_id,
+                BinReadingRollup.resolution == resolution,
+                BinReadingRollup.bucket >= bucket_start(start, resolution),
+                BinReadingRollup.bucket < end
+            ).order_by(BinReadingRollup.bucket).all()
+
+        return jsonify({
+            'status': 'success',
+            'bin_id': bin_id,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'resolution': resolution,
+            'coarsened': requested not in ('auto', resolution),
+            'points': [point.to_dict() for point in points],
+            'count': len(points)
+        })
+    except Exception as e:
+        logger.error(f"Error getting history for bin {bin_id}: {e}")
+        return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
+
+# Shared dashboard snapshot cache counters
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        'status': 'success',
+        'snapshot': snapshot_cache.stats()
+    })
+
+# Archive resolved alerts and complaints past retention now
+@api.route('/api/retention/run', methods=['POST'])
+def trigger_retention():
+    try:
+        result = run_retention()
+        return jsonify({
+            'status': 'success',
+            'retention_days': RETENTION_DAYS,
+            'raw_history_days': RAW_HISTORY_DAYS,
+            'minute_rollup_days': MINUTE_ROLLUP_DAYS,
+            **result
+        })
+    except Exception as e:
+        logger.error(f"Error running retention: {e}")
+        return jsonify({'error': str(e), 'status': 'error'}), 500
+
+# Archived months per table, readable through /api/generate-report?archived=true
+@api.route('/api/archive', methods=['GET'])
+def get_archive():
+    return jsonify({
+        'status': 'success',
+        'retention_days': RETENTION_DAYS,
+        'tables': {
+            table: {**stats, 'month_list': archive_store.months(table)}
+            for table, stats in archive_store.stats().items()
+        }
+    })
+
 # Clear all alerts
-@app.route('/api/alerts/clear', methods=['DELETE'])
+@api.route('/api/alerts/clear', methods=['DELETE'])
 def clear_all_alerts():
     try:
-        # Delete all alerts from database
-        deleted_count = LitterAlert.query.delete()
+        # Resolve every open alert, leaving tombstones for delta sync; rows stay for history
+        version = next_change_version()
+        db.session.execute(Tombstone.__table__.insert().from_select(
+            ['table_name', 'object_id', 'version'],
+            db.select(db.literal('litter_alert'), LitterAlert.id, db.literal(version)).where(LitterAlert.resolved_at.is_(None))
+        ))
+        db.session.execute(StreamEvent.__table__.insert().from_select(
+            ['event_type', 'payload', 'created'],
+            db.select(
+                db.literal('alert_resolved'),
+                db.literal('{"id":') + db.cast(LitterAlert.id, db.String) + db.literal('}'),
+                db.literal(datetime.utcnow())
+            ).where(LitterAlert.resolved_at.is_(None))
+        ))
+        deleted_count = LitterAlert.query.filter(LitterAlert.resolved_at.is_(None)).update(
+            {LitterAlert.resolved_at: datetime.utcnow()}, synchronize_session=False
+        )
         db.session.commit()
         
         logger.info(f"Cleared {deleted_count} alerts")
@@ -421,154 +1846,380 @@ def clear_all_alerts():
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
 # Get optimized routes
-@app.route('/api/optimize-routes', methods=['GET'])
+ROUTE_DEPOT = os.environ.get('ROUTE_DEPOT', '28.7402,77.1234')
+TRUCK_CAPACITY = float(os.environ.get('TRUCK_CAPACITY', 40))  # In full-bin loads
+ALERT_DEMAND = 0.5  # Truck load assumed for clearing one litter alert
+
+@api.route('/api/optimize-routes', methods=['GET'])
 def optimize_routes():
+    """Plan collection trips from the depot through full bins and open litter alerts"""
     try:
-        bins = SmartBin.query.all()
-        alerts = LitterAlert.query.all()
+        # Without an explicit threshold, use the incrementally kept full state
+        threshold = float_arg('threshold')
+        # Also collect bins forecast to be full within this many hours
+        within = float_arg('within')
+        trucks = int_arg('trucks')
+        trucks = 1 if trucks is None else trucks
+        if trucks < 1:
+            return jsonify({'error': 'trucks must be a positive integer', 'status': 'error'}), 400
+        capacity = float_arg('capacity')
+        capacity = TRUCK_CAPACITY if capacity is None else capacity
+        if not capacity > 0:
+            return jsonify({'error': 'capacity must be a positive number', 'status': 'error'}), 400
+        time_limit = float_arg('time_limit')
+        time_limit = min(30.0, max(0.1, 5.0 if time_limit is None else time_limit))
+        include_alerts = request.args.get('include_alerts', 'true').lower() != 'false'
+        
+        depot = parse_location(request.args.get('depot', ROUTE_DEPOT))
+        if depot is None:
+            return jsonify({'error': 'depot must be "lat,lng"', 'status': 'error'}), 400
+        
+        total_bins = SmartBin.query.count()
+        due = SmartBin.fill_state == FULL if threshold is None else SmartBin.fill_level > threshold
+        if within is not None:
+            due = or_(due, SmartBin.predicted_full_at <= datetime.utcnow() + timedelta(hours=within))
+        full_bins = SmartBin.query.filter(due).order_by(SmartBin.id).all()
+        alerts = LitterAlert.query.filter(LitterAlert.resolved_at.is_(None)).order_by(LitterAlert.timestamp).all() if include_alerts else []
+        
+        stops = []
+        coords = []
+        demands = []
+        skipped = 0
+        for bin in full_bins:
+            point = parse_location(bin.location)
+            if point is None:
+                skipped += 1
+                continue
+            stops.append({
+                'type': 'bin', 'id': bin.id, 'name': bin.name, 'fill_level': bin.fill_level,
+                'predicted_full_at': bin.predicted_full_at.isoformat() if bin.predicted_full_at else None
+            })
+            coords.append(point)
+            demands.append(bin.fill_level / 100.0)
+        for alert in alerts:
+            point = parse_location(alert.location)
+            if point is None:
+                skipped += 1
+                continue
+            stops.append({'type': 'alert', 'id': alert.id, 'description': alert.description})
+            coords.append(point)
+            demands.append(ALERT_DEMAND)
+        for stop, (lat, lng) in zip(stops, coords):
+            stop['lat'], stop['lng'] = lat, lng
+        
+        priority_bins = sum(1 for stop in stops if stop['type'] == 'bin')
+        alerts_to_clear = len(stops) - priority_bins
         
-        # Simple optimization logic - group by area and prioritize full bins
-        full_bins = [bin for bin in bins if bin.fill_level > 80]
-        medium_bins = [bin for bin in bins if 50 <= bin.fill_level <= 80]
-        alerts_list = [alert for alert in alerts]
+        if not stops:
+            return jsonify({
+                'efficiency_gain': 0,
+                'priority_bins': 0,
+                'alerts_to_clear': 0,
+                'total_bins': total_bins,
+                'suggested_route': 'No collections needed',
+                'routes': [],
+                'total_distance_km': 0,
+                'naive_distance_km': 0,
+                'distance_saved_km': 0,
+                'skipped_stops': skipped,
+                'status': 'success'
+            })
+        
+        # Imported on first use: routing is numpy throughout and most workers never plan a route
+        from routing import solve
+        plan = solve(depot, coords, demands, capacity=capacity, trucks=trucks, time_limit=time_limit)
+        for route in plan['routes']:
+            route['stops'] = [stops[index] for index in route['stops']]
         
-        # Calculate efficiency gain (simplified)
-        efficiency_gain = min(50, len(full_bins) * 5 + len(alerts_list) * 3)
+        naive = plan['naive_distance_km']
+        efficiency_gain = round(100 * plan['distance_saved_km'] / naive, 1) if naive else 0
         
+        logger.info(f"Optimized {len(stops)} stops into {len(plan['routes'])} trips in {plan['solve_time_ms']} ms")
         return jsonify({
             'efficiency_gain': efficiency_gain,
-            'priority_bins': len(full_bins),
-            'alerts_to_clear': len(alerts_list),
-            'total_bins': len(bins),
-            'suggested_route': f'Start → {len(full_bins)} full bins → {len(alerts_list)} alerts',
-            'status': 'success'
+            'priority_bins': priority_bins,
+            'alerts_to_clear': alerts_to_clear,
+            'total_bins': total_bins,
+            'suggested_route': f"Depot → {priority_bins} full bins + {alerts_to_clear} alerts in {len(plan['routes'])} trips, {plan['total_distance_km']} km",
+            'depot': {'lat': depot[0], 'lng': depot[1]},
+            'threshold': threshold,
+            'within_hours': within,
+            'skipped_stops': skipped,
+            'status': 'success',
+            **plan
         })
+    except CursorError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 400
     except Exception as e:
         logger.error(f"Error optimizing routes: {e}")
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
-# Generate PDF report
-@app.route('/api/generate-report', methods=['GET'])
+# Rows fetched per round trip when streaming report exports
+REPORT_BATCH_SIZE = 1000
+
+REPORT_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+if encoding.msgpack is not None:
+    REPORT_FORMATS['msgpack'] = encoding.MSGPACK
+
+# Columns exported per section, shared by live rows and archived ones
+REPORT_ALERT_COLUMNS = ['id', 'location', 'confidence', 'timestamp', 'description', 'image_url',
+                        'latitude', 'longitude', 'occurrence_count', 'resolved_at']
+REPORT_COMPLAINT_COLUMNS = ['id', 'bin_id', 'complaint_type', 'description', 'location', 'timestamp', 'status']
+
+REPORT_CSV_COLUMNS = ['record', 'id', 'name', 'bin_id', 'complaint_type', 'status', 'location', 'fill_level',
+                      'confidence', 'occurrence_count', 'timestamp', 'resolved_at', 'description', 'image_url',
+                      'latitude', 'longitude', 'archived']
+
+def report_summary(alert_filter):
+    """Report totals computed by the database rather than over loaded rows"""
+    total_bins, average_fill, full_bins = db.session.query(
+        db.func.count(SmartBin.id),
+        db.func.avg(SmartBin.fill_level),
+        db.select(db.func.count(SmartBin.id)).where(SmartBin.fill_state == FULL).correlate(None).scalar_subquery()
+    ).one()
+    total_alerts = db.session.query(db.func.count(LitterAlert.id)).filter(*alert_filter).scalar()
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'total_bins': total_bins,
+        'total_alerts': total_alerts,
+        'average_fill_level': float(average_fill or 0),
+        'full_bins': int(full_bins or 0),
+        'co2_reduction': min(100, total_bins * 3 + total_alerts * 2)
+    }
+
+def report_rows(statement, options):
+    """Yield mappings from a select in batches instead of materializing the result
+
+    yield_per turns on server-side cursors where the driver supports them
+    (psycopg2), so only one batch is ever held in memory.
+    """
+    convert = encoding.epoch_ms if options['epoch'] else datetime.isoformat
+    result = db.session.execute(statement.execution_options(yield_per=REPORT_BATCH_SIZE))
+    for row in result.mappings():
+        row = dict(row)
+        for key in ('timestamp', 'resolved_at'):
+            if row.get(key):
+                row[key] = convert(row[key])
+        yield row
+
+def report_bin_rows(options):
+    return report_rows(db.select(
+        SmartBin.id, SmartBin.name, SmartBin.location,
+        db.func.round(SmartBin.fill_level).label('fill_level'),
+        SmartBin.last_updated.label('timestamp'),
+        SmartBin.latitude, SmartBin.longitude
+    ).order_by(SmartBin.id), options)
+
+def report_table_rows(model, columns, options):
+    """Archived rows in the time range (oldest, when requested) followed by live ones"""
+    table = model.__tablename__
+    if options['archived']:
+        for row in archive_store.read(table, options['start'], options['end']):
+            row = {**{column: row.get(column) for column in columns}, 'archived': True}
+            yield encoding.with_epoch(row) if options['epoch'] else row
+    condition = time_range_filter(db.select(model.id), model).whereclause
+    yield from report_rows(db.select(*(getattr(model, column) for column in columns)).filter(
+        *([] if condition is None else [condition])
+    ).order_by(model.timestamp, model.id), options)
+
+def report_sections(sections, options):
+    if 'bins' in sections:
+        yield 'bins', report_bin_rows(options)
+    if 'alerts' in sections:
+        yield 'alerts', report_table_rows(LitterAlert, REPORT_ALERT_COLUMNS, options)
+    if 'complaints' in sections:
+        yield 'complaints', report_table_rows(QRComplaint, REPORT_COMPLAINT_COLUMNS, options)
+
+def stream_report_json(summary, sections, options):
+    """The original single-document layout, written out row by row"""
+    yield json.dumps(summary)[:-1]
+    for name, rows in report_sections(sections, options):
+        yield f', "{name}": ['
+        for index, row in enumerate(rows):
+            yield (',' if index else '') + json.dumps(row)
+        yield ']'
+    yield ', "status": "success"}\n'
+
+def stream_report_ndjson(summary, sections, options):
+    yield json.dumps({'record': 'summary', **summary}) + '\n'
+    for name, rows in report_sections(sections, options):
+        record = name[:-1]
+        batch = []
+        for row in rows:
+            batch.append(json.dumps({'record': record, **row}))
+            if len(batch) >= REPORT_BATCH_SIZE:
+                yield '\n'.join(batch) + '\n'
+                batch = []
+        if batch:
+            yield '\n'.join(batch) + '\n'
+
+def stream_report_csv(summary, sections, options):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=REPORT_CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for name, rows in report_sections(sections, options):
+        record = name[:-1]
+        for row in rows:
+            writer.writerow({'record': record, **row})
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
+
+def report_columns(batch):
+    # Archived and live rows can share a batch, so take the union of their fields
+    fields = {field: None for row in batch for field in row}
+    return {field: [row.get(field) for row in batch] for field in fields}
+
+def stream_report_msgpack(summary, sections, options):
+    """Concatenated MessagePack maps: the summary, then each section in columnar batches"""
+    yield encoding.dumps({'record': 'summary', **summary}, encoding.MSGPACK)
+    for name, rows in report_sections(sections, options):
+        record = name[:-1]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= REPORT_BATCH_SIZE:
+                yield encoding.dumps({'record': record, 'columns': report_columns(batch)}, encoding.MSGPACK)
+                batch = []
+        if batch:
+            yield encoding.dumps({'record': record, 'columns': report_columns(batch)}, encoding.MSGPACK)
+
+REPORT_STREAMS = {
+    'json': stream_report_json,
+    'ndjson': stream_report_ndjson,
+    'csv': stream_report_csv,
+    'msgpack': stream_report_msgpack,
+}
+
+# Generate report data, streamed as JSON, NDJSON or CSV
+@api.route('/api/generate-report', methods=['GET'])
 def generate_report():
     try:
-        bins = SmartBin.query.all()
-        alerts = LitterAlert.query.all()
+        default_format = 'msgpack' if response_representation()[0] == encoding.MSGPACK else 'json'
+        report_format = request.args.get('format', default_format)
+        if report_format not in REPORT_FORMATS:
+            return jsonify({'error': f"format must be one of {', '.join(REPORT_FORMATS)}", 'status': 'error'}), 400
+        include = request.args.get('include', 'all')
+        sections = ('bins', 'alerts', 'complaints') if include == 'all' else tuple(include.split(','))
+        if not set(sections) <= {'bins', 'alerts', 'complaints'}:
+            return jsonify({'error': 'include must be all or a list of bins, alerts, complaints', 'status': 'error'}), 400
         
-        report_data = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'total_bins': len(bins),
-            'total_alerts': len(alerts),
-            'average_fill_level': sum(bin.fill_level for bin in bins) / len(bins) if bins else 0,
-            'full_bins': len([bin for bin in bins if bin.fill_level > 80]),
-            'co2_reduction': min(100, len(bins) * 3 + len(alerts) * 2),
-            'bins': [bin.to_dict() for bin in bins],
-            'alerts': [alert.to_dict() for alert in alerts],
-            'status': 'success'
+        # from/to apply to alert and complaint timestamps; bins are always their current state
+        start, end = request_time_range()
+        options = {
+            'start': start,
+            'end': end,
+            'archived': request.args.get('archived', 'false').lower() == 'true',
+            'epoch': response_representation()[1]
         }
+        alert_filter = time_range_filter(db.select(LitterAlert.id), LitterAlert).whereclause
+        summary = report_summary([] if alert_filter is None else [alert_filter])
         
-        logger.info("Generated PDF report data")
-        return jsonify(report_data)
+        response = Response(
+            stream_with_context(REPORT_STREAMS[report_format](summary, sections, options)),
+            mimetype=REPORT_FORMATS[report_format]
+        )
+        if report_format != 'json':
+            filename = f"report-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{report_format}"
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        logger.info(f"Streaming {report_format} report ({summary['total_alerts']} alerts)")
+        return response
+    except CursorError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 400
     except Exception as e:
         logger.error(f"Error generating report: {e}")
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
-# Health check endpoint
-@app.route('/api/health', methods=['GET'])
+# Health check endpoint (table counts come from the background refresher)
+@api.route('/api/health', methods=['GET'])
 def health_check():
     try:
-        # Test database connection
-        bin_count = SmartBin.query.count()
-        alert_count = LitterAlert.query.count()
-        simulated_bins = SmartBin.query.filter(SmartBin.id > 1).count()
+        db.session.execute(text('SELECT 1'))
         
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
-            'bin_count': bin_count,
-            'simulated_bins': simulated_bins,
-            'alert_count': alert_count,
+            'bin_count': table_stats.get('bin_count'),
+            'simulated_bins': table_stats.get('simulated_bins'),
+            'alert_count': table_stats.get('alert_count'),
             'timestamp': datetime.utcnow().isoformat(),
             'server_time': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
         })
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
-# Generate QR Code for specific bin
-@app.route('/api/bin/<int:bin_id>/qr', methods=['GET'])
-# Add this function to generate permanent QR codes (PUT THIS AFTER THE MODELS)
-def generate_permanent_qr_code(bin_id, bin_name, bin_location):
-    """Generate permanent QR code with actual complaint form URL"""
+
+# Prometheus metrics for every worker
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Liveness probe: the process is serving requests, never touches the database
+@api.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    return jsonify({'status': 'alive', 'pid': os.getpid(), 'timestamp': datetime.utcnow().isoformat()})
+
+# Readiness probe: one pooled round trip plus cached stats and background thread health
+@api.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    threads_ok, threads = heartbeats.status()
+    started = time.perf_counter()
     try:
-        # Clean the data to avoid any encoding issues
-        clean_bin_name = bin_name.replace(':', '-') if bin_name else f"Bin-{bin_id}"
-        clean_location = bin_location.replace(':', '-') if bin_location else "Unknown-Location"
-        
-        # ✅ FIX: Create actual URL that redirects to complaint form
-        base_url = "https://swachh-doot-2-o.onrender.com"
-        complaint_url = f"{base_url}/complaint?bin_id={bin_id}&name={clean_bin_name}&location={clean_location}"
+        db.session.execute(text('SELECT 1'))
+        database = {'status': 'connected', 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+    except Exception as e:
+        logger.error(f"Readiness check failed: {e}")
+        database = {'status': 'unavailable', 'error': str(e)}
+    
+    ready = threads_ok and database['status'] == 'connected'
+    return jsonify({
+        'status': 'ready' if ready else 'not_ready',
+        'database': database,
+        'pool': pool_status(db.engine.pool),
+        'threads': threads,
+        'table_stats': table_stats,
+        'timestamp': datetime.utcnow().isoformat()
+    }), 200 if ready else 503
+
+# Serve a bin's permanent QR code image from the content-addressed cache
+@api.route('/api/bin/<int:bin_id>/qr.<image_format>', methods=['GET'])
+def get_bin_qr_image(bin_id, image_format):
+    try:
+        if image_format not in IMAGE_FORMATS:
+            return jsonify({'error': 'Unsupported image format', 'status': 'error'}), 404
         
-        # Use the actual URL as QR data (this will open the complaint form directly)
-        qr_data = complaint_url
+        bin = db.session.get(SmartBin, bin_id)
+        if not bin:
+            return jsonify({'error': 'Bin not found', 'status': 'error'}), 404
         
-        print(f"Generating QR for: {qr_data}")  # Debug log
+        qr_data = complaint_url(bin.id, bin.name or f"Bin {bin.id}", bin.location)
+        digest = qr_digest(qr_data)
+        if request.if_none_match.contains(digest):
+            response = current_app.response_class(status=304)
+        else:
+            digest, path = qr_image_cache.get(qr_data, image_format)
+            response = send_file(path, mimetype=IMAGE_FORMATS[image_format])
         
-        # Check if PIL is available
-        try:
-            import PIL
-            # Generate QR code with error handling
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=8,
-                border=2,
-            )
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convert to base64
-            buffer = io.BytesIO()
-            img.save(buffer, format='PNG', optimize=True)
-            buffer.seek(0)
-            
-            img_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
-            print(f"✅ QR generated successfully for bin {bin_id}")
-            return img_str, qr_data
-            
-        except ImportError:
-            # PIL is not available, use SVG placeholder
-            print(f"⚠️ PIL not available, using SVG placeholder for bin {bin_id}")
-            return generate_svg_placeholder(qr_data, bin_id, clean_bin_name), qr_data
+        response.set_etag(digest)
+        if request.args.get('v') == digest:
+            # Versioned URLs change whenever the payload does, so they never go stale
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response.headers['Cache-Control'] = 'public, max-age=300'
+        return response
         
     except Exception as e:
-        logger.error(f"Error in generate_permanent_qr_code for bin {bin_id}: {e}")
-        # Fallback to simple URL
-        base_url = "https://swachh-doot-2-o.onrender.com"
-        fallback_url = f"{base_url}/complaint?bin_id={bin_id}"
-        return generate_svg_placeholder(fallback_url, bin_id, bin_name), fallback_url
-
-def generate_svg_placeholder(qr_data, bin_id, bin_name):
-    """Generate an SVG placeholder when PIL is not available"""
-    # Create a simple SVG placeholder that shows it's clickable
-    svg_content = f'''<svg width="140" height="140" viewBox="0 0 140 140" xmlns="http://www.w3.org/2000/svg">
-        <rect width="140" height="140" fill="#f8f9fa" stroke="#3498db" stroke-width="2" rx="8"/>
-        <text x="70" y="30" text-anchor="middle" font-family="Arial, sans-serif" font-size="12" fill="#2c3e50" font-weight="bold">SCAN ME</text>
-        <text x="70" y="50" text-anchor="middle" font-family="Arial, sans-serif" font-size="10" fill="#666">{bin_name}</text>
-        <text x="70" y="65" text-anchor="middle" font-family="Arial, sans-serif" font-size="8" fill="#999">Bin ID: {bin_id}</text>
-        <rect x="35" y="75" width="70" height="30" fill="#3498db" rx="4"/>
-        <text x="70" y="95" text-anchor="middle" font-family="Arial, sans-serif" font-size="9" fill="white">Report Issue</text>
-        <text x="70" y="115" text-anchor="middle" font-family="Arial, sans-serif" font-size="6" fill="#999">Tap to open form</text>
-    </svg>'''
-    
-    # Convert SVG to data URL
-    svg_bytes = svg_content.encode('utf-8')
-    svg_data_url = f"data:image/svg+xml;base64,{base64.b64encode(svg_bytes).decode('utf-8')}"
-    
-    return svg_data_url
+        logger.error(f"Error serving QR image for bin {bin_id}: {e}")
+        return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
+
 # Add this simple QR codes endpoint BEFORE the get_all_qr_codes endpoint
-@app.route('/api/bins/simple-qr-codes', methods=['GET'])
+@api.route('/api/bins/simple-qr-codes', methods=['GET'])
 def get_simple_qr_codes():
     """Simplified endpoint that returns bin info without QR codes"""
     try:
@@ -597,13 +2248,11 @@ def get_simple_qr_codes():
         logger.error(f"Error in get_simple_qr_codes: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 # Add endpoint to get all permanent QR codes at once (ADD THIS NEW ENDPOINT)
-@app.route('/api/bins/qr-codes', methods=['GET'])
+@api.route('/api/bins/qr-codes', methods=['GET'])
 def get_all_qr_codes():
     try:
-        print("=== GET ALL QR CODES START ===")
-        
         bins = SmartBin.query.all()
-        print(f"Found {len(bins)} bins in database")
+        logger.debug(f"Building QR code URLs for {len(bins)} bins")
         
         if not bins:
             return jsonify({
@@ -617,33 +2266,30 @@ def get_all_qr_codes():
         successful = 0
         failed = 0
         
+        # Only URLs are returned; images are rendered once and cached by /api/bin/<id>/qr.png
         for bin in bins:
             try:
-                print(f"Generating QR for bin {bin.id}: {bin.name}")
-                
-                qr_image, qr_data = generate_permanent_qr_code(
-                    bin_id=bin.id,
-                    bin_name=bin.name or f"Bin {bin.id}",
-                    bin_location=bin.location
-                )
+                qr_data = complaint_url(bin.id, bin.name or f"Bin {bin.id}", bin.location)
+                digest = qr_digest(qr_data)
+                qr_url = url_for('api.get_bin_qr_image', bin_id=bin.id, image_format='png', v=digest, _external=True)
                 
                 qr_codes.append({
                     'bin_id': bin.id,
                     'bin_name': bin.name,
                     'location': bin.location,
-                    'qr_code': f"data:image/png;base64,{qr_image}",
+                    'qr_code': qr_url,
+                    'qr_code_svg': url_for('api.get_bin_qr_image', bin_id=bin.id, image_format='svg', v=digest, _external=True),
+                    'qr_hash': digest,
                     'qr_data': qr_data
                 })
                 successful += 1
-                print(f"✅ Successfully generated QR for bin {bin.id}")
                 
             except Exception as e:
                 failed += 1
                 logger.error(f"Failed to generate QR for bin {bin.id}: {e}")
-                print(f"❌ Failed to generate QR for bin {bin.id}: {e}")
                 # Continue with next bin instead of failing completely
         
-        print(f"=== QR GENERATION COMPLETE: {successful} successful, {failed} failed ===")
+        logger.info(f"QR code URLs built: {successful} successful, {failed} failed")
         
         return jsonify({
             'status': 'success',
@@ -656,25 +2302,154 @@ def get_all_qr_codes():
         
     except Exception as e:
         logger.error(f"Error in get_all_qr_codes: {e}")
-        print(f"❌ CRITICAL ERROR in get_all_qr_codes: {e}")
         return jsonify({
             'error': 'Internal server error',
             'details': str(e)
         }), 500
-@app.route('/api/debug/qr-error', methods=['GET'])
+# Start a bulk QR print-sheet job
+@api.route('/api/qr-sheets', methods=['POST'])
+def create_qr_sheet_job():
+    """Render QR stickers for many bins into a printable A4 PDF in a background process"""
+    try:
+        data = request.get_json(silent=True) or {}
+        bin_ids = data.get('bin_ids')
+        if bin_ids is not None:
+            if not isinstance(bin_ids, list) or not bin_ids or not all(
+                isinstance(bin_id, int) and not isinstance(bin_id, bool) for bin_id in bin_ids
+            ):
+                return jsonify({'error': 'bin_ids must be a non-empty list of integers', 'status': 'error'}), 400
+            if len(bin_ids) > QR_SHEET_MAX_BINS:
+                return jsonify({
+                    'error': f'Too many bin_ids, maximum is {QR_SHEET_MAX_BINS}',
+                    'status': 'error'
+                }), 413
+        query = SmartBin.query.order_by(SmartBin.id)
+        if bin_ids is not None:
+            query = query.filter(SmartBin.id.in_(bin_ids))
+        bins = [[bin.id, bin.name, bin.location] for bin in query.with_entities(SmartBin.id, SmartBin.name, SmartBin.location)]
+        if not bins:
+            return jsonify({'error': 'No bins found', 'status': 'error'}), 404
+        
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(qr_sheet_slots.directory, job_id)
+        os.makedirs(job_dir)
+        with open(os.path.join(job_dir, 'bins.json'), 'w') as f:
+            json.dump(bins, f)
+        write_status(job_dir, {
+            'job_id': job_id,
+            'state': 'queued',
+            'worker': os.getpid(),
+            'total': len(bins),
+            'done': 0,
+            'created': datetime.utcnow().isoformat()
+        })
+        
+        try:
+            qr_sheet_queue.put_nowait(job_dir)
+        except queue.Full:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            response = jsonify({'error': 'Too many QR sheet jobs queued, try again later', 'status': 'error'})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(QR_SHEET_RETRY_AFTER)
+            return response
+        
+        logger.info(f"Queued QR sheet job {job_id} for {len(bins)} bins")
+        return jsonify({
+            'status': 'success',
+            'job_id': job_id,
+            'total': len(bins),
+            'status_url': url_for('api.get_qr_sheet_job', job_id=job_id, _external=True),
+            'progress_url': url_for('api.stream_qr_sheet_progress', job_id=job_id, _external=True),
+            'download_url': url_for('api.download_qr_sheets', job_id=job_id, _external=True)
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Error starting QR sheet job: {e}")
+        return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
+
+def qr_job_dir(job_id):
+    """Return the job directory, or None for unknown or malformed ids"""
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return None
+    job_dir = os.path.join(qr_sheet_slots.directory, job_id)
+    return job_dir if os.path.isdir(job_dir) else None
+
+# Get a QR print-sheet job's progress
+@api.route('/api/qr-sheets/<job_id>', methods=['GET'])
+def get_qr_sheet_job(job_id):
+    job_dir = qr_job_dir(job_id)
+    if not job_dir:
+        return jsonify({'error': 'Job not found', 'status': 'error'}), 404
+    return jsonify({'status': 'success', 'job': read_status(job_dir)})
+
+# Stream a QR print-sheet job's progress until it finishes (Server-Sent Events)
+@api.route('/api/qr-sheets/<job_id>/progress', methods=['GET'])
+def stream_qr_sheet_progress(job_id):
+    job_dir = qr_job_dir(job_id)
+    if not job_dir:
+        return jsonify({'error': 'Job not found', 'status': 'error'}), 404
+    
+    # Shares the per-worker limit with live update streams
+    subscriber = event_broker.subscribe(limit=STREAM_MAX_SUBSCRIBERS, listen=False)
+    if subscriber is None:
+        response = jsonify({'error': 'Too many live streams on this worker, poll the job status instead', 'status': 'error'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER)
+        return response
+    
+    def generate():
+        last = None
+        started = changed = time.time()
+        try:
+            while time.time() - started < STREAM_MAX_DURATION and time.time() - changed < QR_SHEET_PROGRESS_IDLE:
+                try:
+                    job = read_status(job_dir)
+                except FileNotFoundError:
+                    # Expired while we watched
+                    return
+                if job != last:
+                    yield f"event: progress\ndata: {json.dumps(job)}\n\n"
+                    last = job
+                    changed = time.time()
+                if job['state'] in ('completed', 'failed'):
+                    return
+                time.sleep(QR_SHEET_PROGRESS_INTERVAL)
+        finally:
+            event_broker.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Download a finished QR print sheet
+@api.route('/api/qr-sheets/<job_id>/download', methods=['GET'])
+def download_qr_sheets(job_id):
+    job_dir = qr_job_dir(job_id)
+    if not job_dir:
+        return jsonify({'error': 'Job not found', 'status': 'error'}), 404
+    job = read_status(job_dir)
+    if job['state'] != 'completed' or not job.get('artifact'):
+        return jsonify({'error': f"Job is {job['state']}", 'status': 'error'}), 409
+    return send_file(
+        os.path.join(job_dir, ARTIFACT_NAME),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f"qr-sheets-{job_id[:8]}.pdf"
+    )
+
+@api.route('/api/debug/qr-error', methods=['GET'])
 def debug_qr_error():
     """Debug endpoint to identify QR code generation issue"""
     try:
-        print("=== QR DEBUG START ===")
-        
         # Test 1: Check if bins exist
         bins = SmartBin.query.all()
-        print(f"Found {len(bins)} bins")
+        logger.info(f"QR debug: found {len(bins)} bins")
         
         # Test 2: Check if we can generate a single QR code
         if bins:
             test_bin = bins[0]
-            print(f"Testing with bin: {test_bin.id}, {test_bin.name}")
+            logger.info(f"QR debug: testing with bin {test_bin.id}, {test_bin.name}")
             
             try:
                 qr_image, qr_data = generate_permanent_qr_code(
@@ -682,23 +2457,23 @@ def debug_qr_error():
                     bin_name=test_bin.name or f"Bin {test_bin.id}",
                     bin_location=test_bin.location
                 )
-                print("✅ QR generation successful")
+                logger.info("QR debug: generation successful")
                 return jsonify({
                     'status': 'success',
                     'message': 'QR generation works',
                     'test_bin': test_bin.to_dict()
                 })
             except Exception as e:
-                print(f"❌ QR generation failed: {e}")
+                logger.error(f"QR debug: generation failed: {e}")
                 return jsonify({'error': f'QR generation failed: {str(e)}'}), 500
         else:
             return jsonify({'error': 'No bins found'}), 404
             
     except Exception as e:
-        print(f"❌ Debug endpoint failed: {e}")
+        logger.error(f"QR debug endpoint failed: {e}")
         return jsonify({'error': f'Debug failed: {str(e)}'}), 500    
 # Quick complaint endpoint via QR scan
-@app.route('/api/complaint/quick', methods=['POST'])
+@api.route('/api/complaint/quick', methods=['POST'])
 def quick_complaint():
     try:
         data = request.get_json()
@@ -727,16 +2502,19 @@ def quick_complaint():
         )
         
         db.session.add(complaint)
-        db.session.commit()
+        db.session.flush()
+        # Contact details stay out of the public stream
+        complaint_payload = complaint.to_dict()
+        complaint_payload.pop('citizen_contact', None)
+        publish_event('complaint_created', complaint_payload)
         
-        # Also create an alert for this complaint
-        alert = LitterAlert(
-            location=bin.location,
+        # Also raise an alert for this complaint, committed with it
+        alert, merged = record_litter_alert(
+            bin.location,
             confidence=0.9,
             description=f"Citizen complaint: {complaint_type} - {description}",
-            timestamp=datetime.utcnow()
+            bin_id=bin.id
         )
-        db.session.add(alert)
         db.session.commit()
         
         logger.info(f"Quick complaint created for bin {bin_id}: {complaint_type}")
@@ -745,6 +2523,8 @@ def quick_complaint():
             'status': 'success',
             'message': 'Complaint submitted successfully',
             'complaint_id': complaint.id,
+            'alert_id': alert.id,
+            'alert_merged': merged,
             'bin_name': bin.name
         })
         
@@ -753,22 +2533,123 @@ def quick_complaint():
         db.session.rollback()
         return jsonify({'error': 'Internal server error'}), 500
 
-# Get all QR complaints
-@app.route('/api/complaints', methods=['GET'])
+def keyset_page(query, model):
+    """Apply ?cursor= and ?limit= to a newest-first query ordered by (timestamp, id)
+
+    The cursor is the position of the last row already sent, so every page
+    is an index range scan no matter how deep the client has paged.
+    """
+    limit = page_size(request.args.get('limit'))
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(tuple_(model.timestamp, model.id) < tuple_(*decode_cursor(cursor)))
+    rows = query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return rows, next_cursor, limit
+
+def request_time_range():
+    """Parse ?from= and ?to= (epoch seconds or ISO 8601) into (start, end) datetimes or None"""
+    try:
+        start = parse_timestamp(request.args['from'], max_skew=None) if request.args.get('from') else None
+        end = parse_timestamp(request.args['to'], max_skew=None) if request.args.get('to') else None
+    except ReadingError as e:
+        raise CursorError(f'Invalid from/to: {e}')
+    return start, end
+
+def int_arg(name):
+    """Parse an optional integer query parameter; present but invalid is an error, not no filter"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise CursorError(f'{name} must be an integer')
+
+def float_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise CursorError(f'{name} must be a number')
+
+def time_range_filter(query, model):
+    """Apply ?from= and ?to= to model.timestamp"""
+    start, end = request_time_range()
+    if start is not None:
+        query = query.filter(model.timestamp >= start)
+    if end is not None:
+        query = query.filter(model.timestamp < end)
+    return query
+
+# Get QR complaints, newest first, one page at a time
+@api.route('/api/complaints', methods=['GET'])
 def get_complaints():
     try:
-        complaints = QRComplaint.query.order_by(QRComplaint.timestamp.desc()).all()
+        query = QRComplaint.query
+        if request.args.get('status'):
+            query = query.filter(QRComplaint.status == request.args['status'])
+        if request.args.get('complaint_type'):
+            query = query.filter(QRComplaint.complaint_type == request.args['complaint_type'])
+        bin_id = int_arg('bin_id')
+        if bin_id is not None:
+            query = query.filter(QRComplaint.bin_id == bin_id)
+        query = time_range_filter(query, QRComplaint)
+        
+        complaints, next_cursor, limit = keyset_page(query, QRComplaint)
         return jsonify({
             'status': 'success',
             'complaints': [complaint.to_dict() for complaint in complaints],
-            'count': len(complaints)
+            'count': len(complaints),
+            'limit': limit,
+            'next_cursor': next_cursor
         })
+    except CursorError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 400
     except Exception as e:
         logger.error(f"Error getting complaints: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Get litter alerts, newest first, one page at a time; status is open or resolved
+@api.route('/api/alerts', methods=['GET'])
+def get_alerts():
+    try:
+        query = time_range_filter(LitterAlert.query, LitterAlert)
+        status = request.args.get('status')
+        if status == 'open':
+            query = query.filter(LitterAlert.resolved_at.is_(None))
+        elif status == 'resolved':
+            query = query.filter(LitterAlert.resolved_at.isnot(None))
+        elif status:
+            return jsonify({'error': 'status must be open or resolved', 'status': 'error'}), 400
+        bin_id = int_arg('bin_id')
+        if bin_id is not None:
+            query = query.filter(LitterAlert.bin_id == bin_id)
+        min_confidence = float_arg('min_confidence')
+        if min_confidence is not None:
+            query = query.filter(LitterAlert.confidence >= min_confidence)
+        
+        alerts, next_cursor, limit = keyset_page(query, LitterAlert)
+        return jsonify({
+            'status': 'success',
+            'alerts': [alert.to_dict() for alert in alerts],
+            'count': len(alerts),
+            'limit': limit,
+            'next_cursor': next_cursor
+        })
+    except CursorError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 400
+    except Exception as e:
+        logger.error(f"Error getting alerts: {e}")
+        return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
+
 # Update complaint status
-@app.route('/api/complaint/<int:complaint_id>', methods=['PUT'])
+@api.route('/api/complaint/<int:complaint_id>', methods=['PUT'])
 def update_complaint(complaint_id):
     try:
         data = request.get_json()
@@ -778,6 +2659,10 @@ def update_complaint(complaint_id):
             return jsonify({'error': 'Complaint not found'}), 404
         
         if 'status' in data:
+            if data['status'] == 'resolved' and complaint.status != 'resolved':
+                complaint.resolved_at = datetime.utcnow()
+            elif data['status'] != 'resolved':
+                complaint.resolved_at = None
             complaint.status = data['status']
         
         db.session.commit()
@@ -795,7 +2680,7 @@ def update_complaint(complaint_id):
 
 # QR Complaint Form Route
 # QR Complaint Form Route - Updated for permanent QR codes (REPLACE THE EXISTING ONE)
-@app.route('/complaint')
+@api.route('/complaint')
 def complaint_form():
     """Serve a simple complaint form when permanent QR is scanned"""
     # Get parameters from URL
@@ -803,12 +2688,9 @@ def complaint_form():
     bin_name = request.args.get('name', f'Bin #{bin_id}')
     bin_location = request.args.get('location', 'Unknown location')
     
-    print(f"=== COMPLAINT FORM ACCESSED ===")
-    print(f"Bin ID: {bin_id}")
-    print(f"Bin Name: {bin_name}") 
-    print(f"Location: {bin_location}")
-    print(f"IP: {request.remote_addr}")
-    print("===============================")
+    logger.info(f"Complaint form accessed for bin {bin_id}", extra={
+        'bin_name': bin_name, 'location': bin_location, 'remote_addr': request.remote_addr
+    })
     
     return f'''
     <!DOCTYPE html>
@@ -969,18 +2851,21 @@ def complaint_form():
     </html>
     '''
 # Add this endpoint to resolve/delete alerts
-@app.route('/api/alert/<int:alert_id>', methods=['DELETE'])
+@api.route('/api/alert/<int:alert_id>', methods=['DELETE'])
 def resolve_alert(alert_id):
     try:
         alert = LitterAlert.query.get(alert_id)
         if not alert:
             return jsonify({'error': 'Alert not found', 'status': 'error'}), 404
         
-        # Delete the alert from database
-        db.session.delete(alert)
-        db.session.commit()
+        # Drop it from dashboards but keep the row until retention archives it
+        if alert.resolved_at is None:
+            db.session.add(Tombstone(table_name='litter_alert', object_id=alert_id, version=next_change_version()))
+            publish_event('alert_resolved', {'id': alert_id})
+            alert.resolved_at = datetime.utcnow()
+            db.session.commit()
         
-        logger.info(f"Alert {alert_id} resolved and deleted")
+        logger.info(f"Alert {alert_id} resolved")
         return jsonify({
             'message': 'Alert resolved successfully', 
             'status': 'success',
@@ -992,51 +2877,50 @@ def resolve_alert(alert_id):
         db.session.rollback()
         return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
 # Manual trigger to update simulated bins
-@app.route('/api/update-simulated-bins', methods=['POST'])
+@api.route('/api/update-simulated-bins', methods=['POST'])
 def manual_update_simulated_bins():
     try:
-        update_simulated_bins()
+        updated = update_simulated_bins()
         return jsonify({
             'status': 'success',
-            'message': 'Simulated bins updated successfully'
+            'message': 'Simulated bins updated successfully',
+            'updated': updated
         })
     except Exception as e:
         logger.error(f"Error in manual update: {e}")
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
 # Error handlers
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found_error(error):
     return jsonify({'error': 'Endpoint not found', 'status': 'error'}), 404
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
 
 if __name__ == '__main__':
-    logger.info("Starting Flask server...")
-    print("=" * 50)
-    print("Eco-Guardian Server")
-    print("=" * 50)
-    print("Starting on: http://192.168.2.100:5000")
-    print("Available endpoints:")
-    print("  GET  /api/dashboard     - Get all data")
-    print("  POST /api/bin/<id>      - Update bin level (for Arduino)")
-    print("  GET  /api/bins          - Get all bins")
-    print("  GET  /api/bin/<id>      - Get specific bin")
-    print("  GET  /api/health        - Health check")
-    print("  POST /api/alert         - Create alert")
-    print("  POST /api/update-simulated-bins - Manual update")
-    print("  GET  /api/test/connection - Test connection")
-    print("  POST /api/debug/arduino - Debug Arduino data")
-    print("=" * 50)
+    app = create_app()
+    start_background_threads(app)
+    logger.info("Starting Eco-Guardian server on http://0.0.0.0:5000", extra={'endpoints': [
+        'GET  /api/dashboard     - Get all data',
+        'POST /api/bin/<id>      - Update bin level (for Arduino)',
+        'POST /api/bins/readings - Bulk upload readings (for gateways)',
+        'GET  /api/bins          - Get all bins',
+        'GET  /api/bin/<id>      - Get specific bin',
+        'GET  /api/health        - Health check',
+        'POST /api/alert         - Create alert',
+        'POST /api/update-simulated-bins - Manual update',
+        'GET  /api/test/connection - Test connection',
+        'POST /api/debug/arduino - Debug Arduino data',
+    ]})
     
     # Display initial bin status
     with app.app_context():
-        bins = SmartBin.query.order_by(SmartBin.id).all()
-        print(f"Initialized {len(bins)} bins:")
-        for bin in bins:
-            print(f"  Bin #{bin.id}: {bin.name or 'No name'} - {bin.fill_level}% full")
+        bin_count = db.session.query(db.func.count(SmartBin.id)).scalar()
+        logger.info(f"Initialized {bin_count} bins")
+        for bin in SmartBin.query.order_by(SmartBin.id).limit(20):
+            logger.info(f"  Bin #{bin.id}: {bin.name or 'No name'} - {bin.fill_level}% full")
     
-app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
@@ -0,0 +1,99 @@
+# archive.py
+"""Compressed monthly archive files for rows moved out of the hot tables
+
+Rows are stored as gzip-compressed NDJSON, one file per table and month:
+
+    <directory>/<table>/<YYYY-MM>.ndjson.gz
+
+Each archive batch is appended as its own gzip member and fsynced before
+the caller deletes the rows, so a crash can at worst archive a batch twice;
+readers skip ids they have already returned from a month.
+"""
+import glob
+import gzip
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+
+def month_key(timestamp):
+    return timestamp.strftime('%Y-%m')
+
+
+class ArchiveStore:
+    """Append-only monthly files; appends are expected from one process at a time"""
+
+    def __init__(self, directory=None):
+        self.directory = None
+        self._lock = threading.Lock()
+        if directory is not None:
+            self.open(directory)
+
+    def open(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def path(self, table, month):
+        return os.path.join(self.directory, table, f"{month}.ndjson.gz")
+
+    def append(self, table, rows, timestamp_field='timestamp'):
+        """Write row dicts to their monthly files and return {month: count}"""
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[month_key(row[timestamp_field])].append(row)
+        os.makedirs(os.path.join(self.directory, table), exist_ok=True)
+        for month, month_rows in by_month.items():
+            path = self.path(table, month)
+            data = ''.join(json.dumps(row, default=_encode) + '\n' for row in month_rows).encode('utf-8')
+            with self._lock:
+                with open(path, 'ab') as f:
+                    f.write(gzip.compress(data))
+                    f.flush()
+                    os.fsync(f.fileno())
+        return {month: len(month_rows) for month, month_rows in by_month.items()}
+
+    def months(self, table):
+        pattern = os.path.join(self.directory, table, '*.ndjson.gz')
+        return sorted(os.path.basename(path)[:7] for path in glob.glob(pattern))
+
+    def read(self, table, start=None, end=None, timestamp_field='timestamp'):
+        """Yield archived rows with start <= timestamp < end, oldest month first
+
+        Timestamps come back as ISO strings, as in the export formats.
+        """
+        first = month_key(start) if start else None
+        last = month_key(end) if end else None
+        for month in self.months(table):
+            if (first and month < first) or (last and month > last):
+                continue
+            seen = set()
+            with gzip.open(self.path(table, month), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    row = json.loads(line)
+                    if row['id'] in seen:
+                        continue
+                    seen.add(row['id'])
+                    timestamp = row.get(timestamp_field)
+                    if timestamp and ((start and timestamp < start.isoformat()) or (end and timestamp >= end.isoformat())):
+                        continue
+                    yield row
+
+    def stats(self):
+        stats = {}
+        for table_dir in sorted(glob.glob(os.path.join(self.directory, '*'))):
+            if not os.path.isdir(table_dir):
+                continue
+            files = glob.glob(os.path.join(table_dir, '*.ndjson.gz'))
+            stats[os.path.basename(table_dir)] = {
+                'months': len(files),
+                'bytes': sum(os.path.getsize(path) for path in files)
+            }
+        return stats
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive {type(value).__name__}")
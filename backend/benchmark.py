@@ -0,0 +1,271 @@
+# benchmark.py
+"""HTTP load test: replays a mix of sensor, dashboard, complaint and QR traffic
+
+Starts the app under gunicorn against a fresh SQLite file (or targets a
+running server with --url), drives it for --duration seconds and reports
+p50/p95/p99 latency, throughput and error rate per route:
+
+    python benchmark.py --duration 60 --sensors 200 --viewers 50
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json   # exit 1 on regression
+
+Requests are sent on a fixed schedule and latency is measured from the
+scheduled send time, so a stalled server shows up as latency instead of
+silently lowering the request rate.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import requests
+
+# A run regresses if a route's latency percentiles grow, or its throughput drops, by more than this
+DEFAULT_TOLERANCE = 0.2
+# Absolute error rate increase that counts as a regression
+ERROR_RATE_TOLERANCE = 0.01
+# Latencies under this are treated as equal, so noise on fast routes is not flagged
+MIN_LATENCY_DELTA_MS = 5.0
+
+
+class Recorder:
+    """Latency samples and error counts per route, shared by all client threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, route, latency_ms, ok):
+        with self._lock:
+            self.samples.setdefault(route, []).append(latency_ms)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed):
+        routes = {}
+        with self._lock:
+            for route, samples in sorted(self.samples.items()):
+                latencies = np.asarray(samples)
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                errors = self.errors.get(route, 0)
+                routes[route] = {
+                    'requests': len(samples),
+                    'errors': errors,
+                    'error_rate': round(errors / len(samples), 4),
+                    'throughput_rps': round(len(samples) / elapsed, 2),
+                    'mean_ms': round(float(latencies.mean()), 2),
+                    'p50_ms': round(float(p50), 2),
+                    'p95_ms': round(float(p95), 2),
+                    'p99_ms': round(float(p99), 2),
+                    'max_ms': round(float(latencies.max()), 2)
+                }
+        return routes
+
+
+def run_client(base_url, recorder, route, interval, make_request, stop_at, start_delay=0.0):
+    """Call make_request(session, base_url) every interval seconds until stop_at
+
+    make_request returns the HTTP status; 4xx and 5xx count as errors.
+    """
+    session = requests.Session()
+    scheduled = time.time() + start_delay
+    while scheduled < stop_at:
+        delay = scheduled - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        ok = False
+        try:
+            ok = make_request(session, base_url) < 400
+        except requests.RequestException:
+            pass
+        recorder.record(route, (time.time() - scheduled) * 1000, ok)
+        scheduled += interval
+    session.close()
+
+
+def build_clients(args, bin_ids):
+    """(route, interval, request function, count) for each kind of client in the mix"""
+    rng = random.Random(args.seed)
+
+    def sensor_post(session, base_url):
+        bin_id = rng.choice(bin_ids)
+        return session.post(f"{base_url}/api/bin/{bin_id}", json={'fill_level': rng.randint(0, 100)}, timeout=30).status_code
+
+    def dashboard_poll(session, base_url):
+        return session.get(f"{base_url}/api/dashboard", timeout=30).status_code
+
+    def complaint_burst(session, base_url):
+        # A crowd scanning the same overflowing bin
+        bin_id = rng.choice(bin_ids)
+        status = 200
+        for _ in range(args.complaint_burst):
+            status = max(status, session.post(f"{base_url}/api/complaint/quick", json={
+                'bin_id': bin_id, 'complaint_type': 'overflow', 'description': 'benchmark'
+            }, timeout=30).status_code)
+        return status
+
+    def qr_codes(session, base_url):
+        return session.get(f"{base_url}/api/bins/qr-codes", timeout=60).status_code
+
+    return [
+        ('POST /api/bin/<id>', args.sensor_interval, sensor_post, args.sensors),
+        ('GET /api/dashboard', args.dashboard_interval, dashboard_poll, args.viewers),
+        ('POST /api/complaint/quick (burst)', args.complaint_interval, complaint_burst, args.complainers),
+        ('GET /api/bins/qr-codes', args.qr_interval, qr_codes, args.qr_clients),
+    ]
+
+
+def start_server(args, workdir):
+    port = args.port
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        'SNAPSHOT_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'QR_CACHE_DIR': os.path.join(workdir, 'qr_cache'),
+        'QR_JOBS_DIR': os.path.join(workdir, 'qr_jobs'),
+        'SIM_FLEET_SIZE': str(args.fleet),
+        'SIM_SEED': str(args.seed),
+        'HEALTH_STATS_INTERVAL': '1',
+    })
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '--threads', str(args.threads),
+         '-b', f"127.0.0.1:{port}", 'app:create_app()'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    # Ready once the elected simulator worker has generated the whole fleet
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup, see {log.name}")
+        try:
+            stats = requests.get(f"{base_url}/api/health/ready", timeout=2).json().get('table_stats', {})
+            if (stats.get('bin_count') or 0) >= args.fleet + 1:
+                return process, base_url
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Server not ready after {args.startup_timeout}s, see {log.name}")
+
+
+def compare(current, baseline, tolerance):
+    """Return a list of regression messages for routes present in both runs"""
+    regressions = []
+    for route, stats in current['routes'].items():
+        base = baseline['routes'].get(route)
+        if base is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if stats[metric] > base[metric] * (1 + tolerance) and stats[metric] - base[metric] > MIN_LATENCY_DELTA_MS:
+                regressions.append(f"{route}: {metric} {base[metric]} -> {stats[metric]}")
+        if stats['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{route}: throughput_rps {base['throughput_rps']} -> {stats['throughput_rps']}")
+        if stats['error_rate'] > base['error_rate'] + ERROR_RATE_TOLERANCE:
+            regressions.append(f"{route}: error_rate {base['error_rate']} -> {stats['error_rate']}")
+    return regressions
+
+
+def print_report(result, regressions):
+    print(f"{'route':<36}{'reqs':>8}{'err%':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for route, stats in result['routes'].items():
+        print(f"{route:<36}{stats['requests']:>8}{stats['error_rate'] * 100:>7.1f}%{stats['throughput_rps']:>9}"
+              f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}")
+    for message in regressions:
+        print(f"REGRESSION {message}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', help='Benchmark a running server instead of starting one')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--fleet', type=int, default=1000, help='Simulated bins in the started server')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--sensors', type=int, default=100, help='ESP32 clients posting fill levels')
+    parser.add_argument('--sensor-interval', type=float, default=1.0)
+    parser.add_argument('--viewers', type=int, default=20, help='Dashboard viewers polling')
+    parser.add_argument('--dashboard-interval', type=float, default=5.0)
+    parser.add_argument('--complainers', type=int, default=2, help='Sources of complaint bursts')
+    parser.add_argument('--complaint-interval', type=float, default=10.0)
+    parser.add_argument('--complaint-burst', type=int, default=10)
+    parser.add_argument('--qr-clients', type=int, default=1)
+    parser.add_argument('--qr-interval', type=float, default=15.0)
+    parser.add_argument('--baseline', help='Compare against this baseline and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--save-baseline', help='Write this run to a JSON baseline file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='eco-guardian-bench-')
+    process = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            process, base_url = start_server(args, workdir)
+
+        bins = requests.get(f"{base_url}/api/bins", timeout=60).json()['bins']
+        bin_ids = [item['id'] for item in bins]
+        recorder = Recorder()
+        started = time.time()
+        stop_at = started + args.duration
+        threads = []
+        for route, interval, make_request, count in build_clients(args, bin_ids):
+            for _ in range(count):
+                # Spread clients over the interval so they do not fire in lockstep
+                thread = threading.Thread(
+                    target=run_client,
+                    args=(base_url, recorder, route, interval, make_request, stop_at, random.random() * interval),
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - started
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    result = {
+        'created': datetime.utcnow().isoformat(),
+        'duration_seconds': round(elapsed, 2),
+        'config': {key: value for key, value in vars(args).items() if key not in ('baseline', 'save_baseline')},
+        'routes': recorder.summary(elapsed)
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changed = sorted(key for key, value in baseline.get('config', {}).items()
+                         if key not in ('url', 'port', 'tolerance') and result['config'].get(key) != value)
+        if changed:
+            print(f"WARNING: baseline was recorded with different settings: {', '.join(changed)}")
+        regressions = compare(result, baseline, args.tolerance)
+    print_report(result, regressions)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
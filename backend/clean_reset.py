@@ -1,48 +1,28 @@
 # clean_reset.py
+"""Delete the local SQLite database and rebuild it at the latest schema version
+
+The schema comes from the same migrations the app runs at startup, so the
+rebuilt database matches the models exactly.
+"""
 import os
-import sqlite3
 
 # Delete the database file if it exists
 db_path = 'instance/database.db'
-if os.path.exists(db_path):
-    os.remove(db_path)
-    print(f"Deleted old database: {db_path}")
-else:
-    print("No existing database found")
+for path in (db_path, f"{db_path}-wal", f"{db_path}-shm"):
+    if os.path.exists(path):
+        os.remove(path)
+        print(f"Deleted old database file: {path}")
 
 # Create the instance directory if it doesn't exist
 os.makedirs('instance', exist_ok=True)
 
-# Now create a simple database with just the structure
 print("Creating new database...")
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(db_path)}"
 
-# Create a simple SQLite connection to set up tables
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-
-# Create smart_bin table with the correct schema
-cursor.execute('''
-CREATE TABLE smart_bin (
-    id INTEGER PRIMARY KEY,
-    location VARCHAR(100) NOT NULL,
-    fill_level FLOAT DEFAULT 0,
-    last_updated DATETIME,
-    name VARCHAR(100)
-)
-''')
-
-# Create litter_alert table
-cursor.execute('''
-CREATE TABLE litter_alert (
-    id INTEGER PRIMARY KEY,
-    location VARCHAR(100) NOT NULL,
-    confidence FLOAT DEFAULT 0,
-    image_url VARCHAR(200),
-    timestamp DATETIME,
-    description VARCHAR(500)
-)
-''')
+# Creating the app runs the migrations and seeds the initial bins
+from app import create_app, db  # noqa: E402
+from migrations import current_version  # noqa: E402
 
-conn.commit()
-conn.close()
-print("Database created successfully with correct schema!")
\ No newline at end of file
+app = create_app({'INIT_DB': True})
+with app.app_context():
+    print(f"Database created successfully at schema version {current_version(db.engine)}!")
@@ -0,0 +1,115 @@
+# encoding.py
+"""Compact representations for list responses, picked by content negotiation
+
+    Accept: application/json                           rows as objects (the default)
+    Accept: application/vnd.eco-guardian.columns+json  one array per field
+    Accept: application/msgpack                        the columnar layout as MessagePack
+
+In the columnar layouts each list of rows in a response becomes
+{"field": [value, ...], ...}, so field names are sent once per list
+instead of once per row. With ?timestamps=epoch, timestamps are integer
+milliseconds since the Unix epoch instead of ISO 8601 strings.
+
+When orjson is installed it also serializes every JSON response.
+"""
+import json
+from datetime import datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is then simply not offered
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ROWS = 'application/json'
+COLUMNS = 'application/vnd.eco-guardian.columns+json'
+MSGPACK = 'application/msgpack'
+
+TIMESTAMP_FIELDS = frozenset(('timestamp', 'last_updated', 'last_seen', 'resolved_at', 'predicted_full_at'))
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def negotiate(accept):
+    """The best representation for a werkzeug Accept header, rows unless asked otherwise"""
+    offers = [ROWS, COLUMNS]
+    if msgpack is not None:
+        offers += [MSGPACK, 'application/x-msgpack']
+    match = accept.best_match(offers, default=ROWS)
+    return MSGPACK if match == 'application/x-msgpack' else match
+
+
+def epoch_ms(value):
+    """Milliseconds since the epoch for a naive UTC datetime or its ISO string"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return round((value - EPOCH).total_seconds() * 1000)
+
+
+def to_columns(rows, epoch=False):
+    """Turn [{field: value}] into {field: [value, ...]}, with the fields of the first row"""
+    if not rows:
+        return {}
+    columns = {}
+    for field in rows[0]:
+        values = [row.get(field) for row in rows]
+        if epoch and field in TIMESTAMP_FIELDS:
+            values = [epoch_ms(value) for value in values]
+        columns[field] = values
+    return columns
+
+
+def with_epoch(row):
+    return {field: epoch_ms(value) if field in TIMESTAMP_FIELDS else value for field, value in row.items()}
+
+
+def shape(rows, representation, epoch=False):
+    """Lay out one list of row dicts for the representation"""
+    if representation != ROWS:
+        return to_columns(rows, epoch)
+    if epoch:
+        return [with_epoch(row) for row in rows]
+    return rows
+
+
+def dumps(payload, representation):
+    """Serialize a response payload whose lists are already shaped"""
+    if representation == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=DefaultJSONProvider.default, separators=(',', ':')).encode()
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson
+
+    Datetimes are passed through to Flask's own conversion, so responses
+    carry the same values as with the default provider; only key order
+    differs, as keys are no longer sorted.
+    """
+
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option) + b'\n', mimetype=self.mimetype
+        )
+
+
+JSON_PROVIDER = OrjsonProvider if orjson is not None else DefaultJSONProvider
@@ -0,0 +1,100 @@
+# events.py
+"""In-process fan-out of live update events to Server-Sent Events clients"""
+import json
+import queue
+import threading
+from collections import deque
+
+# Events a slow client may fall behind by before it is disconnected
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# How many recently delivered event ids are remembered to skip duplicates
+SEEN_IDS_SIZE = 5000
+
+
+def encode_payload(payload):
+    return json.dumps(payload, separators=(',', ':'))
+
+
+def format_sse(event_id, event_type, data):
+    """Encode one event in the text/event-stream wire format"""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+class Subscriber:
+    """Queue of pending events for one connected stream"""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+
+class EventBroker:
+    """Delivers events read from the shared event table to local subscribers
+
+    Each worker runs one poller that feeds publish(), so the database is
+    read once per poll no matter how many viewers are connected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._idle = set()  # Streams fed from elsewhere, holding a slot only
+        self._seen = set()
+        self._seen_order = deque()
+        self.last_id = None  # Set by start() from the event table on the first poll
+        self._floor_id = 0
+
+    def start(self, last_id):
+        """Begin delivery after last_id, ignoring anything already in the table"""
+        with self._lock:
+            self.last_id = self._floor_id = last_id
+
+    def subscribe(self, limit=None, listen=True):
+        """A new subscriber, or None if limit subscribers are already connected
+
+        With listen=False the subscriber only counts against the limit and
+        receives no events, for streams that read their updates elsewhere.
+        """
+        subscriber = Subscriber()
+        with self._lock:
+            if limit is not None and len(self._subscribers) + len(self._idle) >= limit:
+                return None
+            (self._subscribers if listen else self._idle).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            self._idle.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers) + len(self._idle)
+
+    def publish(self, events):
+        """Fan (id, event_type, data) tuples out once each, in the order given"""
+        fresh = []
+        with self._lock:
+            for event in events:
+                event_id = event[0]
+                if event_id <= self._floor_id or event_id in self._seen:
+                    continue
+                self._seen.add(event_id)
+                self._seen_order.append(event_id)
+                if len(self._seen_order) > SEEN_IDS_SIZE:
+                    self._seen.discard(self._seen_order.popleft())
+                self.last_id = max(self.last_id or 0, event_id)
+                fresh.append(event)
+            subscribers = list(self._subscribers)
+
+        for event in fresh:
+            for subscriber in subscribers:
+                subscriber.push(event)
+        return len(fresh)
@@ -0,0 +1,126 @@
+# forecast.py
+"""Fill-rate estimates and time-to-full predictions for bins
+
+Online, readings move a bin's rate in O(1) towards the rate seen since
+its rate anchor, the reading the rate was last updated at, with older
+information decaying over TAU_HOURS however often the sensor reports.
+Readings less than MIN_INTERVAL after the anchor are accumulated rather
+than divided by a gap of seconds. In batch, refit() fits an
+exponentially weighted least-squares line through each bin's readings
+since it was last emptied, for the whole fleet in a few array passes.
+"""
+import math
+from datetime import timedelta
+
+TAU_HOURS = 6.0
+FULL_LEVEL = 100.0
+
+# A fall of more than this many points between readings means the bin was emptied
+EMPTIED_DROP = 20.0
+
+# Slower bins (percent per hour) get no prediction rather than one weeks away
+MIN_RATE = 0.01
+# Anything faster than filling a bin in an hour is sensor noise, not litter
+MAX_RATE = 100.0
+# Readings closer together than this are accumulated until they span it
+MIN_INTERVAL = timedelta(minutes=5)
+MAX_HORIZON = timedelta(days=30)
+
+
+def clamp_rate(rate):
+    """Limit a rate in percent per hour to +/- MAX_RATE"""
+    return min(max(rate, -MAX_RATE), MAX_RATE)
+
+
+def update_rate(rate, anchor_level, anchor_ts, level, ts, tau_hours=TAU_HOURS):
+    """Return a bin's (fill rate, anchor level, anchor ts) after a new reading
+
+    The rate is in percent per hour and only moves once the reading is at
+    least MIN_INTERVAL after the anchor; until then the anchor is kept.
+    """
+    if anchor_level is None or anchor_ts is None:
+        return rate, level, ts
+    if ts < anchor_ts:
+        # Out of order: the rate learned so far still holds
+        return rate, anchor_level, anchor_ts
+    if anchor_level - level > EMPTIED_DROP:
+        # A collection: keep the rate and measure the next fill from here
+        return rate, level, ts
+    if ts - anchor_ts < MIN_INTERVAL:
+        return rate, anchor_level, anchor_ts
+    hours = (ts - anchor_ts).total_seconds() / 3600
+    observed = clamp_rate((level - anchor_level) / hours)
+    if rate is None:
+        return observed, level, ts
+    return clamp_rate(rate + (1 - math.exp(-hours / tau_hours)) * (observed - rate)), level, ts
+
+
+def predict_full_at(level, rate, ts):
+    """When a bin at level at time ts reaches FULL_LEVEL, or None if not foreseeable"""
+    if level is None or ts is None:
+        return None
+    if level >= FULL_LEVEL:
+        return ts
+    if rate is None or rate < MIN_RATE:
+        return None
+    remaining = (FULL_LEVEL - level) / rate
+    if remaining > MAX_HORIZON.total_seconds() / 3600:
+        return None
+    return ts + timedelta(hours=remaining)
+
+
+def hours_to_full(levels, rates):
+    """Vectorized predict_full_at: hours from each reading until full, NaN where not foreseeable"""
+    # Imported on first use: the online estimates on the ingest path are plain floats
+    import numpy as np
+    levels = np.asarray(levels, dtype=np.float64)
+    rates = np.asarray(rates, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hours = (FULL_LEVEL - levels) / rates
+        hours[~(rates >= MIN_RATE) | (hours > MAX_HORIZON.total_seconds() / 3600)] = np.nan
+    hours[levels >= FULL_LEVEL] = 0.0
+    return hours
+
+
+def refit(bin_ids, hours, levels, tau_hours=TAU_HOURS):
+    """Weighted least-squares fill rates for many bins at once
+
+    bin_ids, hours and levels are parallel arrays of readings sorted by bin
+    and then time, with hours counted relative to now (so <= 0). Only
+    readings after a bin's last emptying are used, each weighted by
+    exp(hours / tau_hours). Returns (bin_ids, rates) with one entry per bin,
+    clipped to +/- MAX_RATE, and NaN where fewer than two readings remain.
+    """
+    import numpy as np
+    bin_ids = np.asarray(bin_ids)
+    t = np.asarray(hours, dtype=np.float64)
+    y = np.asarray(levels, dtype=np.float64)
+    if len(bin_ids) == 0:
+        return bin_ids, np.empty(0)
+
+    new_bin = np.empty(len(bin_ids), dtype=bool)
+    new_bin[0] = True
+    np.not_equal(bin_ids[1:], bin_ids[:-1], out=new_bin[1:])
+    starts = np.flatnonzero(new_bin)
+    group = np.cumsum(new_bin) - 1
+
+    # Number each bin's fill cycles and keep only the current one
+    emptied = np.zeros(len(y), dtype=bool)
+    emptied[1:] = y[:-1] - y[1:] > EMPTIED_DROP
+    cycle = np.cumsum(new_bin | emptied)
+    current = cycle == np.maximum.reduceat(cycle, starts)[group]
+
+    weight = np.exp(t / tau_hours) * current
+    count = len(starts)
+    sw = np.bincount(group, weight, count)
+    st = np.bincount(group, weight * t, count)
+    sy = np.bincount(group, weight * y, count)
+    stt = np.bincount(group, weight * t * t, count)
+    sty = np.bincount(group, weight * t * y, count)
+    used = np.bincount(group, current, count)
+
+    denominator = sw * stt - st * st
+    valid = (used >= 2) & (denominator > 1e-12 * np.maximum(sw * stt, 1e-300))
+    rates = np.full(count, np.nan)
+    rates[valid] = np.clip((sw[valid] * sty[valid] - st[valid] * sy[valid]) / denominator[valid], -MAX_RATE, MAX_RATE)
+    return bin_ids[starts], rates
@@ -0,0 +1,108 @@
+# geo.py
+"""Geohash cells used to index bins and alerts for viewport and radius queries"""
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precision stored on every row (~150 m x 150 m cells)
+GEOHASH_PRECISION = 7
+
+# Above this many covering cells a plain lat/lng range scan is cheaper
+MAX_COVER_CELLS = 32
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def parse_location(location):
+    """Parse a "lat,lng" string, returning None if it is not a valid coordinate"""
+    try:
+        lat, lng = (float(part) for part in location.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = bit_count = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Height and width in degrees of a cell at the given precision"""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def cover_bbox(min_lat, min_lng, max_lat, max_lng, max_cells=MAX_COVER_CELLS):
+    """Geohash prefixes covering a bounding box, or None if it needs too many cells
+
+    Uses the finest precision (up to the stored one) that covers the box in
+    at most max_cells cells.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        cols = math.floor(max_lng / width) - math.floor(min_lng / width) + 1
+        if rows * cols > max_cells:
+            continue
+        cells = set()
+        for row in range(rows):
+            lat = min(max_lat, (math.floor(min_lat / height) + row + 0.5) * height)
+            for col in range(cols):
+                lng = min(max_lng, (math.floor(min_lng / width) + col + 0.5) * width)
+                cells.add(encode(max(min_lat, lat), max(min_lng, lng), precision))
+        return sorted(cells)
+    return None
+
+
+def prefix_range(prefix):
+    """Half-open string range [low, high) matching every hash that starts with prefix
+
+    high is the next prefix in base32 order (None past the last cell), so the
+    bounds only use digits and lowercase letters and sort the same under any
+    database collation.
+    """
+    chars = list(prefix)
+    while chars:
+        index = BASE32.index(chars[-1])
+        if index + 1 < len(BASE32):
+            chars[-1] = BASE32[index + 1]
+            return prefix, ''.join(chars)
+        chars.pop()
+    return prefix, None
+
+
+def radius_bbox(lat, lng, radius_m):
+    """Bounding box that contains the circle of radius_m around a point"""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlng = math.degrees(radius_m / (EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 1e-6)))
+    return max(-90.0, lat - dlat), max(-180.0, lng - dlng), min(90.0, lat + dlat), min(180.0, lng + dlng)
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(1.0, a)))
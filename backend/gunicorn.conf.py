@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+"""Gunicorn settings, picked up automatically when gunicorn starts in this directory
+
+The app is loaded once in the master, which migrates and seeds the
+database before forking, so workers start with imports already done and
+never race each other on initialization. Background threads cannot be
+inherited through fork, so every worker starts its own after loading.
+"""
+
+preload_app = True
+
+
+def post_worker_init(worker):
+    from app import db, start_background_threads
+
+    app = worker.wsgi
+    with app.app_context():
+        # Pooled connections opened by the master must not be shared with it
+        db.engine.dispose(close=False)
+    start_background_threads(app)
+
+
+def child_exit(server, worker):
+    from app import metrics
+
+    # Fold the exited worker's metrics file into the retired totals
+    metrics.retire()
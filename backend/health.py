@@ -0,0 +1,54 @@
+# health.py
+"""Background thread heartbeats and connection pool figures for readiness checks"""
+import threading
+import time
+
+
+class Heartbeats:
+    """Last time each background loop made progress
+
+    Every loop beats once per iteration. A thread that has died or has not
+    beaten within its max_age is reported as unhealthy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = {}
+
+    def register(self, name, thread, max_age):
+        with self._lock:
+            self._threads[name] = {'thread': thread, 'max_age': max_age, 'last_beat': time.time(), 'beats': 0}
+
+    def beat(self, name):
+        with self._lock:
+            entry = self._threads.get(name)
+            if entry is not None:
+                entry['last_beat'] = time.time()
+                entry['beats'] += 1
+
+    def status(self):
+        """Return (all_healthy, {name: details})"""
+        now = time.time()
+        report = {}
+        with self._lock:
+            for name, entry in self._threads.items():
+                age = now - entry['last_beat']
+                alive = entry['thread'] is None or entry['thread'].is_alive()
+                report[name] = {
+                    'alive': alive,
+                    'healthy': alive and age <= entry['max_age'],
+                    'seconds_since_beat': round(age, 1),
+                    'max_age_seconds': entry['max_age'],
+                    'beats': entry['beats']
+                }
+        return all(item['healthy'] for item in report.values()), report
+
+
+def pool_status(pool):
+    """Checked-in/out connection counts for pools that track them"""
+    status = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[name] = method()
+    return status
@@ -0,0 +1,75 @@
+# history.py
+"""Bucketing helpers for the fill-level history store and its rollups"""
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+
+# Rollup resolutions kept incrementally, finest first, with bucket size in seconds
+RESOLUTIONS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# Ranges up to this long are answered from raw readings when resolution=auto
+RAW_MAX_SPAN = timedelta(hours=1)
+
+# Upper bound on the number of buckets returned for an automatic resolution
+MAX_POINTS = 1500
+
+
+def bucket_start(ts, resolution):
+    """Return the start of the rollup bucket that contains ts"""
+    size = RESOLUTIONS[resolution]
+    seconds = int((ts - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % size)
+
+
+def rollup_rows(readings):
+    """Aggregate (bin_id, ts, fill_level) readings into rollup row dicts
+
+    Rows carry the partial count/total/min/max/last for each bucket touched,
+    ready to be merged into the stored rollups.
+    """
+    buckets = {}
+    for bin_id, ts, fill_level in readings:
+        for resolution in RESOLUTIONS:
+            key = (bin_id, resolution, bucket_start(ts, resolution))
+            row = buckets.get(key)
+            if row is None:
+                buckets[key] = {
+                    'bin_id': bin_id,
+                    'resolution': resolution,
+                    'bucket': key[2],
+                    'count': 1,
+                    'total': fill_level,
+                    'min_level': fill_level,
+                    'max_level': fill_level,
+                    'last_level': fill_level,
+                    'last_ts': ts,
+                }
+                continue
+            row['count'] += 1
+            row['total'] += fill_level
+            row['min_level'] = min(row['min_level'], fill_level)
+            row['max_level'] = max(row['max_level'], fill_level)
+            if ts >= row['last_ts']:
+                row['last_level'] = fill_level
+                row['last_ts'] = ts
+    return list(buckets.values())
+
+
+def choose_resolution(start, end, max_points=MAX_POINTS, kept_since=None):
+    """Pick the finest store that answers a range without exceeding max_points buckets
+
+    kept_since maps 'raw' and rollup resolutions to the oldest time they
+    still cover; stores that begin after start are skipped.
+    """
+    kept_since = kept_since or {}
+    span = end - start
+    if span <= RAW_MAX_SPAN and start >= kept_since.get('raw', start):
+        return 'raw'
+    for resolution, size in RESOLUTIONS.items():
+        if span.total_seconds() / size <= max_points and start >= kept_since.get(resolution, start):
+            return resolution
+    return '1d'
@@ -0,0 +1,144 @@
+# log_pipeline.py
+"""Queue-based structured logging: callers enqueue, one listener thread writes JSON lines
+
+Configured from the environment:
+
+    LOG_LEVEL=INFO                                  root level
+    LOG_LEVELS=sqlalchemy.engine=WARNING,app=DEBUG  per-logger levels
+    LOG_SAMPLE_RATES=/api/bin/<int:bin_id>=0.01     share of requests on a route whose
+                                                    DEBUG/INFO lines are kept
+
+Warnings and errors are never sampled out.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Records held for the listener before new ones are dropped rather than blocking callers
+QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+def parse_pairs(value, convert=str):
+    """Parse "key=value,key=value" settings, skipping malformed entries"""
+    pairs = {}
+    for item in (value or '').split(','):
+        key, sep, raw = item.strip().rpartition('=')
+        if not sep or not key:
+            continue
+        try:
+            pairs[key] = convert(raw)
+        except ValueError:
+            continue
+    return pairs
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the record's extra fields as top-level keys"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with request fields and drops unsampled low-level lines
+
+    get_context returns a dict of fields for the current request (including a
+    boolean 'sampled') or None outside a request.
+    """
+
+    def __init__(self, get_context):
+        super().__init__()
+        self.get_context = get_context
+
+    def filter(self, record):
+        try:
+            context = self.get_context()
+        except Exception:
+            context = None
+        if not context:
+            return True
+        if not context.get('sampled', True) and record.levelno < logging.WARNING:
+            return False
+        for key, value in context.items():
+            if key != 'sampled':
+                setattr(record, key, value)
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: a full queue drops the record and counts it"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # Only resolve the message here; JSON formatting happens on the listener
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+def configure_logging(level='INFO', logger_levels=None, get_context=None, stream=None):
+    """Route every logger through a bounded queue to a JSON stream handler
+
+    Returns the queue handler so callers can report dropped records.
+    """
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    log_queue = queue.Queue(QUEUE_SIZE)
+    handler = DroppingQueueHandler(log_queue)
+    if get_context is not None:
+        handler.addFilter(RequestContextFilter(get_context))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name, logger_level in (logger_levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    listeners = [logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)]
+    listeners[0].start()
+    atexit.register(lambda: listeners[-1].stop())
+
+    def restart_in_child():
+        # The listener thread does not survive fork (gunicorn --preload), so each
+        # worker gets a fresh queue, whose lock the parent may have held, and listener
+        handler.queue = queue.Queue(QUEUE_SIZE)
+        listeners.append(logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True))
+        listeners[-1].start()
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=restart_in_child)
+    return handler
@@ -0,0 +1,234 @@
+# metrics.py
+"""Prometheus text-format metrics aggregated across worker processes
+
+Each process keeps its metrics in memory and writes them to
+metrics-<pid>.json in a shared directory at most once per flush interval.
+A scrape reads every file and merges them: counters and histograms are
+summed (including from workers that have exited, so totals never go
+backwards), gauges are summed over live processes only. Files of exited
+processes are folded into retired.json and deleted, so the directory
+does not grow with every worker restart.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL = 1.0
+RETIRED_NAME = 'retired.json'  # Not matched by metrics-*.json
+
+
+def _labels_key(labels):
+    return json.dumps(sorted(labels.items()), separators=(',', ':'))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, text):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _merge(merged, values, gauges=True):
+    """Add one process's {type: {name: {labels_key: value}}} into merged"""
+    for metric_type, metrics in values.items():
+        if metric_type == 'gauge' and not gauges:
+            continue
+        for name, series in metrics.items():
+            target = merged.setdefault(metric_type, {}).setdefault(name, {})
+            for key, value in series.items():
+                if metric_type == 'histogram':
+                    current = target.setdefault(key, [0] * len(value))
+                    if len(current) == len(value):
+                        target[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target[key] = target.get(key, 0) + value
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms for one process, shared through files"""
+
+    def __init__(self, directory=None, flush_interval=FLUSH_INTERVAL):
+        self.directory = None
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._definitions = {}
+        self._values = {'counter': {}, 'gauge': {}, 'histogram': {}}
+        self._gauge_callbacks = []
+        self._last_flush = 0.0
+        self._pid = os.getpid()
+        if directory is not None:
+            self.open(directory)
+
+    def open(self, directory):
+        """Share this process's metrics through files in directory"""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def define(self, name, metric_type, help_text, buckets=DEFAULT_BUCKETS):
+        self._definitions[name] = {'type': metric_type, 'help': help_text, 'buckets': list(buckets)}
+
+    def add_gauge_callback(self, callback):
+        """Call callback(registry) before every flush to refresh point-in-time gauges"""
+        self._gauge_callbacks.append(callback)
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            series = self._values['counter'].setdefault(name, {})
+            key = _labels_key(labels)
+            series[key] = series.get(key, 0) + value
+        self.maybe_flush()
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values['gauge'].setdefault(name, {})[_labels_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        buckets = self._definitions[name]['buckets']
+        with self._lock:
+            series = self._values['histogram'].setdefault(name, {})
+            key = _labels_key(labels)
+            state = series.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, the +Inf bucket, then sum
+                state = series[key] = [0] * (len(buckets) + 1) + [0.0]
+            state[bisect.bisect_left(buckets, value)] += 1
+            state[-1] += value
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        # Forked workers inherit the parent's registry; start them from zero
+        if os.getpid() != self._pid:
+            with self._lock:
+                self._values = {'counter': {}, 'gauge': {}, 'histogram': {}}
+                self._pid = os.getpid()
+        self._last_flush = time.monotonic()
+        for callback in self._gauge_callbacks:
+            try:
+                callback(self)
+            except Exception:
+                pass
+        with self._lock:
+            data = json.dumps({'pid': self._pid, 'values': self._values})
+        _write(os.path.join(self.directory, f"metrics-{self._pid}.json"), data)
+
+    @contextmanager
+    def _retire_lock(self):
+        """Serialize retiring across processes, so no file is counted twice"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, '.retire.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def retire(self):
+        """Fold the counters and histograms of exited processes into retired.json and delete their files
+
+        Returns the number of files retired. Called by every scrape, and by
+        the gunicorn master whenever a worker exits.
+        """
+        with self._retire_lock():
+            retired_path = os.path.join(self.directory, RETIRED_NAME)
+            retired = _read(retired_path) or {}
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                data = _read(path)
+                if data is None or _pid_alive(data['pid']):
+                    continue
+                _merge(retired, data['values'], gauges=False)
+                dead.append(path)
+            if dead:
+                # A crash between these two steps counts the dead files twice, never loses them
+                _write(retired_path, json.dumps(retired))
+                for path in dead:
+                    os.remove(path)
+            return len(dead)
+
+    def collect(self):
+        """Merge every process's file into {type: {name: {labels_key: value}}}"""
+        self.flush()
+        self.retire()
+        merged = {'counter': {}, 'gauge': {}, 'histogram': {}}
+        with self._retire_lock():
+            _merge(merged, _read(os.path.join(self.directory, RETIRED_NAME)) or {})
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                data = _read(path)
+                if data is not None:
+                    _merge(merged, data['values'], gauges=_pid_alive(data['pid']))
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        merged = self.collect()
+        lines = []
+        for name, definition in sorted(self._definitions.items()):
+            metric_type = definition['type']
+            series = merged[metric_type].get(name, {})
+            lines.append(f"# HELP {name} {definition['help']}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key, value in sorted(series.items()):
+                pairs = json.loads(key)
+                if metric_type != 'histogram':
+                    lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(definition['buckets'] + [float('inf')], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(pairs, [('le', _format_value(bound))])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(pairs)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(pairs)} {cumulative}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,247 @@
+# migrations.py
+"""Versioned schema migrations for SQLite and Postgres
+
+Each migration runs once, in its own transaction, and is recorded in the
+schema_migrations table. A new database is created straight from the
+models and stamped with every version. An existing database, whatever
+release created it, has the missing steps applied in order. The steps
+are written to be safe on tables that already have some of their columns
+or indexes, because older releases patched the schema ad hoc at startup.
+
+Only one process migrates at a time: Postgres takes an advisory lock,
+SQLite files take a flock on a file beside the database.
+"""
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, text
+
+from geo import encode as geohash_encode, parse_location
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key shared by every process migrating the same Postgres database
+ADVISORY_LOCK_KEY = 7234001
+
+
+def add_column(conn, table, column, ddl):
+    if column not in {col['name'] for col in inspect(conn).get_columns(table)}:
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def create_index(conn, name, table, columns):
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})'))
+
+
+def create_missing_tables(conn, metadata):
+    """Tables the database predates (clean_reset.py only ever made two)"""
+    metadata.create_all(conn)
+
+
+def add_sync_and_geo_columns(conn, metadata):
+    """Change versions for delta sync, plus coordinates parsed from location"""
+    for table in ('smart_bin', 'litter_alert'):
+        add_column(conn, table, 'version', 'INTEGER DEFAULT 0')
+        add_column(conn, table, 'latitude', 'FLOAT')
+        add_column(conn, table, 'longitude', 'FLOAT')
+        add_column(conn, table, 'geo_cell', 'VARCHAR(12)')
+        create_index(conn, f'ix_{table}_version', table, 'version')
+        create_index(conn, f'ix_{table}_geo_cell', table, 'geo_cell')
+        create_index(conn, f'ix_{table}_lat_lng', table, 'latitude, longitude')
+
+        rows = conn.execute(text(
+            f'SELECT id, location FROM {table} WHERE latitude IS NULL AND location IS NOT NULL'
+        )).all()
+        updates = []
+        for row_id, location in rows:
+            point = parse_location(location)
+            if point is not None:
+                updates.append({'b_id': row_id, 'b_lat': point[0], 'b_lng': point[1], 'b_cell': geohash_encode(*point)})
+        if updates:
+            table_obj = metadata.tables[table]
+            conn.execute(
+                table_obj.update().where(table_obj.c.id == bindparam('b_id')).values(
+                    latitude=bindparam('b_lat'), longitude=bindparam('b_lng'), geo_cell=bindparam('b_cell')
+                ),
+                updates
+            )
+
+
+def add_keyset_indexes(conn, metadata):
+    """Keyset pages, and alerts linked to bins so they can be paged per bin
+
+    Complaint alerts were raised at their bin's exact location.
+    """
+    create_index(conn, 'ix_litter_alert_timestamp_id', 'litter_alert', 'timestamp, id')
+    create_index(conn, 'ix_qr_complaint_timestamp_id', 'qr_complaint', 'timestamp, id')
+    add_column(conn, 'litter_alert', 'bin_id', 'INTEGER REFERENCES smart_bin (id)')
+    create_index(conn, 'ix_litter_alert_bin_id_timestamp_id', 'litter_alert', 'bin_id, timestamp, id')
+    conn.execute(text(
+        "UPDATE litter_alert SET bin_id = (SELECT MIN(smart_bin.id) FROM smart_bin "
+        "WHERE smart_bin.location = litter_alert.location) WHERE bin_id IS NULL"
+    ))
+
+
+def add_alert_merging(conn, metadata):
+    add_column(conn, 'litter_alert', 'occurrence_count', 'INTEGER DEFAULT 1')
+    add_column(conn, 'litter_alert', 'last_seen', 'TIMESTAMP')
+    create_index(conn, 'ix_litter_alert_geo_cell_last_seen', 'litter_alert', 'geo_cell, last_seen')
+    conn.execute(text('UPDATE litter_alert SET last_seen = timestamp WHERE last_seen IS NULL'))
+
+
+def add_resolved_at(conn, metadata):
+    """When alerts and complaints were resolved; complaints already resolved count from the upgrade"""
+    add_column(conn, 'litter_alert', 'resolved_at', 'TIMESTAMP')
+    create_index(conn, 'ix_litter_alert_resolved_at_timestamp_id', 'litter_alert', 'resolved_at, timestamp, id')
+    add_column(conn, 'qr_complaint', 'resolved_at', 'TIMESTAMP')
+    create_index(conn, 'ix_qr_complaint_resolved_at_id', 'qr_complaint', 'resolved_at, id')
+    conn.execute(
+        text("UPDATE qr_complaint SET resolved_at = :now WHERE status = 'resolved' AND resolved_at IS NULL"),
+        {'now': datetime.utcnow()}
+    )
+
+
+def add_filter_indexes(conn, metadata):
+    """Complaint filters, history retention scans, and bins by freshness"""
+    create_index(conn, 'ix_qr_complaint_status_timestamp_id', 'qr_complaint', 'status, timestamp, id')
+    create_index(conn, 'ix_qr_complaint_bin_id_timestamp_id', 'qr_complaint', 'bin_id, timestamp, id')
+    create_index(conn, 'ix_bin_reading_timestamp', 'bin_reading', 'timestamp')
+    create_index(conn, 'ix_bin_reading_rollup_resolution_bucket', 'bin_reading_rollup', 'resolution, bucket')
+    create_index(conn, 'ix_smart_bin_last_updated', 'smart_bin', 'last_updated')
+
+
+def add_fill_forecast(conn, metadata):
+    """Fill rates, measured from an anchor reading started at each bin's latest one"""
+    add_column(conn, 'smart_bin', 'fill_rate', 'FLOAT')
+    add_column(conn, 'smart_bin', 'predicted_full_at', 'TIMESTAMP')
+    add_column(conn, 'smart_bin', 'rate_anchor_level', 'FLOAT')
+    add_column(conn, 'smart_bin', 'rate_anchor_at', 'TIMESTAMP')
+    create_index(conn, 'ix_smart_bin_predicted_full_at', 'smart_bin', 'predicted_full_at')
+    conn.execute(text("UPDATE smart_bin SET rate_anchor_level = fill_level, rate_anchor_at = last_updated"))
+
+
+def add_fill_state(conn, metadata):
+    """Rule state for threshold transitions, started from each bin's current level"""
+    add_column(conn, 'smart_bin', 'fill_state', "VARCHAR(16) DEFAULT 'normal'")
+    add_column(conn, 'smart_bin', 'level_since', 'TIMESTAMP')
+    add_column(conn, 'smart_bin', 'sensor_stuck', 'BOOLEAN DEFAULT FALSE')
+    create_index(conn, 'ix_smart_bin_fill_state', 'smart_bin', 'fill_state')
+    conn.execute(text(
+        "UPDATE smart_bin SET fill_state = CASE WHEN fill_level > 80 THEN 'full' "
+        "WHEN fill_level > 60 THEN 'getting_full' ELSE 'normal' END, "
+        "level_since = last_updated, sensor_stuck = FALSE"
+    ))
+
+
+# (version, name, upgrade(conn, metadata)), applied in order; never edit or reorder released entries
+MIGRATIONS = [
+    (1, 'create_missing_tables', create_missing_tables),
+    (2, 'add_sync_and_geo_columns', add_sync_and_geo_columns),
+    (3, 'add_keyset_indexes', add_keyset_indexes),
+    (4, 'add_alert_merging', add_alert_merging),
+    (5, 'add_resolved_at', add_resolved_at),
+    (6, 'add_filter_indexes', add_filter_indexes),
+    (7, 'add_fill_forecast', add_fill_forecast),
+    (8, 'add_fill_state', add_fill_state),
+]
+
+
+@contextmanager
+def migration_lock(engine):
+    """Hold an exclusive lock so concurrently starting workers migrate one at a time"""
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as conn:
+            conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': ADVISORY_LOCK_KEY})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': ADVISORY_LOCK_KEY})
+                conn.commit()
+    elif engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:') and fcntl is not None:
+        with open(f"{engine.url.database}-migrate.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+def applied_versions(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations '
+        '(version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at TIMESTAMP NOT NULL)'
+    ))
+    return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def record_version(conn, version, name):
+    conn.execute(text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :now)'),
+                 {'version': version, 'name': name, 'now': datetime.utcnow()})
+
+
+def migrate(engine, metadata, migrations=MIGRATIONS):
+    """Bring the database up to the latest version, returning the versions applied"""
+    applied = []
+    with migration_lock(engine):
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+            fresh = not done and not set(metadata.tables) & set(inspect(conn).get_table_names())
+            if fresh:
+                # Nothing to upgrade: build the current schema and mark every step done
+                metadata.create_all(conn)
+                for version, name, _ in migrations:
+                    record_version(conn, version, name)
+                logger.info(f"Created schema at version {migrations[-1][0]}")
+                return [version for version, _, _ in migrations]
+        for version, name, upgrade in migrations:
+            if version in done:
+                continue
+            with engine.begin() as conn:
+                upgrade(conn, metadata)
+                record_version(conn, version, name)
+            applied.append(version)
+            logger.info(f"Applied migration {version} {name}")
+    return applied
+
+
+def current_version(engine):
+    with engine.connect() as conn:
+        if 'schema_migrations' not in inspect(conn).get_table_names():
+            return 0
+        return conn.execute(text('SELECT MAX(version) FROM schema_migrations')).scalar() or 0
+
+
+def explain(conn, statement):
+    """The query plan for a Core statement, one string per plan line"""
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})
+    if conn.dialect.name == 'postgresql':
+        return [row[0] for row in conn.execute(text(f'EXPLAIN {compiled}'))]
+    return [row[-1] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))]
+
+
+def check_query_plans(engine, queries):
+    """Run EXPLAIN for (name, statement, index_name) entries
+
+    Returns [(name, index_name, uses_index, plan_lines)]. On Postgres
+    sequential scans are disabled for the check, so it shows whether an
+    index can serve the query even on a near-empty table where the planner
+    would rightly prefer a scan.
+    """
+    results = []
+    with engine.connect() as conn:
+        if conn.dialect.name == 'postgresql':
+            # Reverted when the connection closes and its transaction rolls back
+            conn.execute(text('SET LOCAL enable_seqscan = off'))
+        for name, statement, index_name in queries:
+            plan = explain(conn, statement)
+            results.append((name, index_name, any(index_name in line for line in plan), plan))
+    return results
@@ -1,21 +1,65 @@
-# c:/Users/Vashi/eco-guardian/backend/models.py
-from flask_sqlalchemy import SQLAlchemy
+# models.py
+"""Database models, bound to an app by create_app() through db.init_app()"""
 from datetime import datetime
 
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import validates
+
+from geo import encode as geohash_encode, parse_location
+from rules import state_for
+
 db = SQLAlchemy()
 
+def set_coordinates(row, location):
+    """Keep the numeric coordinate and geohash columns in step with the location string"""
+    point = parse_location(location)
+    if point is None:
+        row.latitude = row.longitude = row.geo_cell = None
+    else:
+        row.latitude, row.longitude = point
+        row.geo_cell = geohash_encode(*point)
+
 class SmartBin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     location = db.Column(db.String(100), nullable=False)
     fill_level = db.Column(db.Float, default=0)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    name = db.Column(db.String(100), nullable=True)  # Add name field for better identification
+    version = db.Column(db.Integer, default=0, index=True)  # Change version of the last write
+    # Parsed from location so the server can filter by area
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geo_cell = db.Column(db.String(12), index=True)  # Geohash
+    # Estimated from the reading stream, see forecast.py
+    fill_rate = db.Column(db.Float)  # Percent per hour
+    predicted_full_at = db.Column(db.DateTime, index=True)
+    rate_anchor_level = db.Column(db.Float)  # The reading fill_rate was last measured to
+    rate_anchor_at = db.Column(db.DateTime)
+    # Kept by the rules in rules.py as readings arrive
+    fill_state = db.Column(db.String(16), default='normal', index=True)
+    level_since = db.Column(db.DateTime)  # When the current level was first reported
+    sensor_stuck = db.Column(db.Boolean, default=False)
+    
+    __table_args__ = (db.Index('ix_smart_bin_lat_lng', 'latitude', 'longitude'),)
+    
+    @validates('location')
+    def validate_location(self, key, location):
+        set_coordinates(self, location)
+        return location
     
     def to_dict(self):
         return {
             'id': self.id,
             'location': self.location,
-            'fill_level': self.fill_level,
-            'last_updated': self.last_updated.isoformat() if self.last_updated else None
+            'fill_level': round(self.fill_level, 0),  # Always return whole number
+            'last_updated': self.last_updated.isoformat() if self.last_updated else None,
+            'name': self.name,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'fill_rate': round(self.fill_rate, 3) if self.fill_rate is not None else None,
+            'predicted_full_at': self.predicted_full_at.isoformat() if self.predicted_full_at else None,
+            'fill_state': self.fill_state or state_for(self.fill_level or 0),
+            'sensor_stuck': bool(self.sensor_stuck)
         }
 
 class LitterAlert(db.Model):
@@ -24,6 +68,29 @@ class LitterAlert(db.Model):
     confidence = db.Column(db.Float, default=0)
     image_url = db.Column(db.String(200))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    description = db.Column(db.String(500))
+    version = db.Column(db.Integer, default=0, index=True)  # Change version of the last write
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geo_cell = db.Column(db.String(12), index=True)  # Geohash
+    # Repeat reports of the same spot are merged into one alert
+    occurrence_count = db.Column(db.Integer, default=1)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime)  # Kept for history until archived
+    bin_id = db.Column(db.Integer, db.ForeignKey('smart_bin.id'))  # Set when raised at a known bin
+    
+    __table_args__ = (
+        db.Index('ix_litter_alert_lat_lng', 'latitude', 'longitude'),
+        db.Index('ix_litter_alert_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_litter_alert_geo_cell_last_seen', 'geo_cell', 'last_seen'),
+        db.Index('ix_litter_alert_bin_id_timestamp_id', 'bin_id', 'timestamp', 'id'),
+        db.Index('ix_litter_alert_resolved_at_timestamp_id', 'resolved_at', 'timestamp', 'id'),
+    )
+    
+    @validates('location')
+    def validate_location(self, key, location):
+        set_coordinates(self, location)
+        return location
     
     def to_dict(self):
         return {
@@ -31,5 +98,121 @@ class LitterAlert(db.Model):
             'location': self.location,
             'confidence': self.confidence,
             'image_url': self.image_url,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None
-        }
\ No newline at end of file
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'description': self.description,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'occurrence_count': self.occurrence_count or 1,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
+            'bin_id': self.bin_id
+        }
+class QRComplaint(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    bin_id = db.Column(db.Integer, db.ForeignKey('smart_bin.id'), nullable=False)
+    complaint_type = db.Column(db.String(50), nullable=False)
+    description = db.Column(db.String(500))
+    image_url = db.Column(db.String(200))
+    location = db.Column(db.String(100))
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), default='pending')  # pending, resolved, in_progress
+    citizen_contact = db.Column(db.String(100))  # Optional contact info
+    resolved_at = db.Column(db.DateTime)  # Set when status becomes resolved; retention counts from here
+    
+    __table_args__ = (
+        db.Index('ix_qr_complaint_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_qr_complaint_status_timestamp_id', 'status', 'timestamp', 'id'),
+        db.Index('ix_qr_complaint_bin_id_timestamp_id', 'bin_id', 'timestamp', 'id'),
+        db.Index('ix_qr_complaint_resolved_at_id', 'resolved_at', 'id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'bin_id': self.bin_id,
+            'complaint_type': self.complaint_type,
+            'description': self.description,
+            'image_url': self.image_url,
+            'location': self.location,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'status': self.status,
+            'citizen_contact': self.citizen_contact,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None
+        }
+
+# Single-row counter that every bin and alert write bumps
+class ChangeCounter(db.Model):
+    __tablename__ = 'change_counter'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# Record of deleted rows so delta sync clients can drop them
+class Tombstone(db.Model):
+    __tablename__ = 'tombstone'
+
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(30), nullable=False)
+    object_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, index=True)
+
+# Shared log of live update events, read by every worker's stream poller
+class StreamEvent(db.Model):
+    __tablename__ = 'stream_event'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(30), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+# Append-only fill level history, one row per reading
+class BinReading(db.Model):
+    __tablename__ = 'bin_reading'
+    __table_args__ = (
+        db.Index('ix_bin_reading_bin_ts', 'bin_id', 'timestamp'),
+        db.Index('ix_bin_reading_timestamp', 'timestamp'),  # Retention
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    bin_id = db.Column(db.Integer, db.ForeignKey('smart_bin.id'), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    fill_level = db.Column(db.Float, nullable=False)
+
+    def to_dict(self):
+        return {
+            'timestamp': self.timestamp.isoformat(),
+            'fill_level': self.fill_level
+        }
+
+# Per-bin 1-minute, hourly and daily aggregates, merged as readings arrive
+class BinReadingRollup(db.Model):
+    __tablename__ = 'bin_reading_rollup'
+    __table_args__ = (db.Index('ix_bin_reading_rollup_resolution_bucket', 'resolution', 'bucket'),)  # Retention
+
+    bin_id = db.Column(db.Integer, db.ForeignKey('smart_bin.id'), primary_key=True)
+    resolution = db.Column(db.String(2), primary_key=True)  # 1m, 1h, 1d
+    bucket = db.Column(db.DateTime, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    min_level = db.Column(db.Float, nullable=False)
+    max_level = db.Column(db.Float, nullable=False)
+    last_level = db.Column(db.Float, nullable=False)
+    last_ts = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'timestamp': self.bucket.isoformat(),
+            'fill_level': round(self.total / self.count, 2),
+            'min': self.min_level,
+            'max': self.max_level,
+            'last': self.last_level,
+            'count': self.count
+        }
+
+# Time-limited ownership of a job that only one worker may run at a time
+class Lease(db.Model):
+    __tablename__ = 'lease'
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100))
+    expires_at = db.Column(db.DateTime)
@@ -0,0 +1,39 @@
+# pagination.py
+"""Opaque cursors for keyset pagination over (timestamp, id)"""
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class CursorError(ValueError):
+    """Raised when a cursor or page size from the client is invalid"""
+
+
+def encode_cursor(timestamp, row_id):
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, id) position a cursor points after"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError):
+        raise CursorError('Invalid cursor')
+
+
+def page_size(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise CursorError('limit must be an integer')
+    if not (1 <= size <= MAX_PAGE_SIZE):
+        raise CursorError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return size
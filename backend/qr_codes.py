@@ -0,0 +1,143 @@
+# qr_codes.py
+"""Permanent bin QR codes and their content-addressed image cache"""
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://swachh-doot-2-o.onrender.com"
+
+# Changing how codes are drawn must change every cache key
+RENDER_VERSION = 'v1-L-8-2'
+
+IMAGE_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def complaint_url(bin_id, bin_name, bin_location):
+    """Build the complaint form URL a bin's QR code points at"""
+    # Clean the data to avoid any encoding issues
+    clean_bin_name = bin_name.replace(':', '-') if bin_name else f"Bin-{bin_id}"
+    clean_location = bin_location.replace(':', '-') if bin_location else "Unknown-Location"
+    return f"{BASE_URL}/complaint?bin_id={bin_id}&name={clean_bin_name}&location={clean_location}"
+
+
+def qr_digest(qr_data):
+    """Content hash used as the cache key and immutable URL version"""
+    return hashlib.sha256(f"{RENDER_VERSION}\n{qr_data}".encode('utf-8')).hexdigest()[:32]
+
+
+def build_qr(qr_data):
+    # Imported on first use: qrcode pulls in PIL, which a worker that never draws a code need not load
+    import qrcode
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=8,
+        border=2,
+    )
+    qr.add_data(qr_data)
+    qr.make(fit=True)
+    return qr
+
+
+def render_qr(qr_data, image_format='png'):
+    """Render a QR code image and return its bytes"""
+    qr = build_qr(qr_data)
+    buffer = io.BytesIO()
+    if image_format == 'svg':
+        import qrcode.image.svg
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        img.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def generate_permanent_qr_code(bin_id, bin_name, bin_location):
+    """Generate permanent QR code with actual complaint form URL"""
+    try:
+        # Use the actual URL as QR data (this will open the complaint form directly)
+        qr_data = complaint_url(bin_id, bin_name, bin_location)
+        logger.debug(f"Generating QR for: {qr_data}")
+
+        # Check if PIL is available
+        try:
+            import PIL  # noqa: F401
+            img_str = base64.b64encode(render_qr(qr_data)).decode('utf-8')
+            logger.debug(f"QR generated successfully for bin {bin_id}")
+            return img_str, qr_data
+
+        except ImportError:
+            # PIL is not available, use SVG placeholder
+            logger.warning(f"PIL not available, using SVG placeholder for bin {bin_id}")
+            return generate_svg_placeholder(qr_data, bin_id, bin_name), qr_data
+
+    except Exception as e:
+        logger.error(f"Error in generate_permanent_qr_code for bin {bin_id}: {e}")
+        # Fallback to simple URL
+        fallback_url = f"{BASE_URL}/complaint?bin_id={bin_id}"
+        return generate_svg_placeholder(fallback_url, bin_id, bin_name), fallback_url
+
+
+def generate_svg_placeholder(qr_data, bin_id, bin_name):
+    """Generate an SVG placeholder when PIL is not available"""
+    # Create a simple SVG placeholder that shows it's clickable
+    svg_content = f'''<svg width="140" height="140" viewBox="0 0 140 140" xmlns="http://www.w3.org/2000/svg">
+        <rect width="140" height="140" fill="#f8f9fa" stroke="#3498db" stroke-width="2" rx="8"/>
+        <text x="70" y="30" text-anchor="middle" font-family="Arial, sans-serif" font-size="12" fill="#2c3e50" font-weight="bold">SCAN ME</text>
+        <text x="70" y="50" text-anchor="middle" font-family="Arial, sans-serif" font-size="10" fill="#666">{bin_name}</text>
+        <text x="70" y="65" text-anchor="middle" font-family="Arial, sans-serif" font-size="8" fill="#999">Bin ID: {bin_id}</text>
+        <rect x="35" y="75" width="70" height="30" fill="#3498db" rx="4"/>
+        <text x="70" y="95" text-anchor="middle" font-family="Arial, sans-serif" font-size="9" fill="white">Report Issue</text>
+        <text x="70" y="115" text-anchor="middle" font-family="Arial, sans-serif" font-size="6" fill="#999">Tap to open form</text>
+    </svg>'''
+
+    # Convert SVG to data URL
+    svg_bytes = svg_content.encode('utf-8')
+    svg_data_url = f"data:image/svg+xml;base64,{base64.b64encode(svg_bytes).decode('utf-8')}"
+
+    return svg_data_url
+
+
+class QRImageCache:
+    """Rendered QR images on disk, keyed by a hash of their payload"""
+
+    def __init__(self, directory=None, on_render=None):
+        self.directory = None
+        # Called with (image_format, seconds) after each render, for metrics
+        self.on_render = on_render
+        if directory is not None:
+            self.open(directory)
+
+    def open(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def path(self, digest, image_format):
+        # Two-level fan-out keeps directories small for large fleets
+        return os.path.join(self.directory, digest[:2], f"{digest}.{image_format}")
+
+    def get(self, qr_data, image_format='png'):
+        """Return (digest, path) for the image, rendering it on first use"""
+        digest = qr_digest(qr_data)
+        path = self.path(digest, image_format)
+        if not os.path.exists(path):
+            started = time.perf_counter()
+            data = render_qr(qr_data, image_format)
+            if self.on_render:
+                self.on_render(image_format, time.perf_counter() - started)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            logger.info(f"Rendered and cached QR image {digest}.{image_format}")
+        return digest, path
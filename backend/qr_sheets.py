@@ -0,0 +1,287 @@
+# qr_sheets.py
+"""Bulk QR sticker sheets: renders codes across a process pool into a printable A4 PDF
+
+Run as a separate process so a print job for a whole ward never ties up
+a web worker:
+
+    QR_CACHE_DIR=<cache_dir> python qr_sheets.py <job_dir>
+
+The job directory holds bins.json (written by the API), status.json
+(progress, rewritten as codes complete) and the finished sheets.pdf.
+Codes come from the API's QRImageCache when QR_CACHE_DIR is set, so a
+sheet only renders codes nobody has fetched yet. The API starts at most
+JobSlots.count jobs at once across all of its workers. Each worker keeps
+its queue in memory, so fail_orphaned_jobs() fails the queued jobs of
+workers that exited, and running jobs whose process died.
+"""
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from qr_codes import QRImageCache, complaint_url, render_qr
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+# A4 at 150 DPI
+DPI = 150
+PAGE_SIZE = (1240, 1754)
+MARGIN = 60
+COLUMNS = 4
+ROWS = 5
+QR_SIZE = 240
+CAPTION_HEIGHT = 50
+
+ARTIFACT_NAME = 'sheets.pdf'
+STATUS_INTERVAL = 0.25  # Seconds between progress writes
+
+
+# Set in each pool process by open_cache()
+image_cache = None
+
+
+def open_cache(cache_dir):
+    """Pool initializer: share rendered codes with the API's image cache"""
+    global image_cache
+    image_cache = QRImageCache(cache_dir) if cache_dir else None
+
+
+def render_code(bin_data):
+    """Pool worker: return (bin, png_bytes), with None when the code cannot be drawn"""
+    bin_id, bin_name, bin_location = bin_data
+    qr_data = complaint_url(bin_id, bin_name or f"Bin {bin_id}", bin_location)
+    try:
+        if image_cache is None:
+            return bin_data, render_qr(qr_data)
+        _, path = image_cache.get(qr_data, 'png')
+        with open(path, 'rb') as f:
+            return bin_data, f.read()
+    except Exception:
+        return bin_data, None
+
+
+def write_status(job_dir, status):
+    path = os.path.join(job_dir, 'status.json')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)
+
+
+def read_status(job_dir):
+    with open(os.path.join(job_dir, 'status.json')) as f:
+        return json.load(f)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def owner_pid(status):
+    """The process a job waits on: its worker while queued, its own process once running"""
+    if status.get('state') == 'queued':
+        return status.get('worker')
+    if status.get('state') == 'running':
+        return status.get('pid')
+    return None
+
+
+class SheetLayout:
+    """Places QR codes with name and ID captions on a grid of A4 pages"""
+
+    def __init__(self):
+        from PIL import Image, ImageDraw, ImageFont
+
+        self._image = Image
+        self._draw = ImageDraw
+        try:
+            self.font = ImageFont.load_default(size=18)
+        except TypeError:  # Pillow < 10.1
+            self.font = ImageFont.load_default()
+        self.cell_width = (PAGE_SIZE[0] - 2 * MARGIN) // COLUMNS
+        self.cell_height = (PAGE_SIZE[1] - 2 * MARGIN) // ROWS
+        self.pages = []
+        self.count = 0
+
+    def add(self, bin_data, png_bytes):
+        slot = self.count % (COLUMNS * ROWS)
+        if slot == 0:
+            self.pages.append(self._image.new('RGB', PAGE_SIZE, 'white'))
+        page = self.pages[-1]
+        draw = self._draw.Draw(page)
+        self.count += 1
+
+        left = MARGIN + (slot % COLUMNS) * self.cell_width
+        top = MARGIN + (slot // COLUMNS) * self.cell_height
+        qr_left = left + (self.cell_width - QR_SIZE) // 2
+
+        # Cut guide around each sticker
+        draw.rectangle([left, top, left + self.cell_width - 1, top + self.cell_height - 1], outline='#cccccc')
+
+        if png_bytes is not None:
+            code = self._image.open(io.BytesIO(png_bytes)).convert('RGB')
+            page.paste(code.resize((QR_SIZE, QR_SIZE), self._image.NEAREST), (qr_left, top + 10))
+
+        bin_id, bin_name, _ = bin_data
+        caption_top = top + QR_SIZE + 20
+        for offset, text in enumerate((bin_name or f"Bin {bin_id}", f"Bin ID: {bin_id}")):
+            width = draw.textlength(text, font=self.font)
+            draw.text((left + (self.cell_width - width) / 2, caption_top + offset * 24), text, fill='black', font=self.font)
+
+    def save(self, path):
+        first, rest = self.pages[0], self.pages[1:]
+        first.save(path, 'PDF', resolution=DPI, save_all=True, append_images=rest)
+
+
+class JobSlots:
+    """At most count sheet jobs running at once, across processes, via lock files"""
+
+    def __init__(self, directory=None, count=1):
+        self.directory = directory
+        self.count = max(1, count)
+
+    def open(self, directory):
+        self.directory = directory
+
+    def acquire(self):
+        """Return a held slot, or None if all are taken"""
+        if fcntl is None:
+            return object()
+        os.makedirs(self.directory, exist_ok=True)
+        for number in range(self.count):
+            slot = open(os.path.join(self.directory, f".slot-{number}.lock"), 'a')
+            try:
+                fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot
+            except OSError:
+                slot.close()
+        return None
+
+    def release(self, slot):
+        if fcntl is not None:
+            fcntl.flock(slot, fcntl.LOCK_UN)
+            slot.close()
+
+
+def expire_jobs(jobs_dir, cutoff):
+    """Delete job directories finished, or created and never finished, before cutoff; returns the count"""
+    expired = 0
+    try:
+        names = os.listdir(jobs_dir)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        job_dir = os.path.join(jobs_dir, name)
+        if name.startswith('.') or not os.path.isdir(job_dir):
+            continue
+        try:
+            status = read_status(job_dir)
+            ended = datetime.fromisoformat(status.get('finished') or status['created'])
+        except (OSError, ValueError, KeyError):
+            # Half-written job: go by the directory's age
+            ended = datetime.fromtimestamp(os.path.getmtime(job_dir), timezone.utc).replace(tzinfo=None)
+        if ended < cutoff:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            expired += 1
+    return expired
+
+
+def fail_orphaned_jobs(jobs_dir):
+    """Mark queued or running jobs whose owning process has exited as failed; returns the count"""
+    failed = 0
+    try:
+        names = os.listdir(jobs_dir)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        job_dir = os.path.join(jobs_dir, name)
+        if name.startswith('.') or not os.path.isdir(job_dir):
+            continue
+        try:
+            status = read_status(job_dir)
+            pid = owner_pid(status)
+            if pid is None or pid_alive(pid):
+                continue
+            # The job may have finished between the two reads
+            if owner_pid(read_status(job_dir)) != pid:
+                continue
+        except (OSError, ValueError):
+            continue
+        status.update({
+            'state': 'failed',
+            'error': 'Worker exited before the job finished',
+            'finished': datetime.utcnow().isoformat()
+        })
+        write_status(job_dir, status)
+        failed += 1
+    return failed
+
+
+def run_job(job_dir, processes=None, cache_dir=None):
+    with open(os.path.join(job_dir, 'bins.json')) as f:
+        bins = [tuple(item) for item in json.load(f)]
+
+    status = read_status(job_dir)
+    status.update({
+        'state': 'running',
+        'pid': os.getpid(),
+        'total': len(bins),
+        'done': 0,
+        'started': datetime.utcnow().isoformat()
+    })
+    write_status(job_dir, status)
+
+    started = time.time()
+    last_write = 0
+    layout = SheetLayout()
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=open_cache, initargs=(cache_dir,)) as pool:
+            # map() keeps input order, so stickers print in the order requested
+            chunksize = max(1, min(64, len(bins) // ((processes or os.cpu_count() or 1) * 4)))
+            for bin_data, png_bytes in pool.map(render_code, bins, chunksize=chunksize):
+                layout.add(bin_data, png_bytes)
+                if png_bytes is None:
+                    status['failed'] = status.get('failed', 0) + 1
+                now = time.time()
+                if now - last_write >= STATUS_INTERVAL:
+                    status['done'] = layout.count
+                    status['codes_per_second'] = round(layout.count / max(now - started, 1e-6), 1)
+                    write_status(job_dir, status)
+                    last_write = now
+
+        if layout.count:
+            layout.save(os.path.join(job_dir, ARTIFACT_NAME))
+        elapsed = time.time() - started
+        status.update({
+            'state': 'completed',
+            'done': layout.count,
+            'pages': len(layout.pages),
+            'elapsed_seconds': round(elapsed, 3),
+            'codes_per_second': round(layout.count / max(elapsed, 1e-6), 1),
+            'artifact': ARTIFACT_NAME if layout.count else None,
+            'finished': datetime.utcnow().isoformat()
+        })
+    except Exception as e:
+        status.update({'state': 'failed', 'error': str(e), 'finished': datetime.utcnow().isoformat()})
+    write_status(job_dir, status)
+    return status
+
+
+if __name__ == '__main__':
+    processes = int(os.environ['QR_SHEET_PROCESSES']) if os.environ.get('QR_SHEET_PROCESSES') else None
+    result = run_job(sys.argv[1], processes, os.environ.get('QR_CACHE_DIR'))
+    print(json.dumps(result))
+    sys.exit(0 if result['state'] == 'completed' else 1)
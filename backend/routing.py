@@ -0,0 +1,266 @@
+# routing.py
+"""Collection route optimisation: haversine distances, tour construction and local search"""
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Candidate neighbours examined per stop during 2-opt and Or-opt
+NEIGHBOURS = 10
+
+# Rows of the distance matrix computed per vectorized block, bounding temporary memory
+BLOCK_ROWS = 1024
+
+
+def haversine_matrix(coords):
+    """Great-circle distances in km between every pair of (lat, lng) rows
+
+    Computed in float32 with NumPy broadcasting, one block of rows at a time
+    so 5,000 stops need ~100 MB for the result rather than several times that
+    in float64 temporaries.
+    """
+    radians = np.radians(np.asarray(coords, dtype=np.float64)).astype(np.float32)
+    lat, lng = radians[:, 0], radians[:, 1]
+    cos_lat = np.cos(lat)
+    n = len(radians)
+    dist = np.empty((n, n), dtype=np.float32)
+    for start in range(0, n, BLOCK_ROWS):
+        rows = slice(start, start + BLOCK_ROWS)
+        a = (np.sin((lat[rows, None] - lat[None, :]) / 2) ** 2
+             + cos_lat[rows, None] * cos_lat[None, :] * np.sin((lng[rows, None] - lng[None, :]) / 2) ** 2)
+        dist[rows] = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return dist
+
+
+def nearest_neighbours(dist, k=NEIGHBOURS):
+    """Indices of each node's k closest other nodes, closest first"""
+    n = len(dist)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.int64)
+    result = np.empty((n, k), dtype=np.int64)
+    for start in range(0, n, BLOCK_ROWS):
+        block = dist[start:start + BLOCK_ROWS].copy()
+        block[np.arange(len(block)), np.arange(start, start + len(block))] = np.inf
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(block, nearest, axis=1).argsort(axis=1)
+        result[start:start + len(block)] = np.take_along_axis(nearest, order, axis=1)
+    return result
+
+
+def tour_length(tour, dist):
+    """Length of a closed tour given as node indices"""
+    tour = np.asarray(tour)
+    if len(tour) < 2:
+        return 0.0
+    return float(dist[tour, np.roll(tour, -1)].sum(dtype=np.float64))
+
+
+def nearest_neighbour_tour(dist, start=0):
+    """Greedy construction: always drive to the closest unvisited stop"""
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    tour = [start]
+    visited[start] = True
+    current = start
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[current])
+        current = int(row.argmin())
+        visited[current] = True
+        tour.append(current)
+    return tour
+
+
+def two_opt(tour, dist, neighbours, deadline):
+    """Remove crossing edges with neighbour-list 2-opt until no move improves"""
+    n = len(tour)
+    if n < 4:
+        return list(tour)
+    tour = np.array(tour, dtype=np.int64)
+    pos = np.empty(n, dtype=np.int64)
+    pos[tour] = np.arange(n)
+
+    improved = True
+    while improved and time.time() < deadline:
+        improved = False
+        for i in range(n):
+            a = tour[i]
+            b = tour[(i + 1) % n]
+            d_ab = dist[a, b]
+            for c in neighbours[a]:
+                d_ac = dist[a, c]
+                # Neighbours are sorted, so no later candidate can shorten edge a-b
+                if d_ac >= d_ab:
+                    break
+                j = pos[c]
+                d = tour[(j + 1) % n]
+                if c == b or d == a:
+                    continue
+                if d_ac + dist[b, d] - d_ab - dist[c, d] < -1e-6:
+                    # Replace edges a-b and c-d with a-c and b-d
+                    lo, hi = (i + 1, j) if i < j else (j + 1, i)
+                    tour[lo:hi + 1] = tour[lo:hi + 1][::-1].copy()
+                    pos[tour[lo:hi + 1]] = np.arange(lo, hi + 1)
+                    improved = True
+                    a = tour[i]
+                    b = tour[(i + 1) % n]
+                    d_ab = dist[a, b]
+                    break
+            if time.time() >= deadline:
+                break
+    return tour.tolist()
+
+
+def or_opt(tour, dist, neighbours, deadline, max_segment=3):
+    """Relocate chains of up to max_segment stops next to one of their neighbours"""
+    n = len(tour)
+    if n < 5:
+        return list(tour)
+    tour = list(tour)
+    pos = {node: index for index, node in enumerate(tour)}
+
+    improved = True
+    while improved and time.time() < deadline:
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 0
+            while i < n and time.time() < deadline:
+                segment = [tour[(i + offset) % n] for offset in range(length)]
+                prev_node = tour[i - 1]
+                next_node = tour[(i + length) % n]
+                if next_node in segment or prev_node in segment:
+                    i += 1
+                    continue
+                first, last = segment[0], segment[-1]
+                removal_gain = dist[prev_node, first] + dist[last, next_node] - dist[prev_node, next_node]
+
+                best = None
+                for c in neighbours[first]:
+                    if c in segment:
+                        continue
+                    e = tour[(pos[c] + 1) % n]
+                    if e in segment:
+                        continue
+                    # Insert between c and e, forwards or reversed
+                    forward = dist[c, first] + dist[last, e] - dist[c, e]
+                    backward = dist[c, last] + dist[first, e] - dist[c, e]
+                    cost, reverse = (forward, False) if forward <= backward else (backward, True)
+                    if removal_gain - cost > 1e-6 and (best is None or cost < best[0]):
+                        best = (cost, c, reverse)
+
+                if best is None:
+                    i += 1
+                    continue
+
+                _, c, reverse = best
+                moved = segment[::-1] if reverse else segment
+                moving = set(segment)
+                remaining = [node for node in tour if node not in moving]
+                insert_at = remaining.index(c) + 1
+                tour = remaining[:insert_at] + moved + remaining[insert_at:]
+                pos = {node: index for index, node in enumerate(tour)}
+                improved = True
+                i += 1
+    return tour
+
+
+def improve(tour, dist, neighbours, deadline):
+    """Alternate 2-opt and Or-opt until neither finds a shorter tour"""
+    best = tour_length(tour, dist)
+    while time.time() < deadline:
+        tour = two_opt(tour, dist, neighbours, deadline)
+        tour = or_opt(tour, dist, neighbours, deadline)
+        length = tour_length(tour, dist)
+        if length >= best - 1e-6:
+            break
+        best = length
+    return tour
+
+
+def rotate_to(tour, node):
+    index = tour.index(node)
+    return tour[index:] + tour[:index]
+
+
+def split_by_capacity(order, demands, capacity):
+    """Cut a visiting order into consecutive trips that each fit in one truck"""
+    trips = []
+    current = []
+    load = 0.0
+    for node in order:
+        demand = demands[node]
+        if current and load + demand > capacity:
+            trips.append(current)
+            current, load = [], 0.0
+        current.append(node)
+        load += demand
+    if current:
+        trips.append(current)
+    return trips
+
+
+def trip_length(trip, dist, depot=0):
+    return tour_length([depot] + list(trip), dist)
+
+
+def solve(depot, stops, demands, capacity=None, trucks=1, time_limit=5.0):
+    """Plan collection trips from depot through every stop
+
+    depot is a (lat, lng) pair, stops a list of (lat, lng) and demands the
+    load each stop adds to a truck. Builds one giant tour (nearest neighbour,
+    then 2-opt and Or-opt), splits it into capacity-feasible trips, polishes
+    each trip and hands trips to the least-loaded truck. The naive baseline
+    visits stops in the given order with the same capacity split.
+    """
+    started = time.time()
+    deadline = started + time_limit
+    coords = [depot] + list(stops)
+    node_demands = [0.0] + [float(demand) for demand in demands]
+    if capacity is None or capacity <= 0:
+        capacity = float('inf')
+
+    dist = haversine_matrix(coords)
+    neighbours = nearest_neighbours(dist)
+
+    tour = nearest_neighbour_tour(dist, start=0)
+    tour = improve(tour, dist, neighbours, started + time_limit * 0.8)
+    order = rotate_to(tour, 0)[1:]
+
+    trips = []
+    for trip in split_by_capacity(order, node_demands, capacity):
+        if len(trip) >= 3 and time.time() < deadline:
+            nodes = [0] + trip
+            sub = dist[np.ix_(nodes, nodes)]
+            local = improve(list(range(len(nodes))), sub, nearest_neighbours(sub), deadline)
+            trip = [nodes[index] for index in rotate_to(local, 0)[1:]]
+        trips.append(trip)
+
+    naive_trips = split_by_capacity(list(range(1, len(coords))), node_demands, capacity)
+    naive_distance = sum(trip_length(trip, dist) for trip in naive_trips)
+
+    # Longest trips first, each to the truck with the least driving so far
+    trucks = max(1, int(trucks))
+    truck_distance = [0.0] * trucks
+    routes = []
+    for trip in sorted(trips, key=lambda trip: -trip_length(trip, dist)):
+        truck = truck_distance.index(min(truck_distance))
+        length = trip_length(trip, dist)
+        truck_distance[truck] += length
+        routes.append({
+            'truck': truck + 1,
+            'stops': [index - 1 for index in trip],
+            'load': round(sum(node_demands[index] for index in trip), 2),
+            'distance_km': round(length, 3)
+        })
+    routes.sort(key=lambda route: route['truck'])
+
+    total_distance = sum(truck_distance)
+    return {
+        'routes': routes,
+        'total_distance_km': round(total_distance, 3),
+        'naive_distance_km': round(naive_distance, 3),
+        'distance_saved_km': round(naive_distance - total_distance, 3),
+        'truck_distance_km': [round(distance, 3) for distance in truck_distance],
+        'solve_time_ms': round((time.time() - started) * 1000, 1)
+    }
@@ -0,0 +1,80 @@
+# rules.py
+"""Per-bin fill state, updated by rules evaluated on every reading
+
+States change with hysteresis, so a sensor hovering around a threshold
+does not flap:
+
+    normal       -> getting_full  above 60    getting_full -> normal        below 55
+    getting_full -> full          above 80    full         -> getting_full  below 75
+
+A fall of more than EMPTIED_DROP points is a collection ('emptied') and
+the state restarts from the new level. A sensor that keeps reporting the
+exact same level for STUCK_AFTER is flagged stuck ('sensor_stuck') until
+the level moves again ('sensor_recovered').
+"""
+from datetime import timedelta
+
+from forecast import EMPTIED_DROP
+
+NORMAL = 'normal'
+GETTING_FULL = 'getting_full'
+FULL = 'full'
+STATES = (NORMAL, GETTING_FULL, FULL)
+
+# Level above which a state is entered and below which it is left again
+BANDS = {
+    GETTING_FULL: (60, 55),
+    FULL: (80, 75),
+}
+
+STUCK_AFTER = timedelta(hours=24)
+
+
+def state_for(level, current=NORMAL):
+    """The state after a reading at level for a bin currently in current"""
+    rank = STATES.index(current)
+    for state in (FULL, GETTING_FULL):
+        enter, leave = BANDS[state]
+        if level > enter or (rank >= STATES.index(state) and level >= leave):
+            return state
+    return NORMAL
+
+
+class BinState:
+    """The rule inputs kept on each bin row"""
+    __slots__ = ('fill_state', 'level', 'ts', 'level_since', 'stuck')
+
+    def __init__(self, fill_state, level, ts, level_since, stuck):
+        self.fill_state = fill_state or state_for(level or 0)
+        self.level = level
+        self.ts = ts
+        self.level_since = level_since
+        self.stuck = bool(stuck)
+
+
+def evaluate(state, level, ts):
+    """Apply one reading to state in place and return the transitions it caused"""
+    if state.ts is not None and ts < state.ts:
+        return []
+    transitions = []
+    previous = state.level
+    if previous is not None and previous - level > EMPTIED_DROP:
+        transitions.append('emptied')
+        new_state = state_for(level)
+    else:
+        new_state = state_for(level, state.fill_state)
+    if new_state != state.fill_state:
+        transitions.append(new_state)
+        state.fill_state = new_state
+
+    if previous is None or level != previous or state.level_since is None:
+        state.level_since = ts
+        if state.stuck:
+            state.stuck = False
+            transitions.append('sensor_recovered')
+    elif not state.stuck and ts - state.level_since >= STUCK_AFTER:
+        state.stuck = True
+        transitions.append('sensor_stuck')
+
+    state.level, state.ts = level, ts
+    return transitions
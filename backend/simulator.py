@@ -0,0 +1,55 @@
+# simulator.py
+"""Synthetic bin fleets and seeded fill-level ticks for the bin simulator"""
+import math
+
+from geo import EARTH_RADIUS_M
+
+# Largest fill change a simulated bin makes in one tick, in percentage points
+MAX_STEP = 5
+
+
+def generate_fleet(start_id, count, center, radius_m, seed=None):
+    """Yield (id, name, lat, lng, fill_level) for count bins scattered around center
+
+    Points are uniform over the disc, so density matches a city ward rather
+    than bunching at the centre. The same seed always gives the same fleet.
+    """
+    # Imported on first use, like everything numpy here: the web app only needs it once the simulator runs
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    lat0, lng0 = center
+    distance = radius_m * np.sqrt(rng.random(count))
+    bearing = rng.random(count) * 2 * math.pi
+    lat = lat0 + np.degrees(distance * np.cos(bearing) / EARTH_RADIUS_M)
+    lng = lng0 + np.degrees(distance * np.sin(bearing) / (EARTH_RADIUS_M * max(math.cos(math.radians(lat0)), 1e-6)))
+    fill = rng.integers(10, 91, count)
+    for offset in range(count):
+        bin_id = start_id + offset
+        yield bin_id, f"Sim Bin {bin_id}", round(float(lat[offset]), 6), round(float(lng[offset]), 6), int(fill[offset])
+
+
+class FleetSimulator:
+    """Seeded random walk of fill levels
+
+    update_fraction is the share of bins that report each tick; large fleets
+    use a small fraction so a tick writes a realistic trickle of readings.
+    """
+
+    def __init__(self, seed=None, update_fraction=1.0, max_step=MAX_STEP):
+        self.seed = seed
+        self.rng = None
+        self.update_fraction = update_fraction
+        self.max_step = max_step
+
+    def tick(self, ids, levels):
+        """Return (ids, new_levels) for the bins whose level changed"""
+        import numpy as np
+        if self.rng is None:
+            self.rng = np.random.default_rng(self.seed)
+        ids = np.asarray(ids, dtype=np.int64)
+        levels = np.asarray(levels, dtype=np.float64)
+        reporting = self.rng.random(len(ids)) < self.update_fraction
+        change = self.rng.integers(-self.max_step, self.max_step + 1, len(ids))
+        new_levels = np.clip(np.round(levels + change), 0, 100)
+        changed = reporting & (new_levels != levels)
+        return ids[changed].tolist(), new_levels[changed].astype(int).tolist()
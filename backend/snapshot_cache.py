@@ -0,0 +1,174 @@
+# snapshot_cache.py
+"""Snapshot of the dashboard read model shared by all workers on one host
+
+The snapshot lives in a JSON file next to a small memory-mapped control
+block holding a generation number and hit/miss/rebuild counters. Writers
+bump the generation after committing; readers compare it with the
+generation of the snapshot they hold and only rebuild from the database
+when it moved, taking a file lock so one worker rebuilds per change.
+Hits are counted in memory and added to the shared counter with the next
+miss, invalidation or stats() call, so a hit never takes a file lock.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+# generation, hits, misses, rebuilds, invalidations
+CONTROL_FORMAT = '<5Q'
+CONTROL_SIZE = struct.calcsize(CONTROL_FORMAT)
+COUNTERS = ('generation', 'hits', 'misses', 'rebuilds', 'invalidations')
+
+
+class SnapshotCache:
+    def __init__(self, directory=None):
+        self._control = None
+        self._hits = 0  # Not yet added to the shared counter
+        self._hits_lock = threading.Lock()
+        if directory is not None:
+            self.open(directory)
+
+    def open(self, directory):
+        """Create or attach to the snapshot files in directory"""
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, 'snapshot.json')
+        # Counters and rebuilds use separate locks so hits never wait on a rebuild
+        self._counter_lock = _FileLock(os.path.join(directory, 'snapshot.counters.lock'))
+        self._rebuild_lock = _FileLock(os.path.join(directory, 'snapshot.lock'))
+        self._local = (None, None)  # (generation, snapshot), swapped as one reference
+
+        control_path = os.path.join(directory, 'snapshot.ctl')
+        with self._counter_lock:
+            with open(control_path, 'ab') as f:
+                if f.tell() < CONTROL_SIZE:
+                    f.write(b'\0' * (CONTROL_SIZE - f.tell()))
+        self.close()
+        self._control_file = open(control_path, 'r+b')
+        self._control = mmap.mmap(self._control_file.fileno(), CONTROL_SIZE)
+
+    def close(self):
+        if self._control is not None:
+            self._control.close()
+            self._control_file.close()
+            self._control = None
+
+    def _read_control(self):
+        return dict(zip(COUNTERS, struct.unpack_from(CONTROL_FORMAT, self._control)))
+
+    def _hit(self):
+        with self._hits_lock:
+            self._hits += 1
+
+    def _bump(self, counter, amount=1):
+        with self._hits_lock:
+            hits, self._hits = self._hits, 0
+        with self._counter_lock:
+            if hits:
+                _add(self._control, 'hits', hits)
+            return _add(self._control, counter, amount)
+
+    def generation(self):
+        return struct.unpack_from('<Q', self._control, 0)[0]
+
+    def invalidate(self):
+        """Mark the snapshot stale after a committed write"""
+        self._bump('invalidations')
+        return self._bump('generation')
+
+    def stats(self):
+        self._bump('hits', 0)
+        stats = self._read_control()
+        stats['local_generation'] = self._local[0]
+        return stats
+
+    def get(self, builder):
+        """Return the current snapshot, calling builder() to rebuild it if stale"""
+        generation = self.generation()
+        local_generation, local = self._local
+        if local is not None and local_generation == generation:
+            self._hit()
+            return local
+
+        snapshot = self._load(generation)
+        if snapshot is not None:
+            self._hit()
+            return snapshot
+
+        with self._rebuild_lock:
+            # Another worker may have rebuilt it while we waited for the lock
+            generation = self.generation()
+            snapshot = self._load(generation)
+            if snapshot is None:
+                snapshot = builder()
+                self._store(generation, snapshot)
+                rebuilt = True
+            else:
+                rebuilt = False
+
+        if rebuilt:
+            self._bump('misses')
+            self._bump('rebuilds')
+        else:
+            self._hit()
+        return snapshot
+
+    def _load(self, generation):
+        try:
+            with open(self.data_path, 'rb') as f:
+                header = f.readline()
+                if int(header) != generation:
+                    return None
+                snapshot = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        self._local = (generation, snapshot)
+        return snapshot
+
+    def _store(self, generation, snapshot):
+        tmp_path = f'{self.data_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(f'{generation}\n'.encode())
+            f.write(json.dumps(snapshot, separators=(',', ':')).encode())
+        os.replace(tmp_path, self.data_path)
+        self._local = (generation, snapshot)
+
+
+def _add(control, counter, amount):
+    offset = COUNTERS.index(counter) * 8
+    value = struct.unpack_from('<Q', control, offset)[0] + amount
+    struct.pack_into('<Q', control, offset, value)
+    return value
+
+
+class _FileLock:
+    """Exclusive lock across processes (fcntl) and threads
+
+    The lock file is opened once per process; flock locks belong to the
+    open file, so a descriptor inherited across fork would not exclude.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is not None:
+            if self._pid != os.getpid():
+                self._file = open(self.path, 'a')
+                self._pid = os.getpid()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self.thread_lock.release()
@@ -0,0 +1,172 @@
+# sqlite_mode.py
+"""SQLite production settings: WAL pragmas, a right-sized pool and one writer at a time
+
+In WAL mode readers never wait for writers, but SQLite still allows a single
+writer per database. Rather than letting every worker thread race for the
+write lock and fail with "database is locked", writes queue here: a
+connection takes its turn (FIFO within a process, flock across processes)
+before its first write statement and gives it back once its COMMIT or ROLLBACK
+has returned.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # Durable at checkpoints; a crash can only lose the last commits
+    'busy_timeout': 5000,  # ms; covers other processes not using the writer queue
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Statements that only read and never need the write lock
+READ_ONLY_PREFIXES = ('SELECT', 'PRAGMA', 'EXPLAIN')
+
+
+def is_sqlite_file(uri):
+    return uri.startswith('sqlite') and ':memory:' not in uri and uri.rstrip('/') not in ('sqlite:', 'sqlite')
+
+
+def engine_options(pool_size=12, max_overflow=4):
+    """Engine options for SQLite, replacing the Postgres-style pool settings
+
+    Connections are a file handle each, so the pool only needs to cover the
+    request threads plus background threads; there is no server to ping or
+    connections to recycle.
+    """
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': 30,
+        'connect_args': {'check_same_thread': False, 'timeout': PRAGMAS['busy_timeout'] / 1000},
+    }
+
+
+class WriterQueue:
+    """First-come-first-served write turn for threads, exclusive across processes
+
+    Re-entrant per thread, so a thread that writes on two connections at
+    once does not wait for itself.
+    """
+
+    def __init__(self, lock_path, on_wait=None):
+        self.lock_path = lock_path
+        # Called with the seconds spent waiting for each turn, for metrics
+        self.on_wait = on_wait
+        self._condition = threading.Condition()
+        self._waiting = deque()
+        self._owner = None
+        self._depth = 0
+        self._file = None
+        self._pid = None
+
+    def acquire(self):
+        me = threading.get_ident()
+        started = time.perf_counter()
+        with self._condition:
+            if self._owner == me:
+                self._depth += 1
+                return
+            self._waiting.append(me)
+            while self._owner is not None or self._waiting[0] != me:
+                self._condition.wait()
+            self._waiting.popleft()
+            self._owner = me
+            self._depth = 1
+        if fcntl is not None:
+            if self._pid != os.getpid():
+                self._file = open(self.lock_path, 'a')
+                self._pid = os.getpid()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        if self.on_wait:
+            self.on_wait(time.perf_counter() - started)
+
+    def release(self):
+        with self._condition:
+            self._depth -= 1
+            if self._depth > 0:
+                return
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._owner = None
+            self._condition.notify_all()
+
+    def waiting(self):
+        return len(self._waiting)
+
+
+def install(engine, writer):
+    """Apply pragmas to every new connection and route writes through writer"""
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    # Raw connections holding the write turn; the turn is tied to the connection, not the thread
+    holders = set()
+
+    def dbapi_connection_of(connection):
+        # The pool passes its proxy when it rolls back a returned connection
+        return getattr(connection, 'dbapi_connection', connection)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def take_write_turn(conn, cursor, statement, parameters, context, executemany):
+        key = id(dbapi_connection_of(conn.connection))
+        if key in holders:
+            return
+        if statement.lstrip()[:7].upper().startswith(READ_ONLY_PREFIXES):
+            return
+        writer.acquire()
+        holders.add(key)
+
+    def end_write_turn(dbapi_connection):
+        key = id(dbapi_connection_of(dbapi_connection))
+        if key in holders:
+            holders.discard(key)
+            writer.release()
+
+    # The engine's commit and rollback events fire before the COMMIT is sent, while
+    # SQLite still holds its lock, so the turn is handed on only once the driver returns
+    dialect = engine.dialect
+    do_commit, do_rollback = dialect.do_commit, dialect.do_rollback
+
+    def commit_then_release(dbapi_connection):
+        try:
+            do_commit(dbapi_connection)
+        finally:
+            end_write_turn(dbapi_connection)
+
+    def rollback_then_release(dbapi_connection):
+        try:
+            do_rollback(dbapi_connection)
+        finally:
+            end_write_turn(dbapi_connection)
+
+    dialect.do_commit = commit_then_release
+    dialect.do_rollback = rollback_then_release
+
+    # Connections returned without an explicit commit or rollback
+    @event.listens_for(engine, 'checkin')
+    def release_on_checkin(dbapi_connection, connection_record):
+        end_write_turn(dbapi_connection)
+
+    # Connections dropped mid-transaction, so their id is never mistaken for a holder
+    @event.listens_for(engine, 'invalidate')
+    def release_on_invalidate(dbapi_connection, connection_record, exception):
+        end_write_turn(dbapi_connection)
+
+    @event.listens_for(engine, 'close')
+    def release_on_close(dbapi_connection, connection_record):
+        end_write_turn(dbapi_connection)
@@ -0,0 +1,177 @@
+# startup_benchmark.py
+"""Cold start benchmark: import time, app creation and first-request latency
+
+Each run uses a fresh process and a fresh SQLite file and times, in order:
+
+    import         `import app` in a new interpreter
+    create_app     create_app(), which migrates and seeds the empty database
+    first_request  the first GET /api/dashboard through the test client
+    server_ready   gunicorn launch until its first 200 from /api/health/live
+    server_first   then the first GET /api/dashboard over HTTP
+
+    python startup_benchmark.py --runs 5
+    python startup_benchmark.py --save-baseline startup.json
+    python startup_benchmark.py --baseline startup.json   # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import requests
+
+# A phase regresses if its median grows by more than this
+DEFAULT_TOLERANCE = 0.2
+# Differences under this are treated as noise
+MIN_DELTA_MS = 20.0
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Run in a new interpreter so nothing is imported yet; prints one JSON line of timings
+IN_PROCESS_SCRIPT = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+status = application.test_client().get('/api/dashboard').status_code
+done = time.perf_counter()
+print(json.dumps({'import': (imported - started) * 1000, 'create_app': (created - imported) * 1000,
+                  'first_request': (done - created) * 1000, 'status': status}))
+'''
+
+
+def run_env(workdir):
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        'SNAPSHOT_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'QR_CACHE_DIR': os.path.join(workdir, 'qr_cache'),
+        'QR_JOBS_DIR': os.path.join(workdir, 'qr_jobs'),
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+        'ARCHIVE_DIR': os.path.join(workdir, 'archive'),
+        'LOG_LEVEL': 'WARNING',
+    })
+    return env
+
+
+def time_in_process(workdir):
+    output = subprocess.run(
+        [sys.executable, '-c', IN_PROCESS_SCRIPT], cwd=BACKEND_DIR, env=run_env(workdir),
+        capture_output=True, text=True, check=True, timeout=120
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    if timings.pop('status') != 200:
+        raise RuntimeError('First dashboard request failed')
+    return timings
+
+
+def time_server(args, workdir):
+    base_url = f"http://127.0.0.1:{args.port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '--threads', str(args.threads),
+         '-b', f"127.0.0.1:{args.port}", 'app:create_app()'],
+        cwd=BACKEND_DIR, env=run_env(workdir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + args.startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError('Server exited during startup')
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"Server not ready after {args.startup_timeout}s")
+            try:
+                if requests.get(f"{base_url}/api/health/live", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                time.sleep(0.02)
+        ready = time.perf_counter()
+        requests.get(f"{base_url}/api/dashboard", timeout=30).raise_for_status()
+        return {'server_ready': (ready - started) * 1000, 'server_first': (time.perf_counter() - ready) * 1000}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def summarize(samples):
+    phases = {}
+    for phase, values in samples.items():
+        values = np.asarray(values)
+        phases[phase] = {
+            'median_ms': round(float(np.median(values)), 1),
+            'min_ms': round(float(values.min()), 1),
+            'max_ms': round(float(values.max()), 1)
+        }
+    return phases
+
+
+def compare(current, baseline, tolerance):
+    """Return a list of regression messages for phases present in both runs"""
+    regressions = []
+    for phase, stats in current['phases'].items():
+        base = baseline['phases'].get(phase)
+        if base is None:
+            continue
+        if stats['median_ms'] > base['median_ms'] * (1 + tolerance) and stats['median_ms'] - base['median_ms'] > MIN_DELTA_MS:
+            regressions.append(f"{phase}: median_ms {base['median_ms']} -> {stats['median_ms']}")
+    return regressions
+
+
+def print_report(result, regressions):
+    print(f"{'phase':<16}{'median':>10}{'min':>10}{'max':>10}")
+    for phase, stats in result['phases'].items():
+        print(f"{phase:<16}{stats['median_ms']:>10}{stats['min_ms']:>10}{stats['max_ms']:>10}")
+    for message in regressions:
+        print(f"REGRESSION {message}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-server', action='store_true', help='Skip the gunicorn phases')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--baseline', help='Compare against this baseline and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--save-baseline', help='Write this run to a JSON baseline file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    samples = {}
+    for _ in range(args.runs):
+        timings = time_in_process(tempfile.mkdtemp(prefix='eco-guardian-startup-'))
+        if not args.no_server:
+            timings.update(time_server(args, tempfile.mkdtemp(prefix='eco-guardian-startup-')))
+        for phase, value in timings.items():
+            samples.setdefault(phase, []).append(value)
+
+    result = {
+        'created': datetime.utcnow().isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('baseline', 'save_baseline')},
+        'phases': summarize(samples)
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+    print_report(result, regressions)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# telemetry.py
+"""Validation and write-behind buffering for bin sensor readings
+
+Besides JSON, gateways and sensor nodes can upload readings in a compact
+little-endian binary frame (Content-Type: application/octet-stream):
+
+    header  5 bytes   magic b'EG', version u8 (1), reading count u16
+    reading 13 bytes  bin_id u32, sequence u16, fill level u16 in tenths
+                      of a percent, battery u8 (percent, 255 = not
+                      reported), timestamp u32 epoch seconds (0 = now)
+
+so a single reading is 18 bytes against ~40 for the JSON equivalent.
+"""
+import struct
+import threading
+from datetime import datetime, timedelta, timezone
+
+# Largest batch a gateway may upload in one request
+MAX_BATCH_SIZE = 5000
+
+# Readings stamped further than this into the future are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+FRAME_MAGIC = b'EG'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<2sBH')
+FRAME_READING = struct.Struct('<IHHBI')
+BATTERY_NOT_REPORTED = 255
+
+
+class ReadingError(ValueError):
+    """Raised when a single reading fails validation"""
+
+
+def parse_timestamp(value, now=None, max_skew=MAX_CLOCK_SKEW):
+    """Convert an epoch number or ISO 8601 string to a naive UTC datetime"""
+    now = now or datetime.utcnow()
+    if value is None:
+        return now
+
+    if isinstance(value, bool):
+        raise ReadingError('ts must be an epoch number or ISO 8601 string')
+
+    if isinstance(value, (int, float)):
+        # Firmware without an RTC sends milliseconds
+        seconds = value / 1000.0 if value > 1e11 else float(value)
+        try:
+            ts = datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+        except (OverflowError, OSError, ValueError):
+            raise ReadingError('ts is out of range')
+    elif isinstance(value, str):
+        try:
+            ts = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise ReadingError('ts must be an epoch number or ISO 8601 string')
+        if ts.tzinfo is not None:
+            ts = (ts - ts.utcoffset()).replace(tzinfo=None)
+    else:
+        raise ReadingError('ts must be an epoch number or ISO 8601 string')
+
+    if max_skew is not None and ts > now + max_skew:
+        raise ReadingError('ts is in the future')
+    return ts
+
+
+def parse_reading(raw, now=None):
+    """Validate one reading and return a (bin_id, fill_level, ts) tuple"""
+    if not isinstance(raw, dict):
+        raise ReadingError('reading must be an object')
+
+    bin_id = raw.get('bin_id')
+    if isinstance(bin_id, bool) or not isinstance(bin_id, (int, str)):
+        raise ReadingError('bin_id field required')
+    try:
+        bin_id = int(bin_id)
+    except ValueError:
+        raise ReadingError('bin_id must be an integer')
+
+    fill_level = raw.get('fill_level')
+    if fill_level is None:
+        raise ReadingError('fill_level field required')
+    if isinstance(fill_level, bool):
+        raise ReadingError('fill_level must be a number')
+    try:
+        fill_level = float(fill_level)
+    except (ValueError, TypeError):
+        raise ReadingError('fill_level must be a number')
+
+    return bin_id, check_fill_level(fill_level), parse_timestamp(raw.get('ts'), now)
+
+
+def check_fill_level(fill_level):
+    if not (0 <= fill_level <= 100):
+        raise ReadingError('fill_level must be between 0 and 100')
+    return fill_level
+
+
+def decode_frame(body, now=None, max_readings=MAX_BATCH_SIZE):
+    """Decode a binary readings frame
+
+    Returns (readings, errors, batteries): (index, (bin_id, fill_level, ts),
+    sequence) for readings that passed the same checks as parse_reading,
+    {'index', 'bin_id', 'error'} dicts for those that did not, and the
+    reported battery levels. Raises ReadingError if the frame itself is
+    malformed.
+    """
+    view = memoryview(body)
+    if len(view) < FRAME_HEADER.size:
+        raise ReadingError('frame too short')
+    magic, version, count = FRAME_HEADER.unpack_from(view)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ReadingError('unsupported frame')
+    if count > max_readings:
+        raise ReadingError(f'Batch too large, maximum is {max_readings} readings')
+    if len(view) != FRAME_HEADER.size + count * FRAME_READING.size:
+        raise ReadingError(f'frame length does not match {count} readings')
+
+    now = now or datetime.utcnow()
+    readings = []
+    errors = []
+    batteries = []
+    records = FRAME_READING.iter_unpack(view[FRAME_HEADER.size:])
+    for index, (bin_id, sequence, tenths, battery, epoch) in enumerate(records):
+        try:
+            if battery > 100 and battery != BATTERY_NOT_REPORTED:
+                raise ReadingError('battery must be between 0 and 100')
+            fill_level = check_fill_level(tenths / 10.0)
+            readings.append((index, (bin_id, fill_level, parse_timestamp(epoch or None, now)), sequence))
+            if battery != BATTERY_NOT_REPORTED:
+                batteries.append(battery)
+        except ReadingError as e:
+            errors.append({'index': index, 'bin_id': bin_id, 'error': str(e)})
+    return readings, errors, batteries
+
+
+def encode_frame(readings):
+    """Build a frame from (bin_id, sequence, fill_level, battery, ts) tuples
+
+    battery may be None and ts an epoch number or None. Used by gateways
+    written in Python and by the benchmark.
+    """
+    parts = [FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(readings))]
+    for bin_id, sequence, fill_level, battery, ts in readings:
+        parts.append(FRAME_READING.pack(
+            bin_id, sequence & 0xFFFF, round(fill_level * 10),
+            BATTERY_NOT_REPORTED if battery is None else battery, int(ts or 0)
+        ))
+    return b''.join(parts)
+
+
+class SequenceTracker:
+    """Last sequence number seen per device, to drop readings resent after a lost response
+
+    Only an exact repeat of the last sequence is dropped, so a device that
+    restarts its counter is never locked out. State is per process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = {}
+
+    def is_repeat(self, device_id, sequence):
+        with self._lock:
+            if self._last.get(device_id) == sequence:
+                return True
+            self._last[device_id] = sequence
+            return False
+
+
+class ReadingBuffer:
+    """Thread-safe write-behind buffer that keeps only the newest reading per bin
+
+    Every accepted reading is also kept in arrival order so the history
+    store can record it, while the bins table only sees the newest one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._history = []
+        self.coalesced = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, bin_id, fill_level, ts):
+        """Queue a reading, returning False if a newer one is already buffered"""
+        with self._lock:
+            self._history.append((bin_id, ts, fill_level))
+            current = self._pending.get(bin_id)
+            if current is not None:
+                self.coalesced += 1
+                if current[1] > ts:
+                    return False
+            self._pending[bin_id] = (fill_level, ts)
+            return True
+
+    def drain(self):
+        """Take the buffer as ({bin_id: (fill_level, ts)}, [(bin_id, ts, fill_level)])"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            history, self._history = self._history, []
+            return pending, history
+
+    def requeue(self, readings, history=()):
+        """Put back readings from a failed flush without overwriting newer ones"""
+        with self._lock:
+            self._history[:0] = history
+            for bin_id, (fill_level, ts) in readings.items():
+                current = self._pending.get(bin_id)
+                if current is None or current[1] < ts:
+                    self._pending[bin_id] = (fill_level, ts)
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules are imported as top-level modules, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read when app is imported: tests drive the app themselves, with no simulated fleet
+os.environ['SIM_ENABLED'] = 'false'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+STORAGE_DIRS = {
+    'METRICS_DIR': 'metrics',
+    'QR_CACHE_DIR': 'qr_cache',
+    'QR_JOBS_DIR': 'qr_jobs',
+    'SNAPSHOT_CACHE_DIR': 'cache',
+    'ARCHIVE_DIR': 'archive',
+}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """An app on a fresh SQLite file, migrated and seeded, with its stores under tmp_path"""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'app.db'}")
+    for key, name in STORAGE_DIRS.items():
+        monkeypatch.setenv(key, str(tmp_path / name))
+    from app import create_app
+    from models import db
+
+    application = create_app({'TESTING': True})
+    yield application
+    with application.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
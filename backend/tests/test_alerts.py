@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+
+def test_nearby_reports_merge_into_one_alert(client):
+    first = client.post('/api/alert', json={'location': '28.70000,77.10000', 'confidence': 0.4}).get_json()
+    # About 20 m away
+    repeat = client.post('/api/alert', json={'location': '28.70018,77.10000', 'confidence': 0.8}).get_json()
+    assert not first['merged'] and repeat['merged']
+    assert repeat['alert_id'] == first['alert_id'] and repeat['occurrence_count'] == 2
+    # About 200 m away
+    other = client.post('/api/alert', json={'location': '28.70180,77.10000'}).get_json()
+    assert not other['merged'] and other['alert_id'] != first['alert_id']
+
+    alerts = {row['id']: row for row in client.get('/api/alerts?status=open').get_json()['alerts']}
+    assert alerts[first['alert_id']]['confidence'] == 0.8
+
+
+def test_reports_outside_the_window_or_after_resolution_start_new_alerts(app):
+    import app as app_module
+    from models import db
+
+    now = datetime.utcnow()
+    with app.app_context():
+        first, _ = app_module.record_litter_alert('28.7,77.1', now=now - app_module.ALERT_MERGE_WINDOW - timedelta(minutes=1))
+        late, merged = app_module.record_litter_alert('28.7,77.1', now=now)
+        assert not merged and late.id != first.id
+        late.resolved_at = now
+        again, merged = app_module.record_litter_alert('28.7,77.1', now=now + timedelta(minutes=1))
+        assert not merged and again.id != late.id
+        db.session.rollback()
+
+
+def test_complaint_and_its_alert_commit_together(client, monkeypatch):
+    import app as app_module
+
+    response = client.post('/api/complaint/quick', json={'bin_id': 1, 'complaint_type': 'overflow'}).get_json()
+    assert response['status'] == 'success' and response['alert_id']
+    repeat = client.post('/api/complaint/quick', json={'bin_id': 1, 'complaint_type': 'smell'}).get_json()
+    assert repeat['alert_merged'] and repeat['alert_id'] == response['alert_id']
+
+    def failing_alert(*args, **kwargs):
+        raise RuntimeError('alert write failed')
+
+    monkeypatch.setattr(app_module, 'record_litter_alert', failing_alert)
+    assert client.post('/api/complaint/quick', json={'bin_id': 1}).status_code == 500
+    assert client.get('/api/complaints').get_json()['count'] == 2
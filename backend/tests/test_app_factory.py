@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import STORAGE_DIRS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = '''
+import json, sys, threading
+import app
+print(json.dumps({'threads': threading.active_count(), 'numpy': 'numpy' in sys.modules}))
+'''
+
+
+def test_import_has_no_side_effects(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'app.db'}")
+    env.update({key: str(tmp_path / name) for key, name in STORAGE_DIRS.items()})
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True, timeout=60).stdout
+    state = json.loads(output.strip().splitlines()[-1])
+    assert state == {'threads': 1, 'numpy': False}
+    assert os.listdir(tmp_path) == []
+
+
+def test_create_app_opens_stores(app, tmp_path):
+    for key, name in STORAGE_DIRS.items():
+        # Job directories appear with the first job
+        assert (tmp_path / name).is_dir() or key == 'QR_JOBS_DIR'
+    assert (tmp_path / 'app.db').exists()
+    response = app.test_client().get('/api/dashboard')
+    assert response.status_code == 200
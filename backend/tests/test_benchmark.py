@@ -0,0 +1,29 @@
+from benchmark import Recorder, compare
+
+
+def route_stats(**overrides):
+    stats = {'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 40.0, 'throughput_rps': 100.0, 'error_rate': 0.0}
+    return {**stats, **overrides}
+
+
+def test_recorder_reports_percentiles_and_errors():
+    recorder = Recorder()
+    for latency in range(1, 101):
+        recorder.record('GET /api/dashboard', float(latency), ok=latency % 10 != 0)
+    stats = recorder.summary(elapsed=10)['GET /api/dashboard']
+    assert (stats['requests'], stats['errors'], stats['error_rate'], stats['throughput_rps']) == (100, 10, 0.1, 10.0)
+    assert stats['p50_ms'] == 50.5 and stats['p99_ms'] == 99.01 and stats['max_ms'] == 100
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {'routes': {'dashboard': route_stats(), 'gone': route_stats()}}
+    # Within tolerance, or slower by less than the noise floor
+    steady = {'routes': {'dashboard': route_stats(p50_ms=13.0, p99_ms=46.0, throughput_rps=85.0), 'new': route_stats()}}
+    assert compare(steady, baseline, 0.2) == []
+
+    worse = {'routes': {'dashboard': route_stats(p95_ms=30.0, throughput_rps=70.0, error_rate=0.05)}}
+    assert compare(worse, baseline, 0.2) == [
+        'dashboard: p95_ms 20.0 -> 30.0',
+        'dashboard: throughput_rps 100.0 -> 70.0',
+        'dashboard: error_rate 0.0 -> 0.05',
+    ]
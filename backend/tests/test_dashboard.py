@@ -0,0 +1,34 @@
+def test_unchanged_dashboard_answers_304(client):
+    first = client.get('/api/dashboard')
+    assert first.status_code == 200 and first.headers['ETag']
+    repeat = client.get('/api/dashboard', headers={'If-None-Match': first.headers['ETag']})
+    assert repeat.status_code == 304 and repeat.data == b''
+
+    client.post('/api/bin/1', json={'fill_level': 55})
+    changed = client.get('/api/dashboard', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.get_json()['version'] > first.get_json()['version']
+
+
+def test_since_returns_only_changes_and_deletions(client):
+    version = client.get('/api/dashboard').get_json()['version']
+    client.post('/api/bin/2', json={'fill_level': 70})
+    alert_id = client.post('/api/alert', json={'location': '28.70,77.10'}).get_json()['alert_id']
+
+    delta = client.get(f'/api/dashboard?since={version}').get_json()
+    assert delta['delta'] is True
+    assert [row['id'] for row in delta['bins']] == [2]
+    assert [row['id'] for row in delta['alerts']] == [alert_id]
+
+    version = delta['version']
+    client.delete(f'/api/alert/{alert_id}')
+    delta = client.get(f'/api/dashboard?since={version}').get_json()
+    assert delta['bins'] == [] and delta['alerts'] == []
+    assert delta['deleted_alerts'] == [alert_id]
+
+
+def test_since_and_full_responses_have_distinct_etags(client):
+    full = client.get('/api/dashboard')
+    delta = client.get('/api/dashboard?since=1')
+    assert full.headers['ETag'] != delta.headers['ETag']
+    assert client.get('/api/dashboard?since=1', headers={'If-None-Match': full.headers['ETag']}).status_code == 200
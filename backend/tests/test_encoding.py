@@ -0,0 +1,41 @@
+from datetime import datetime
+
+import pytest
+
+import encoding
+
+ROWS = [{'id': 1, 'last_updated': '2024-05-01T12:00:00'}, {'id': 2, 'last_updated': None}]
+
+
+def test_columns_carry_each_field_once():
+    assert encoding.shape(ROWS, encoding.COLUMNS) == {'id': [1, 2], 'last_updated': ['2024-05-01T12:00:00', None]}
+    assert encoding.shape(ROWS, encoding.MSGPACK, epoch=True)['last_updated'] == [1714564800000, None]
+    assert encoding.shape(ROWS, encoding.ROWS, epoch=True)[0] == {'id': 1, 'last_updated': 1714564800000}
+    assert encoding.epoch_ms(datetime(1970, 1, 1, 0, 0, 1)) == 1000
+
+
+def test_dashboard_in_each_representation(client):
+    msgpack = pytest.importorskip('msgpack')
+    rows = client.get('/api/dashboard')
+    columns = client.get('/api/dashboard?timestamps=epoch', headers={'Accept': encoding.COLUMNS})
+    packed = client.get('/api/dashboard', headers={'Accept': 'application/x-msgpack'})
+    assert (columns.mimetype, packed.mimetype) == (encoding.COLUMNS, encoding.MSGPACK)
+    assert len({rows.get_etag()[0], columns.get_etag()[0], packed.get_etag()[0]}) == 3
+    assert 'Accept' in packed.vary
+
+    bins = rows.get_json()['bins']
+    assert columns.get_json()['bins']['id'] == [row['id'] for row in bins]
+    assert all(isinstance(ts, int) for ts in columns.get_json()['bins']['last_updated'])
+    assert msgpack.unpackb(packed.data)['bins']['location'] == [row['location'] for row in bins]
+
+
+def test_an_older_snapshot_does_not_evict_newer_layouts(monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, 'shaped_snapshot_lists', {})
+    newer = app_module.shaped_snapshot_list({'version': 5, 'bins': ROWS}, 'bins', encoding.COLUMNS, False)
+    assert app_module.shaped_snapshot_list({'version': 5, 'bins': []}, 'bins', encoding.COLUMNS, False) is newer
+    app_module.shaped_snapshot_list({'version': 4, 'bins': ROWS}, 'bins', encoding.COLUMNS, False)
+    assert list(app_module.shaped_snapshot_lists) == [(5, 'bins', True, False)]
+    app_module.shaped_snapshot_list({'version': 6, 'bins': ROWS}, 'bins', encoding.COLUMNS, True)
+    assert list(app_module.shaped_snapshot_lists) == [(6, 'bins', True, True)]
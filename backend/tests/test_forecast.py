@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from forecast import MAX_RATE, MIN_INTERVAL, refit, update_rate
+
+START = datetime(2026, 1, 1, 8, 0)
+
+
+def feed(readings, rate=None):
+    """Run (seconds, level) readings through update_rate from no history"""
+    anchor_level = anchor_ts = None
+    for seconds, level in readings:
+        rate, anchor_level, anchor_ts = update_rate(rate, anchor_level, anchor_ts, level, START + timedelta(seconds=seconds))
+    return rate, anchor_level, anchor_ts
+
+
+def test_sub_second_readings_do_not_seed_a_rate():
+    rate, anchor_level, anchor_ts = feed([(0, 40.0), (0.2, 40.5), (0.4, 41.0)])
+    assert rate is None
+    assert (anchor_level, anchor_ts) == (40.0, START)
+
+
+def test_sub_second_readings_accumulate_until_the_interval():
+    # A reading every half second for ten minutes, filling 2% per hour
+    readings = [(i / 2, 40.0 + 2.0 * i / 7200) for i in range(1200)]
+    rate, _, anchor_ts = feed(readings)
+    assert abs(rate - 2.0) < 1e-6
+    assert anchor_ts >= START + MIN_INTERVAL
+
+
+def test_short_gap_keeps_an_existing_rate():
+    rate, anchor_level, anchor_ts = update_rate(3.0, 50.0, START, 51.0, START + timedelta(milliseconds=300))
+    assert (rate, anchor_level, anchor_ts) == (3.0, 50.0, START)
+
+
+def test_rate_is_clamped():
+    rate, _, _ = update_rate(None, 0.0, START, 99.0, START + MIN_INTERVAL)
+    assert rate == MAX_RATE
+
+
+def test_emptied_bin_moves_the_anchor_and_keeps_the_rate():
+    rate, anchor_level, anchor_ts = update_rate(2.0, 90.0, START, 5.0, START + timedelta(seconds=1))
+    assert (rate, anchor_level, anchor_ts) == (2.0, 5.0, START + timedelta(seconds=1))
+
+
+def test_refit_clips_fits_over_seconds():
+    _, rates = refit(np.array([1, 1]), np.array([-1 / 3600, 0.0]), np.array([10.0, 60.0]))
+    assert rates[0] == MAX_RATE
+
+
+def test_refit_only_versions_bins_whose_forecast_moved(app):
+    import app as app_module
+    from models import BinReadingRollup, SmartBin, db
+
+    now = datetime.utcnow().replace(microsecond=0)
+    with app.app_context():
+        bin = db.session.get(SmartBin, 1)
+        bin.fill_level, bin.last_updated = 50.0, now
+        for hours_ago, level in ((3, 44.0), (2, 46.0), (1, 48.0)):
+            ts = now - timedelta(hours=hours_ago)
+            db.session.add(BinReadingRollup(bin_id=1, resolution='1h', bucket=ts, count=1, total=level,
+                                            min_level=level, max_level=level, last_level=level, last_ts=ts))
+        db.session.commit()
+
+        assert app_module.refit_forecasts()['bins_changed'] >= 1
+        db.session.expire_all()
+        bin = db.session.get(SmartBin, 1)
+        assert abs(bin.fill_rate - 2.0) < 1e-6
+        version = bin.version
+
+        assert app_module.refit_forecasts()['bins_changed'] == 0
+        db.session.expire_all()
+        assert db.session.get(SmartBin, 1).version == version
+
+
+def test_forecast_window_must_be_a_positive_number(client):
+    for within in ('soon', '0', '-1', 'nan', 'inf'):
+        assert client.get(f'/api/bins/forecast?within={within}').status_code == 400
+    body = client.get('/api/bins/forecast').get_json()
+    assert body['status'] == 'success' and body['within_hours'] == 24
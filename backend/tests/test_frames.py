@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from telemetry import FRAME_HEADER, FRAME_READING, ReadingError, decode_frame, encode_frame
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+EPOCH = 1714564800
+OCTETS = {'Content-Type': 'application/octet-stream'}
+
+
+def test_frame_round_trips_and_rejects_bad_readings():
+    frame = encode_frame([(7, 1, 42.5, 80, EPOCH), (8, 2, 10, None, None), (9, 3, 150, None, EPOCH), (10, 4, 5, 101, EPOCH)])
+    readings, errors, batteries = decode_frame(frame, NOW)
+    assert readings == [(0, (7, 42.5, NOW), 1), (1, (8, 10.0, NOW), 2)]
+    assert [(error['index'], error['bin_id']) for error in errors] == [(2, 9), (3, 10)]
+    assert batteries == [80]
+
+
+def test_malformed_frames_are_rejected():
+    frame = encode_frame([(7, 1, 42.5, None, EPOCH)])
+    for body, message in ((b'EG', 'too short'), (b'XX' + frame[2:], 'unsupported'),
+                          (frame[:-1], 'length'), (FRAME_HEADER.pack(b'EG', 1, 3), 'length')):
+        with pytest.raises(ReadingError, match=message):
+            decode_frame(body, NOW)
+    with pytest.raises(ReadingError, match='too large'):
+        decode_frame(frame, NOW, max_readings=0)
+
+
+def test_binary_ingest_drops_resent_readings(app, client):
+    from app import flush_bin_readings
+
+    ts = (datetime.utcnow() + timedelta(seconds=30) - datetime(1970, 1, 1)).total_seconds()
+    frame = encode_frame([(2, 9001, 55, 90, ts), (999999, 1, 10, None, ts)])
+    body = client.post('/api/bins/readings', data=frame, headers=OCTETS).get_json()
+    assert (body['accepted'], body['rejected'], body['duplicates']) == (1, 1, 0)
+    assert body['errors'] == [{'index': 1, 'bin_id': 999999, 'error': 'Bin not found'}]
+
+    body = client.post('/api/bins/readings', data=frame, headers=OCTETS).get_json()
+    assert (body['accepted'], body['rejected'], body['duplicates']) == (0, 0, 2)
+    with app.app_context():
+        flush_bin_readings()
+
+
+def test_binary_ingest_rejects_bad_frames(client):
+    assert client.post('/api/bins/readings', data=b'EG\x02\x00\x00', headers=OCTETS).status_code == 400
+    oversized = FRAME_HEADER.pack(b'EG', 1, 0) + bytes(FRAME_READING.size * 5001)
+    assert client.post('/api/bins/readings', data=oversized, headers=OCTETS).status_code == 413
@@ -0,0 +1,48 @@
+from geo import cover_bbox, distance_m, encode, parse_location, prefix_range, radius_bbox
+
+
+def test_encode_matches_reference_geohash():
+    assert encode(42.605, -5.603, 5) == 'ezs42'
+    assert encode(57.64911, 10.40744, 7) == 'u4pruyd'
+
+
+def test_cover_bbox_contains_every_point_inside():
+    box = (28.735, 77.115, 28.745, 77.128)
+    cells = cover_bbox(*box)
+    for lat, lng in ((28.735, 77.115), (28.74, 77.12), (28.745, 77.128)):
+        assert any(encode(lat, lng).startswith(cell) for cell in cells)
+    assert cover_bbox(-80, -170, 80, 170, max_cells=4) is None
+
+
+def test_prefix_range_is_half_open():
+    assert prefix_range('ttn') == ('ttn', 'ttp')
+    assert prefix_range('tz') == ('tz', 'u')
+    assert prefix_range('zz') == ('zz', None)
+
+
+def test_radius_bbox_and_distance_agree():
+    min_lat, min_lng, max_lat, max_lng = radius_bbox(28.74, 77.12, 1000)
+    assert abs(distance_m(28.74, 77.12, max_lat, 77.12) - 1000) < 1
+    assert abs(distance_m(28.74, 77.12, 28.74, max_lng) - 1000) < 1
+    assert parse_location('28.74, 77.12') == (28.74, 77.12)
+    assert parse_location('91,0') is None and parse_location(None) is None
+
+
+def test_near_query_trims_to_the_circle_and_sorts_by_distance(client):
+    far = client.get('/api/bins?near=28.7402,77.1234&radius=50000').get_json()
+    near = client.get('/api/bins?near=28.7402,77.1234&radius=150').get_json()
+    assert near['bins'][0]['id'] == 1 and near['bins'][0]['distance_m'] == 0
+    assert all(item['distance_m'] <= 150 for item in near['bins'])
+    distances = [item['distance_m'] for item in far['bins']]
+    assert distances == sorted(distances) and len(far['bins']) > len(near['bins'])
+
+
+def test_bbox_query_matches_a_scan(client):
+    everything = client.get('/api/bins').get_json()['bins']
+    box = (28.738, 77.118, 28.745, 77.13)
+    inside = {row['id'] for row in everything
+              if box[0] <= row['latitude'] <= box[2] and box[1] <= row['longitude'] <= box[3]}
+    response = client.get('/api/bins?bbox=' + ','.join(map(str, box))).get_json()
+    assert inside and {row['id'] for row in response['bins']} == inside
+    assert client.get('/api/bins?bbox=1,2,3').status_code == 400
+    assert client.get('/api/bins?near=x&radius=10').status_code == 400
@@ -0,0 +1,46 @@
+import threading
+
+from health import Heartbeats
+
+
+def test_stale_and_dead_threads_are_unhealthy():
+    heartbeats = Heartbeats()
+    finished = threading.Thread(target=lambda: None)
+    finished.start()
+    finished.join()
+    heartbeats.register('fresh', None, max_age=60)
+    heartbeats.register('stale', None, max_age=-1)
+    heartbeats.register('dead', finished, max_age=60)
+    heartbeats.beat('fresh')
+
+    healthy, report = heartbeats.status()
+    assert not healthy
+    assert {name: item['healthy'] for name, item in report.items()} == {'fresh': True, 'stale': False, 'dead': False}
+    assert report['fresh']['beats'] == 1 and report['dead']['alive'] is False
+
+
+def test_liveness_answers_without_the_database(app, client):
+    from sqlalchemy import event
+    from models import db
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    response = client.get('/api/health/live')
+    assert response.status_code == 200 and response.get_json()['status'] == 'alive'
+    assert statements == []
+
+
+def test_readiness_reflects_background_threads(client, monkeypatch):
+    import app
+
+    heartbeats = Heartbeats()
+    monkeypatch.setattr(app, 'heartbeats', heartbeats)
+    ready = client.get('/api/health/ready')
+    assert ready.status_code == 200 and ready.get_json()['database']['status'] == 'connected'
+
+    heartbeats.register('reading_flusher', None, max_age=-1)
+    not_ready = client.get('/api/health/ready')
+    assert not_ready.status_code == 503
+    assert not_ready.get_json()['threads']['reading_flusher']['healthy'] is False
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from history import EPOCH, MAX_POINTS, bucket_start, choose_resolution, rollup_rows
+
+T0 = datetime(2024, 5, 1, 12, 0, 10)
+
+
+def test_rollups_aggregate_each_resolution():
+    rows = rollup_rows([(1, T0, 10.0), (1, T0 + timedelta(seconds=30), 30.0), (1, T0 + timedelta(minutes=1), 50.0)])
+    by_key = {(row['resolution'], row['bucket']): row for row in rows}
+    minute = by_key[('1m', datetime(2024, 5, 1, 12, 0))]
+    assert (minute['count'], minute['total'], minute['min_level'], minute['max_level'], minute['last_level']) == \
+        (2, 40.0, 10.0, 30.0, 30.0)
+    hour = by_key[('1h', datetime(2024, 5, 1, 12))]
+    assert (hour['count'], hour['last_level'], hour['last_ts']) == (3, 50.0, T0 + timedelta(minutes=1))
+    assert by_key[('1d', datetime(2024, 5, 1))]['count'] == 3
+
+
+def test_bucket_start_aligns_to_epoch():
+    assert bucket_start(T0, '1h') == datetime(2024, 5, 1, 12)
+    assert bucket_start(EPOCH + timedelta(days=1, seconds=5), '1d') == EPOCH + timedelta(days=1)
+
+
+def test_resolution_fits_max_points_and_retention():
+    assert choose_resolution(T0, T0 + timedelta(minutes=30)) == 'raw'
+    assert choose_resolution(T0, T0 + timedelta(hours=12)) == '1m'
+    assert choose_resolution(T0, T0 + timedelta(minutes=MAX_POINTS + 1)) == '1h'
+    # Raw readings and minute rollups already pruned past the start
+    kept_since = {'raw': T0 + timedelta(days=1), '1m': T0 + timedelta(days=1)}
+    assert choose_resolution(T0, T0 + timedelta(minutes=30), kept_since=kept_since) == '1h'
+
+
+def test_history_endpoint_reads_raw_and_rollups(app, client):
+    from app import write_bin_readings
+    from models import db
+
+    start = datetime.utcnow().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    readings = [(1, start + timedelta(seconds=offset), level) for offset, level in ((0, 10.0), (20, 20.0), (70, 40.0))]
+    with app.app_context():
+        for bin_id, ts, level in readings:
+            write_bin_readings({bin_id: (level, ts)}, [(bin_id, ts, level)])
+            db.session.commit()
+
+    query = {'from': start.isoformat(), 'to': (start + timedelta(minutes=5)).isoformat()}
+    raw = client.get('/api/bin/1/history', query_string={**query, 'resolution': 'raw'}).get_json()
+    assert raw['resolution'] == 'raw'
+    assert [point['fill_level'] for point in raw['points']] == [10.0, 20.0, 40.0]
+
+    minutes = client.get('/api/bin/1/history', query_string={**query, 'resolution': '1m'}).get_json()
+    assert [(point['fill_level'], point['count']) for point in minutes['points']] == [(15.0, 2), (40.0, 1)]
+
+
+def test_history_endpoint_validates_range(client):
+    assert client.get('/api/bin/1/history?from=2024-05-02&to=2024-05-01').status_code == 400
+    assert client.get('/api/bin/1/history?resolution=5m').status_code == 400
+    assert client.get('/api/bin/9999/history').status_code == 404
@@ -0,0 +1,41 @@
+import json
+import logging
+import queue
+
+from log_pipeline import DroppingQueueHandler, JsonFormatter, RequestContextFilter, parse_pairs
+
+
+def make_record(level=logging.INFO, msg='hello %s', args=('world',), **extra):
+    record = logging.LogRecord('app', level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_parse_pairs_skips_malformed_entries():
+    assert parse_pairs('/api/bin/<int:bin_id>=0.01, app=x,=1,broken', float) == {'/api/bin/<int:bin_id>': 0.01}
+    assert parse_pairs('sqlalchemy.engine=WARNING') == {'sqlalchemy.engine': 'WARNING'}
+    assert parse_pairs(None) == {}
+
+
+def test_json_lines_carry_extra_fields():
+    entry = json.loads(JsonFormatter().format(make_record(route='/api/dashboard', bins=3)))
+    assert (entry['level'], entry['logger'], entry['msg']) == ('INFO', 'app', 'hello world')
+    assert (entry['route'], entry['bins']) == ('/api/dashboard', 3)
+
+
+def test_unsampled_requests_keep_only_warnings():
+    unsampled = RequestContextFilter(lambda: {'route': '/api/bin/<int:bin_id>', 'sampled': False})
+    assert not unsampled.filter(make_record(logging.INFO))
+    warning = make_record(logging.WARNING)
+    assert unsampled.filter(warning) and warning.route == '/api/bin/<int:bin_id>'
+    assert not hasattr(warning, 'sampled')
+    assert RequestContextFilter(lambda: None).filter(make_record(logging.DEBUG))
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(2))
+    for _ in range(5):
+        handler.handle(make_record())
+    assert handler.queue.qsize() == 2 and handler.dropped == 3
+    assert handler.queue.get_nowait().msg == 'hello world'
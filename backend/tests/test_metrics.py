@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+from metrics import MetricsRegistry
+
+
+def registry(directory):
+    metrics = MetricsRegistry(str(directory), flush_interval=0)
+    metrics.define('jobs_total', 'counter', 'Jobs run')
+    metrics.define('job_seconds', 'histogram', 'Job duration', buckets=(0.1, 1.0))
+    return metrics
+
+
+def test_histogram_buckets_are_cumulative(tmp_path):
+    metrics = registry(tmp_path)
+    for seconds in (0.05, 0.5, 0.7, 3.0):
+        metrics.observe('job_seconds', seconds, kind='sheet')
+    metrics.inc('jobs_total', kind='sheet')
+    text = metrics.render()
+    assert 'job_seconds_bucket{kind="sheet",le="0.1"} 1' in text
+    assert 'job_seconds_bucket{kind="sheet",le="1"} 3' in text
+    assert 'job_seconds_bucket{kind="sheet",le="+Inf"} 4' in text
+    assert 'job_seconds_count{kind="sheet"} 4' in text
+    assert 'jobs_total{kind="sheet"} 1' in text
+
+
+def test_exited_processes_are_folded_into_retired_totals(tmp_path):
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    with open(tmp_path / f'metrics-{exited.pid}.json', 'w') as f:
+        json.dump({'pid': exited.pid, 'values': {'counter': {'jobs_total': {'[]': 5}}, 'gauge': {}, 'histogram': {}}}, f)
+
+    metrics = registry(tmp_path)
+    metrics.inc('jobs_total')
+    assert 'jobs_total 6' in metrics.render()
+    assert not os.path.exists(tmp_path / f'metrics-{exited.pid}.json')
+    metrics.inc('jobs_total')
+    assert 'jobs_total 7' in metrics.render()
+
+
+def sample(text, series):
+    for line in text.splitlines():
+        if line.startswith(series + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_requests_are_counted_per_route(client):
+    # The registry is per process, so earlier tests' requests are in it too
+    requests = 'http_requests_total{method="GET",route="/api/bin/<int:bin_id>",status="200"}'
+    statements = 'db_statements_per_request_count{route="/api/bin/<int:bin_id>"}'
+    before = client.get('/metrics').data.decode()
+    client.get('/api/bin/1')
+    client.get('/api/bin/2')
+    after = client.get('/metrics').data.decode()
+    assert sample(after, requests) - sample(before, requests) == 2
+    assert sample(after, statements) - sample(before, statements) == 2
@@ -0,0 +1,48 @@
+from sqlalchemy import create_engine, inspect, text
+
+from migrations import MIGRATIONS, check_query_plans, current_version, migrate
+from models import db
+
+# The two tables clean_reset.py created before migrations existed
+BASELINE_SCHEMA = (
+    'CREATE TABLE smart_bin (id INTEGER PRIMARY KEY, location VARCHAR(100) NOT NULL, '
+    'fill_level FLOAT, last_updated DATETIME)',
+    'CREATE TABLE litter_alert (id INTEGER PRIMARY KEY, location VARCHAR(100) NOT NULL, '
+    'confidence FLOAT, image_url VARCHAR(200), timestamp DATETIME)',
+)
+
+
+def test_baseline_database_is_upgraded_in_order(tmp_path):
+    import app as app_module
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO smart_bin VALUES (1, '28.7402,77.1234', 85, '2024-01-01 00:00:00')"))
+        conn.execute(text("INSERT INTO litter_alert VALUES (1, '28.7402,77.1234', 0.9, NULL, '2024-01-01 00:00:00')"))
+
+    assert current_version(engine) == 0
+    assert migrate(engine, db.metadata) == [version for version, _, _ in MIGRATIONS]
+    assert current_version(engine) == MIGRATIONS[-1][0]
+    assert migrate(engine, db.metadata) == []
+
+    with engine.connect() as conn:
+        bin_row = conn.execute(text('SELECT latitude, geo_cell, fill_state, rate_anchor_level FROM smart_bin')).one()
+        alert_row = conn.execute(text('SELECT bin_id, occurrence_count, last_seen FROM litter_alert')).one()
+    assert bin_row.latitude == 28.7402 and bin_row.geo_cell and bin_row.fill_state == 'full'
+    assert bin_row.rate_anchor_level == 85
+    assert alert_row.bin_id == 1 and alert_row.last_seen is not None
+    assert set(db.metadata.tables) <= set(inspect(engine).get_table_names())
+
+    # The upgraded schema has every index the hot queries rely on
+    assert [name for name, _, uses_index, _ in check_query_plans(engine, app_module.hot_queries()) if not uses_index] == []
+    engine.dispose()
+
+
+def test_new_database_is_created_at_the_latest_version(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    assert migrate(engine, db.metadata) == [version for version, _, _ in MIGRATIONS]
+    assert migrate(engine, db.metadata) == []
+    assert current_version(engine) == MIGRATIONS[-1][0]
+    engine.dispose()
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from pagination import CursorError, decode_cursor, encode_cursor, page_size
+
+T0 = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def test_cursor_round_trip_and_errors():
+    assert decode_cursor(encode_cursor(T0, 42)) == (T0, 42)
+    with pytest.raises(CursorError):
+        decode_cursor('not-a-cursor')
+    assert page_size(None) == 50
+    for value in ('0', '501', 'ten'):
+        with pytest.raises(CursorError):
+            page_size(value)
+
+
+def add_complaints(app, count):
+    from models import QRComplaint, db
+
+    with app.app_context():
+        for index in range(count):
+            # Pairs share a timestamp, so the id has to break ties
+            db.session.add(QRComplaint(bin_id=1 + index % 2, complaint_type='overflow',
+                                       timestamp=T0 - timedelta(minutes=index // 2)))
+        db.session.commit()
+
+
+def test_pages_cover_every_row_once_newest_first(app, client):
+    add_complaints(app, 7)
+    seen = []
+    url = '/api/complaints?limit=3'
+    while url:
+        page = client.get(url).get_json()
+        seen.extend((row['timestamp'], row['id']) for row in page['complaints'])
+        url = f"/api/complaints?limit=3&cursor={page['next_cursor']}" if page['next_cursor'] else None
+    assert len(seen) == len(set(seen)) == 7
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_filters_apply_before_paging(app, client):
+    add_complaints(app, 6)
+    page = client.get('/api/complaints?bin_id=2&limit=2').get_json()
+    rest = client.get(f"/api/complaints?bin_id=2&limit=2&cursor={page['next_cursor']}").get_json()
+    assert {row['bin_id'] for row in page['complaints'] + rest['complaints']} == {2}
+    assert page['count'] + rest['count'] == 3 and rest['next_cursor'] is None
+
+    window = client.get('/api/complaints', query_string={
+        'from': (T0 - timedelta(minutes=1)).isoformat(), 'to': T0.isoformat()
+    }).get_json()
+    assert window['count'] == 2
+
+
+def test_bad_paging_arguments_answer_400(client):
+    for query in ('cursor=bogus', 'limit=0', 'bin_id=one'):
+        assert client.get(f'/api/complaints?{query}').status_code == 400
+    assert client.get('/api/alerts?status=closed').status_code == 400
+    assert client.get('/api/alerts?min_confidence=high').status_code == 400
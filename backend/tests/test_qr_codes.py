@@ -0,0 +1,31 @@
+from qr_codes import QRImageCache, complaint_url, qr_digest
+
+
+def test_cache_renders_each_payload_once(tmp_path):
+    renders = []
+    cache = QRImageCache(str(tmp_path), on_render=lambda image_format, seconds: renders.append(image_format))
+    digest, path = cache.get('https://example.org/complaint?bin_id=1')
+    assert cache.get('https://example.org/complaint?bin_id=1') == (digest, path)
+    assert renders == ['png']
+    with open(path, 'rb') as f:
+        assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+
+
+def test_digest_follows_the_payload():
+    assert qr_digest(complaint_url(1, 'A', '1,2')) == qr_digest(complaint_url(1, 'A', '1,2'))
+    assert qr_digest(complaint_url(1, 'A', '1,2')) != qr_digest(complaint_url(1, 'B', '1,2'))
+
+
+def test_bin_image_is_served_with_etag_and_304(client):
+    response = client.get('/api/bin/1/qr.png')
+    assert response.status_code == 200 and response.mimetype == 'image/png'
+    etag, _ = response.get_etag()
+    assert response.headers['Cache-Control'] == 'public, max-age=300'
+
+    repeat = client.get('/api/bin/1/qr.png', headers={'If-None-Match': f'"{etag}"'})
+    assert repeat.status_code == 304
+    versioned = client.get(f'/api/bin/1/qr.svg?v={etag}')
+    assert versioned.mimetype == 'image/svg+xml' and 'immutable' in versioned.headers['Cache-Control']
+
+    assert client.get('/api/bin/1/qr.gif').status_code == 404
+    assert client.get('/api/bin/9999/qr.png').status_code == 404
@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from qr_sheets import fail_orphaned_jobs, read_status, run_job, write_status
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def queue_job(client, **body):
+    from app import qr_sheet_queue
+
+    response = client.post('/api/qr-sheets', json=body)
+    assert response.status_code == 202
+    # Nothing runs the queue in tests; take the job back out
+    qr_sheet_queue.get_nowait()
+    return response.get_json()
+
+
+def test_bin_ids_are_validated(client, monkeypatch):
+    import app
+
+    for bin_ids in ('1,2', [], [1, 'two'], [True]):
+        assert client.post('/api/qr-sheets', json={'bin_ids': bin_ids}).status_code == 400
+    monkeypatch.setattr(app, 'QR_SHEET_MAX_BINS', 2)
+    assert client.post('/api/qr-sheets', json={'bin_ids': [1, 2, 3]}).status_code == 413
+    assert client.post('/api/qr-sheets', json={'bin_ids': [9999]}).status_code == 404
+
+
+def test_job_renders_a_pdf(app, client, tmp_path):
+    job = queue_job(client, bin_ids=[1, 2])
+    job_dir = os.path.join(app.config['QR_JOBS_DIR'], job['job_id'])
+    assert read_status(job_dir)['worker'] == os.getpid()
+    assert client.get(f"/api/qr-sheets/{job['job_id']}/download").status_code == 409
+
+    status = run_job(job_dir, processes=1, cache_dir=str(tmp_path / 'qr_cache'))
+    assert (status['state'], status['done'], status['pages']) == ('completed', 2, 1)
+    download = client.get(f"/api/qr-sheets/{job['job_id']}/download")
+    assert download.mimetype == 'application/pdf' and download.data.startswith(b'%PDF')
+
+
+def test_progress_stream_ends_when_the_job_expires(app, client):
+    job = queue_job(client)
+    response = client.get(f"/api/qr-sheets/{job['job_id']}/progress", buffered=False)
+    chunks = response.iter_encoded()
+    first = next(chunks).decode()
+    assert first.startswith('event: progress') and json.loads(first.split('data: ')[1])['state'] == 'queued'
+
+    shutil.rmtree(os.path.join(app.config['QR_JOBS_DIR'], job['job_id']))
+    assert list(chunks) == []
+    response.close()
+
+
+def test_progress_streams_count_against_the_stream_limit(client, monkeypatch):
+    import app
+
+    job = queue_job(client)
+    monkeypatch.setattr(app, 'STREAM_MAX_SUBSCRIBERS', 0)
+    response = client.get(f"/api/qr-sheets/{job['job_id']}/progress")
+    assert response.status_code == 503 and response.headers['Retry-After']
+
+
+def test_jobs_of_exited_owners_are_failed(tmp_path):
+    states = {
+        'orphaned': {'state': 'queued', 'worker': dead_pid()},
+        'crashed': {'state': 'running', 'worker': os.getpid(), 'pid': dead_pid()},
+        'waiting': {'state': 'queued', 'worker': os.getpid()},
+        'done': {'state': 'completed', 'worker': dead_pid()},
+    }
+    for name, status in states.items():
+        os.makedirs(tmp_path / name)
+        write_status(str(tmp_path / name), status)
+
+    assert fail_orphaned_jobs(str(tmp_path)) == 2
+    assert {name: read_status(str(tmp_path / name))['state'] for name in states} == {
+        'orphaned': 'failed', 'crashed': 'failed', 'waiting': 'queued', 'done': 'completed'
+    }
@@ -0,0 +1,33 @@
+import csv
+import io
+import json
+
+
+def test_json_report_keeps_the_original_layout(client):
+    client.post('/api/alert', json={'location': '28.70,77.10', 'confidence': 0.9})
+    report = client.get('/api/generate-report').get_json()
+    dashboard = client.get('/api/dashboard').get_json()
+    assert report['status'] == 'success'
+    assert report['total_bins'] == len(report['bins']) == len(dashboard['bins'])
+    assert report['total_alerts'] == len(report['alerts']) == 1
+    assert report['full_bins'] == sum(1 for row in dashboard['bins'] if row['fill_state'] == 'full')
+    average = sum(row['fill_level'] for row in dashboard['bins']) / len(dashboard['bins'])
+    assert abs(report['average_fill_level'] - average) < 1e-6
+
+
+def test_ndjson_and_csv_stream_one_record_per_row(client):
+    client.post('/api/alert', json={'location': '28.70,77.10'})
+    lines = client.get('/api/generate-report?format=ndjson&include=alerts').data.decode().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record['record'] for record in records] == ['summary', 'alert']
+
+    response = client.get('/api/generate-report?format=csv&include=bins')
+    assert response.headers['Content-Disposition'].startswith('attachment;')
+    rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+    assert rows and {row['record'] for row in rows} == {'bin'}
+
+
+def test_report_rejects_unknown_formats_and_sections(client):
+    assert client.get('/api/generate-report?format=xml').status_code == 400
+    assert client.get('/api/generate-report?include=bins,users').status_code == 400
+    assert client.get('/api/generate-report?from=yesterday').status_code == 400
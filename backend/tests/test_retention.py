@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+
+def test_resolved_rows_past_the_window_are_archived(app, client):
+    import app as app_module
+    from models import LitterAlert, QRComplaint, db
+
+    now = datetime.utcnow()
+    window = timedelta(days=app_module.RETENTION_DAYS)
+    with app.app_context():
+        old = LitterAlert(location='28.7,77.1', timestamp=now - window * 2, resolved_at=now - window - timedelta(days=1))
+        # Raised long ago but only resolved yesterday
+        recent = LitterAlert(location='28.7,77.1', timestamp=now - window * 2, resolved_at=now - timedelta(days=1))
+        still_open = LitterAlert(location='28.7,77.1', timestamp=now - window * 2)
+        complaint = QRComplaint(bin_id=1, complaint_type='overflow', timestamp=now - window * 2,
+                                status='resolved', resolved_at=now - window - timedelta(days=1))
+        db.session.add_all([old, recent, still_open, complaint])
+        db.session.commit()
+        ids = old.id, recent.id, still_open.id, complaint.id
+
+        result = app_module.run_retention(now=now)
+        db.session.expire_all()
+        assert result['archived']['litter_alert'] >= 1 and result['archived']['qr_complaint'] >= 1
+        assert db.session.get(LitterAlert, ids[0]) is None and db.session.get(QRComplaint, ids[3]) is None
+        assert db.session.get(LitterAlert, ids[1]) and db.session.get(LitterAlert, ids[2])
+
+        archived = {row['id'] for row in app_module.archive_store.read('litter_alert')}
+        assert ids[0] in archived and ids[1] not in archived
+        assert ids[3] in {row['id'] for row in app_module.archive_store.read('qr_complaint')}
+
+    tables = client.get('/api/archive').get_json()['tables']
+    assert tables['litter_alert']['months'] >= 1 and tables['qr_complaint']['months'] >= 1
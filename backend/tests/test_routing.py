@@ -0,0 +1,44 @@
+import numpy as np
+
+from routing import haversine_matrix, solve, split_by_capacity
+
+DEPOT = (28.74, 77.12)
+
+
+def test_haversine_matrix_is_symmetric_km():
+    dist = haversine_matrix([(0.0, 0.0), (0.0, 1.0), (1.0, 0.0)])
+    assert np.allclose(dist, dist.T) and np.all(np.diag(dist) == 0)
+    assert abs(dist[0, 1] - 111.2) < 0.5
+
+
+def test_split_by_capacity_never_overfills_a_truck():
+    demands = [0.0, 0.6, 0.6, 0.3, 0.9]
+    assert split_by_capacity([1, 2, 3, 4], demands, 1.0) == [[1], [2, 3], [4]]
+
+
+def test_solve_visits_every_stop_within_capacity():
+    rng = np.random.default_rng(1)
+    stops = [(DEPOT[0] + dlat, DEPOT[1] + dlng) for dlat, dlng in rng.uniform(-0.02, 0.02, (30, 2))]
+    plan = solve(DEPOT, stops, [1.0] * len(stops), capacity=8, trucks=2, time_limit=1)
+    visited = sorted(stop for route in plan['routes'] for stop in route['stops'])
+    assert visited == list(range(len(stops)))
+    assert len(plan['routes']) == 4 and all(route['load'] <= 8 for route in plan['routes'])
+    assert {route['truck'] for route in plan['routes']} == {1, 2}
+    assert plan['total_distance_km'] <= plan['naive_distance_km'] + 1e-6
+
+
+def test_endpoint_splits_full_bins_by_capacity(client):
+    for bin_id in (1, 2, 3):
+        client.post(f'/api/bin/{bin_id}', json={'fill_level': 100})
+    plan = client.get('/api/optimize-routes?capacity=1.5&include_alerts=false&time_limit=0.5').get_json()
+    loads = [route['load'] for route in plan['routes']]
+    assert plan['priority_bins'] >= 3
+    assert all(load <= 1.5 for load in loads) and sum(loads) >= 3
+    stops = [stop for route in plan['routes'] for stop in route['stops']]
+    assert len(stops) == plan['priority_bins'] and {1, 2, 3} <= {stop['id'] for stop in stops}
+
+
+def test_endpoint_rejects_bad_fleet_settings(client):
+    for query in ('capacity=0', 'capacity=-2', 'capacity=nan', 'trucks=0', 'trucks=two', 'within=soon'):
+        response = client.get(f'/api/optimize-routes?{query}')
+        assert response.status_code == 400, query
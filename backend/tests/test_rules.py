@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+from rules import FULL, GETTING_FULL, NORMAL, STUCK_AFTER, BinState, evaluate, state_for
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def feed(state, levels, step=timedelta(minutes=1)):
+    """Transitions for each level, one reading per step"""
+    return [evaluate(state, level, NOW + step * (i + 1)) for i, level in enumerate(levels)]
+
+
+def test_thresholds_have_hysteresis():
+    assert [state_for(level) for level in (55, 61, 81)] == [NORMAL, GETTING_FULL, FULL]
+    assert state_for(56, GETTING_FULL) == GETTING_FULL and state_for(54, GETTING_FULL) == NORMAL
+    assert state_for(76, FULL) == FULL and state_for(74, FULL) == GETTING_FULL
+
+
+def test_level_hovering_at_a_threshold_does_not_flap():
+    state = BinState(None, 50.0, NOW, NOW, False)
+    assert feed(state, [61, 58, 60, 56, 62, 54]) == [[GETTING_FULL], [], [], [], [], [NORMAL]]
+
+
+def test_collection_restarts_from_the_new_level():
+    state = BinState(FULL, 90.0, NOW, NOW, False)
+    assert feed(state, [76, 5]) == [[], ['emptied', NORMAL]]
+    assert state.fill_state == NORMAL
+
+
+def test_stuck_sensor_is_flagged_once_and_recovers():
+    state = BinState(None, 30.0, NOW, NOW, False)
+    assert feed(state, [30, 30, 30], step=STUCK_AFTER / 2) == [[], ['sensor_stuck'], []]
+    assert state.stuck
+    assert evaluate(state, 31, NOW + STUCK_AFTER * 2) == ['sensor_recovered'] and not state.stuck
+
+
+def test_out_of_order_readings_are_ignored():
+    state = BinState(NORMAL, 30.0, NOW, NOW, False)
+    assert evaluate(state, 95, NOW - timedelta(minutes=1)) == []
+    assert (state.fill_state, state.level) == (NORMAL, 30.0)
+
+
+def test_bin_updates_publish_only_real_transitions(app, client):
+    from models import StreamEvent
+
+    def transitions():
+        with app.app_context():
+            return [event.payload for event in StreamEvent.query.filter_by(event_type='bin_transition').order_by(StreamEvent.id)]
+
+    client.post('/api/bin/1', json={'fill_level': 10})
+    before = len(transitions())
+    for level in (62, 58, 61, 57):
+        client.post('/api/bin/1', json={'fill_level': level})
+    published = transitions()[before:]
+    assert len(published) == 1 and '"getting_full"' in published[0]
+    bins = {row['id']: row for row in client.get('/api/dashboard').get_json()['bins']}
+    assert bins[1]['fill_state'] == GETTING_FULL
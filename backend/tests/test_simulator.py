@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from geo import distance_m
+from simulator import FleetSimulator, generate_fleet
+
+CENTER = (28.74, 77.12)
+
+
+def test_fleet_is_seeded_and_inside_the_radius():
+    fleet = list(generate_fleet(10, 200, CENTER, 2000, seed=7))
+    assert fleet == list(generate_fleet(10, 200, CENTER, 2000, seed=7))
+    assert [bin_id for bin_id, *_ in fleet] == list(range(10, 210))
+    assert all(distance_m(CENTER[0], CENTER[1], lat, lng) <= 2000.5 for _, _, lat, lng, _ in fleet)
+    assert all(10 <= level <= 90 for *_, level in fleet)
+
+
+def test_tick_reports_only_changed_bins_within_bounds():
+    ids, levels = list(range(1000)), [0] * 500 + [100] * 500
+    changed_ids, new_levels = FleetSimulator(seed=3, update_fraction=0.1).tick(ids, levels)
+    assert 0 < len(changed_ids) < 200
+    assert all(0 <= level <= 100 and level != levels[bin_id] for bin_id, level in zip(changed_ids, new_levels))
+    assert FleetSimulator(seed=3, update_fraction=0.1).tick(ids, levels) == (changed_ids, new_levels)
+
+
+def test_only_one_holder_runs_the_simulator(app, monkeypatch):
+    import app as app_module
+
+    with app.app_context():
+        assert app_module.acquire_lease('simulator', timedelta(minutes=1))
+        assert app_module.acquire_lease('simulator', timedelta(minutes=1))
+        monkeypatch.setattr(app_module, 'lease_holder', lambda: 'other-host:1:x')
+        assert not app_module.acquire_lease('simulator', timedelta(minutes=1))
+        # An expired lease is up for grabs
+        assert app_module.acquire_lease('forecast', timedelta(seconds=-1))
+        monkeypatch.undo()
+        assert app_module.acquire_lease('forecast', timedelta(minutes=1))
+
+
+def test_tick_fills_the_fleet_and_writes_in_bulk(app, monkeypatch):
+    import app as app_module
+    from models import SmartBin, StreamEvent
+
+    with app.app_context():
+        # Bin 1 is the real one; the rest of the seeded bins are simulated
+        monkeypatch.setattr(app_module, 'SIM_FLEET_SIZE', SmartBin.query.count() - 1 + 50)
+        assert app_module.ensure_simulated_fleet() == 50
+        assert app_module.ensure_simulated_fleet() == 0
+        changed = app_module.update_simulated_bins()
+        assert changed > 0
+        ticks = StreamEvent.query.filter_by(event_type='fleet_tick').all()
+        assert len(ticks) == 1 and StreamEvent.query.filter_by(event_type='bin_updated').count() == 0
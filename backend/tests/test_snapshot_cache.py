@@ -0,0 +1,43 @@
+from snapshot_cache import SnapshotCache
+
+
+class CountingLock:
+    def __init__(self, lock):
+        self.lock = lock
+        self.entered = 0
+
+    def __enter__(self):
+        self.entered += 1
+        return self.lock.__enter__()
+
+    def __exit__(self, *exc):
+        return self.lock.__exit__(*exc)
+
+
+def test_workers_share_one_rebuild_per_generation(tmp_path):
+    first, second = SnapshotCache(str(tmp_path)), SnapshotCache(str(tmp_path))
+    builds = []
+
+    def builder():
+        builds.append(1)
+        return {'bins': len(builds)}
+
+    assert first.get(builder) == {'bins': 1}
+    assert second.get(builder) == {'bins': 1}
+    second.invalidate()
+    assert first.get(builder) == {'bins': 2}
+    assert len(builds) == 2
+
+
+def test_hits_skip_the_file_lock_and_are_counted_later(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    cache.get(dict)
+    cache._counter_lock = CountingLock(cache._counter_lock)
+    for _ in range(5):
+        cache.get(dict)
+    assert cache._counter_lock.entered == 0
+
+    stats = SnapshotCache(str(tmp_path)).stats()
+    assert (stats['hits'], stats['misses'], stats['rebuilds']) == (0, 1, 1)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['rebuilds']) == (5, 1, 1)
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+
+import sqlite_mode
+
+COMMIT_SECONDS = 0.3
+
+
+def make_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'writers.db'}", **sqlite_mode.engine_options(pool_size=4))
+
+    # A slow COMMIT, installed underneath the writer queue, widens the window a
+    # too-early release would leave open
+    do_commit = engine.dialect.do_commit
+    commit_finished = {}
+
+    def slow_commit(dbapi_connection):
+        time.sleep(COMMIT_SECONDS)
+        do_commit(dbapi_connection)
+        commit_finished[threading.get_ident()] = time.perf_counter()
+
+    engine.dialect.do_commit = slow_commit
+    sqlite_mode.install(engine, sqlite_mode.WriterQueue(str(tmp_path / 'writers.lock')))
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE item (id INTEGER PRIMARY KEY, writer TEXT)'))
+    # Open a second pooled connection now, so switching it to WAL never waits on a writer
+    with engine.connect(), engine.connect():
+        pass
+    return engine, commit_finished
+
+
+def test_next_writer_waits_for_commit_to_finish(tmp_path):
+    engine, commit_finished = make_engine(tmp_path)
+    first_wrote = threading.Event()
+    second_started = {}
+
+    def first():
+        with engine.connect() as conn:
+            conn.execute(text("INSERT INTO item (writer) VALUES ('first')"))
+            first_wrote.set()
+            conn.commit()
+
+    # Registered after install(), so it runs once the write turn is granted and
+    # before SQLite itself could make the statement wait on its own lock
+    @event.listens_for(engine, 'before_cursor_execute')
+    def record_turn(conn, cursor, statement, parameters, context, executemany):
+        if 'second' in str(parameters) or "'second'" in statement:
+            second_started.setdefault('at', time.perf_counter())
+
+    def second():
+        first_wrote.wait()
+        with engine.connect() as conn:
+            conn.execute(text("INSERT INTO item (writer) VALUES ('second')"))
+            conn.commit()
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    first_commit = commit_finished[threads[0].ident]
+    assert second_started['at'] >= first_commit
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT writer FROM item ORDER BY id')).scalars().all() == ['first', 'second']
+
+
+def test_rollback_hands_on_the_turn(tmp_path):
+    engine, _ = make_engine(tmp_path)
+    with engine.connect() as conn:
+        conn.execute(text("INSERT INTO item (writer) VALUES ('rolled back')"))
+        conn.rollback()
+    done = threading.Event()
+
+    def writer():
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO item (writer) VALUES ('after')"))
+        done.set()
+
+    threading.Thread(target=writer, daemon=True).start()
+    assert done.wait(5)
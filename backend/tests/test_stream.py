@@ -0,0 +1,43 @@
+import json
+from datetime import datetime, timedelta
+
+
+def read_until(response, event_type):
+    """Data of the first event_type event in an SSE response"""
+    try:
+        for chunk in response.iter_encoded():
+            lines = chunk.decode().splitlines()
+            if lines and lines[0].startswith('id: ') and lines[1] == f'event: {event_type}':
+                return json.loads(lines[2][len('data: '):])
+    finally:
+        response.close()
+
+
+def test_backlog_replays_bin_updates_with_rule_state(client):
+    client.post('/api/bin/1', json={'fill_level': 95})
+    response = client.get('/api/stream', headers={'Last-Event-ID': '0'}, buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    update = read_until(response, 'bin_updated')
+    assert update['id'] == 1 and update['fill_level'] == 95
+    assert update['fill_state'] == 'full' and update['sensor_stuck'] is False
+
+
+def test_flushed_readings_publish_rule_state(app):
+    from app import write_bin_readings
+    from models import StreamEvent, db
+
+    with app.app_context():
+        write_bin_readings({2: (90.0, datetime.utcnow() + timedelta(seconds=5))})
+        db.session.commit()
+        payloads = [json.loads(row.payload) for row in StreamEvent.query.filter_by(event_type='bin_updated')]
+    assert payloads == [{'id': 2, 'fill_level': 90.0, 'last_updated': payloads[0]['last_updated'],
+                         'fill_state': 'full', 'sensor_stuck': False}]
+
+
+def test_stream_limit_answers_503(client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, 'STREAM_MAX_SUBSCRIBERS', 0)
+    response = client.get('/api/stream')
+    assert response.status_code == 503 and response.headers['Retry-After']
+    assert client.get('/api/stream', headers={'Last-Event-ID': 'x'}).status_code == 400
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from telemetry import ReadingBuffer, ReadingError, parse_reading, parse_timestamp
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def test_epoch_seconds_and_milliseconds_are_utc():
+    assert parse_timestamp(1714564800, NOW) == NOW
+    assert parse_timestamp(1714564800000, NOW) == NOW
+
+
+def test_iso_offsets_are_converted_to_naive_utc():
+    assert parse_timestamp('2024-05-01T17:30:00+05:30', NOW) == NOW
+    assert parse_timestamp('2024-05-01T12:00:00Z', NOW) == NOW
+
+
+def test_future_and_malformed_timestamps_are_rejected():
+    with pytest.raises(ReadingError, match='future'):
+        parse_timestamp((NOW + timedelta(hours=1) - datetime(1970, 1, 1)).total_seconds(), NOW)
+    with pytest.raises(ReadingError):
+        parse_timestamp(True, NOW)
+    with pytest.raises(ReadingError):
+        parse_timestamp('yesterday', NOW)
+
+
+def test_parse_reading_checks_fields():
+    assert parse_reading({'bin_id': '7', 'fill_level': 40}, NOW) == (7, 40.0, NOW)
+    for raw, message in (({'fill_level': 40}, 'bin_id'), ({'bin_id': 1}, 'fill_level'),
+                         ({'bin_id': 1, 'fill_level': 140}, 'between')):
+        with pytest.raises(ReadingError, match=message):
+            parse_reading(raw, NOW)
+
+
+def test_buffer_keeps_newest_reading_per_bin_and_all_history():
+    buffer = ReadingBuffer()
+    assert buffer.add(1, 10.0, NOW)
+    assert not buffer.add(1, 5.0, NOW - timedelta(minutes=1))
+    assert buffer.add(1, 20.0, NOW + timedelta(minutes=1))
+    pending, history = buffer.drain()
+    assert pending == {1: (20.0, NOW + timedelta(minutes=1))}
+    assert len(history) == 3 and buffer.coalesced == 2
+
+    buffer.add(1, 30.0, NOW + timedelta(minutes=2))
+    buffer.requeue(pending, history)
+    assert buffer.drain()[0] == {1: (30.0, NOW + timedelta(minutes=2))}
+
+
+def test_bulk_ingest_reports_errors_and_flushes_newest(app, client):
+    from app import flush_bin_readings
+
+    # Newer than the seeded bins, which are only written forward
+    soon = datetime.utcnow() + timedelta(seconds=30)
+    response = client.post('/api/bins/readings', json={'readings': [
+        {'bin_id': 1, 'fill_level': 30, 'ts': soon.isoformat()},
+        {'bin_id': 1, 'fill_level': 35, 'ts': (soon + timedelta(seconds=1)).isoformat()},
+        {'bin_id': 2, 'fill_level': 'full'},
+    ]})
+    assert response.status_code == 202
+    body = response.get_json()
+    assert (body['accepted'], body['rejected']) == (2, 1)
+    assert body['errors'] == [{'index': 2, 'error': 'fill_level must be a number'}]
+
+    with app.app_context():
+        assert flush_bin_readings() == 1
+    bins = {row['id']: row for row in client.get('/api/dashboard').get_json()['bins']}
+    assert bins[1]['fill_level'] == 35
+
+
+def test_bulk_ingest_rejects_bad_batches(client):
+    assert client.post('/api/bins/readings', json={'readings': 'nope'}).status_code == 400
+    too_many = [{'bin_id': 1, 'fill_level': 1}] * 5001
+    assert client.post('/api/bins/readings', json=too_many).status_code == 413
@@ -19,11 +19,26 @@ function initMap() {
     return map;
 }
 
+// Fill state kept by the server's rules (with hysteresis), or derived for older responses
+function binState(bin) {
+    if (bin.fill_state) return bin.fill_state;
+    if (bin.fill_level > 80) return 'full';
+    if (bin.fill_level > 60) return 'getting_full';
+    return 'normal';
+}
+
+const BIN_STATUS_TEXT = {
+    full: 'Needs Immediate Attention',
+    getting_full: 'Getting Full',
+    normal: 'Normal'
+};
+
 // Function to create colored bin markers
-function createBinIcon(fillLevel) {
+function createBinIcon(bin) {
+    const fillLevel = bin.fill_level;
     let color = '#2ecc71'; // Green
-    if (fillLevel > 80) color = '#e74c3c'; // Red
-    else if (fillLevel > 60) color = '#f39c12'; // Orange
+    if (binState(bin) === 'full') color = '#e74c3c'; // Red
+    else if (binState(bin) === 'getting_full') color = '#f39c12'; // Orange
 
     return L.divIcon({
         className: 'bin-marker',
@@ -39,7 +54,7 @@ function addBinToMap(bin) {
     
     // If marker already exists, update it
     if (binMarkers[bin.id]) {
-        binMarkers[bin.id].setIcon(createBinIcon(bin.fill_level));
+        binMarkers[bin.id].setIcon(createBinIcon(bin));
         binMarkers[bin.id].setLatLng([lat, lng]);
         
         // Update popup content
@@ -48,7 +63,7 @@ function addBinToMap(bin) {
             <div style="min-width: 200px;">
                 <h3 style="margin: 0 0 10px 0;">${binName}</h3>
                 <p><strong>Fill Level:</strong> ${bin.fill_level}%</p>
-                <p><strong>Status:</strong> ${bin.fill_level > 80 ? 'Needs Immediate Attention' : bin.fill_level > 60 ? 'Getting Full' : 'Normal'}</p>
+                <p><strong>Status:</strong> ${BIN_STATUS_TEXT[binState(bin)]}${bin.sensor_stuck ? ' (sensor stuck)' : ''}</p>
                 <button style="width: 100%; margin-top: 10px; padding: 8px; background: #3498db; color: white; border: none; border-radius: 4px; cursor: pointer;" 
                         onclick="selectBin(${bin.id})">View Details</button>
             </div>
@@ -56,7 +71,7 @@ function addBinToMap(bin) {
     } else {
         // Create new marker
         const marker = L.marker([lat, lng], { 
-            icon: createBinIcon(bin.fill_level) 
+            icon: createBinIcon(bin) 
         }).addTo(map);
         
         // Add popup with bin information
@@ -65,7 +80,7 @@ function addBinToMap(bin) {
             <div style="min-width: 200px;">
                 <h3 style="margin: 0 0 10px 0;">${binName}</h3>
                 <p><strong>Fill Level:</strong> ${bin.fill_level}%</p>
-                <p><strong>Status:</strong> ${bin.fill_level > 80 ? 'Needs Immediate Attention' : bin.fill_level > 60 ? 'Getting Full' : 'Normal'}</p>
+                <p><strong>Status:</strong> ${BIN_STATUS_TEXT[binState(bin)]}${bin.sensor_stuck ? ' (sensor stuck)' : ''}</p>
                 <button style="width: 100%; margin-top: 10px; padding: 8px; background: #3498db; color: white; border: none; border-radius: 4px; cursor: pointer;" 
                         onclick="selectBin(${bin.id})">View Details</button>
             </div>
@@ -208,9 +223,9 @@ function updateStats(bins, alerts) {
     document.getElementById('co2-saved').textContent = co2Reduction + '%';
     
     // Update bin status counts
-    const normalBins = bins.filter(bin => bin.fill_level <= 60).length;
-    const warningBins = bins.filter(bin => bin.fill_level > 60 && bin.fill_level <= 80).length;
-    const criticalBins = bins.filter(bin => bin.fill_level > 80).length;
+    const normalBins = bins.filter(bin => binState(bin) === 'normal').length;
+    const warningBins = bins.filter(bin => binState(bin) === 'getting_full').length;
+    const criticalBins = bins.filter(bin => binState(bin) === 'full').length;
     
     document.getElementById('normal-bins').textContent = normalBins;
     document.getElementById('warning-bins').textContent = warningBins;